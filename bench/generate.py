@@ -0,0 +1,172 @@
+# bench/generate.py
+#
+# Детерминированный генератор синтетической БД масштаба Sisyphus для бенчмарков.
+#
+#   python bench/generate.py bench.db                   # 50k пакетов, 1M обновлений…
+#   python bench/generate.py small.db --scale 0.02      # те же пропорции, в 50 раз меньше
+#   python bench/generate.py bench.db --updates 2000000 --seed 7
+#
+# Один и тот же --seed даёт побайтно одинаковые данные, так что результаты
+# bench/run.py сравнимы между коммитами. Все семь таблиц заполняются
+# Core-executemany пачками; распределения скошены как в настоящем
+# репозитории: у немногих пакетов тысячи обновлений и баг-репортов, у
+# большинства — единицы. Индексы, FTS-индекс и сводки дашборда строит
+# migrate() по уже загруженным данным.
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.schema import CreateTable
+from models import (
+    Base,
+    Package, Maintainer, ACL,
+    PackageArchitecture, PackageUpdate,
+    PackageGroup, Report
+)
+from importer import _fast_pragmas
+from migrate import migrate
+
+DEFAULTS = {
+    'packages':    50_000,
+    'maintainers': 5_000,
+    'updates':     1_000_000,
+    'reports':     200_000,
+}
+CHUNK = 20_000
+
+ARCHITECTURES = ['i586', 'x86_64', 'aarch64', 'armh', 'noarch']
+GROUPS = [
+    'Development/C', 'Development/Python3', 'Development/Perl', 'Development/Other',
+    'System/Libraries', 'System/Base', 'System/Servers', 'System/Kernel and hardware',
+    'Networking/Other', 'Networking/WWW', 'Graphical desktop/KDE', 'Graphical desktop/GNOME',
+    'Sound', 'Video', 'Graphics', 'Text tools', 'Games/Arcade', 'Office', 'Sciences/Mathematics',
+    'Documentation', 'File tools', 'Security/Networking', 'Shells', 'Other',
+]
+ROLES = ['owner', 'owner', 'helper', 'helper', 'committer']
+STATUSES = ['NEW', 'UNCONFIRMED', 'CONFIRMED', 'IN_PROGRESS', 'RESOLVED', 'VERIFIED', 'CLOSED']
+RESOLUTIONS = ['FIXED', 'INVALID', 'WONTFIX', 'DUPLICATE', 'WORKSFORME', 'NOTOURBUG']
+PREFIXES = ['lib', 'python3-module-', 'perl-', 'kernel-modules-', 'golang-', 'rust-', 'ocaml-', '', '', '']
+WORDS = ['gtk', 'qt', 'xml', 'ssl', 'curl', 'ssh', 'pam', 'audio', 'video', 'font', 'mail',
+         'http', 'json', 'yaml', 'zlib', 'png', 'jpeg', 'sql', 'dbus', 'udev', 'net', 'crypto']
+CHANGES = ['Updated to {v}.', 'Fixed build with gcc{n}.', 'Rebuilt with new python3.',
+           'Fixed CVE-20{n}-{m}.', 'Spec cleanup.', 'Enabled tests.', 'Applied upstream patch.',
+           'Dropped obsolete patches.', 'Fixed FTBFS (closes: #{m}).', 'Added {w} support.']
+
+START = date(2005, 1, 1)
+DAYS = 20 * 365
+
+
+def _skewed(rnd, n):
+    """Индекс 0..n-1 с «длинным хвостом»: малые индексы выпадают гораздо чаще
+    (у первого пакета ~n^(-1/3) всех строк — десятки тысяч при n = 50k)."""
+    return int(n * rnd.random() ** 3)
+
+def _version(rnd):
+    return f'{rnd.randint(0, 9)}.{rnd.randint(0, 40)}.{rnd.randint(0, 20)}-alt{rnd.randint(1, 5)}'
+
+def _changelog(rnd):
+    lines = []
+    for _ in range(rnd.randint(1, 6)):
+        lines.append('- ' + rnd.choice(CHANGES).format(
+            v=_version(rnd), n=rnd.randint(10, 25), m=rnd.randint(1000, 60000), w=rnd.choice(WORDS)))
+    return '\n'.join(lines)
+
+
+def generate(engine, counts, seed=1, log=print):
+    rnd = random.Random(seed)
+    n_pkg, n_man = counts['packages'], counts['maintainers']
+
+    def write(model, rows):
+        with engine.begin() as conn:
+            for i in range(0, len(rows), CHUNK):
+                conn.execute(insert(model), rows[i:i + CHUNK])
+        log(f'{model.__tablename__}: {len(rows)}')
+
+    write(Maintainer, [{'maintainer_id': mid,
+                        'nickname': f'{rnd.choice(WORDS)}{rnd.choice(WORDS)}{mid}',
+                        'full_name': f'Maintainer {mid}'} for mid in range(1, n_man + 1)])
+
+    packages, acl, archs, groups = [], [], [], []
+    for pid in range(1, n_pkg + 1):
+        name = f'{rnd.choice(PREFIXES)}{rnd.choice(WORDS)}-{rnd.choice(WORDS)}{pid}'
+        packages.append({'package_id': pid, 'name': name,
+                         'description': f'{name}: ' + ' '.join(rnd.choices(WORDS, k=rnd.randint(5, 30)))})
+        for man in rnd.sample(range(1, n_man + 1), k=min(n_man, rnd.choice([1, 1, 1, 2, 3]))):
+            acl.append({'package_id': pid, 'maintainer_id': man, 'role': rnd.choice(ROLES)})
+        for arch in (['noarch'] if rnd.random() < 0.3 else rnd.sample(ARCHITECTURES[:4], k=rnd.randint(1, 4))):
+            archs.append({'package_id': pid, 'architecture': arch})
+        groups.append({'package_id': pid, 'group_name': rnd.choice(GROUPS)})
+    write(Package, packages)
+    write(ACL, acl)
+    write(PackageArchitecture, archs)
+    write(PackageGroup, groups)
+    del packages, acl, archs, groups
+
+    def update():
+        return {'package_id':     _skewed(rnd, n_pkg) + 1,
+                'updater_id':     _skewed(rnd, n_man) + 1,
+                'update_version': _version(rnd),
+                'update_date':    START + timedelta(days=rnd.randrange(DAYS)),
+                'changelog':      _changelog(rnd)}
+
+    def report():
+        status = rnd.choice(STATUSES)
+        return {'package_id':   _skewed(rnd, n_pkg) + 1,
+                'status':       status,
+                'resolution':   rnd.choice(RESOLUTIONS) if status in ('RESOLVED', 'VERIFIED', 'CLOSED') else '',
+                'assignee_id':  _skewed(rnd, n_man) + 1,
+                'reporter':     f'user{rnd.randrange(20000)}@altlinux.org',
+                'summary':      f'{rnd.choice(WORDS)}: ' + ' '.join(rnd.choices(WORDS, k=rnd.randint(3, 12))),
+                'last_changed': START + timedelta(days=rnd.randrange(DAYS)) if rnd.random() < 0.9 else None}
+
+    # обновления и баг-репорты пишем потоком, не держа всё в памяти
+    for model, total, make in ((PackageUpdate, counts['updates'], update),
+                               (Report, counts['reports'], report)):
+        with engine.begin() as conn:
+            done = 0
+            while done < total:
+                rows = [make() for _ in range(min(CHUNK, total - done))]
+                conn.execute(insert(model), rows)
+                done += len(rows)
+        log(f'{model.__tablename__}: {total}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Синтетическая БД sisyphus для бенчмарков')
+    parser.add_argument('db', help='путь к создаваемому SQLite-файлу')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scale', type=float, default=1.0, help='множитель для всех объёмов')
+    for name, value in DEFAULTS.items():
+        parser.add_argument(f'--{name}', type=int, help=f'по умолчанию {value} × scale')
+    args = parser.parse_args(argv)
+
+    counts = {name: getattr(args, name) or max(1, int(value * args.scale))
+              for name, value in DEFAULTS.items()}
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    engine = create_engine(f'sqlite:///{args.db}')
+    event.listen(engine, 'connect', _fast_pragmas)
+
+    started = time.perf_counter()
+    # только таблицы: индексы дешевле построить по готовым данным
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            conn.execute(CreateTable(table))
+    generate(engine, counts, args.seed)
+    engine.dispose()
+    event.remove(engine, 'connect', _fast_pragmas)
+    # индексы, FTS-индекс, сводки и ANALYZE
+    migrate(engine)
+    print(f'готово за {time.perf_counter() - started:.1f} с: {counts}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
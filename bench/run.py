@@ -0,0 +1,562 @@
+# bench/run.py
+#
+# Бенчмарк всех маршрутов app.py через тестовый клиент Flask.
+#
+#   python bench/generate.py bench.db
+#   python bench/run.py bench.db -o results/$(git rev-parse --short HEAD).json
+#   python bench/run.py bench.db --compare results/abc1234.json
+#   python bench/run.py bench.db --threads 8 --only 'list_|package_'
+#   python bench/run.py bench.db --threads 8 --writers 2 --only 'list_|add_|edit_'
+#   python bench/run.py bench.db --cold-start 7 --only list_maintainers
+#   python bench/run.py bench.db --replicas 2 --threads 8
+#
+# Приложение поднимается на копии БД (sqlite backup во временный каталог),
+# поэтому сценарии добавления и удаления не портят исходный файл и каждый
+# прогон начинается с одинаковых данных. Кэш страниц (HTTP_CACHE)
+# по умолчанию выключен — меряется рендер, а не LRU.
+#
+# По каждому сценарию: p50/p95/p99/max задержки, SQL-запросов на запрос,
+# размер ответа и пик памяти Python (tracemalloc, отдельным проходом);
+# в целом — пиковый RSS процесса. Результаты пишутся в JSON вместе с
+# коммитом и объёмами таблиц; --compare сравнивает с прошлым файлом и
+# завершается с кодом 1, если что-то стало медленнее порога или стало
+# делать больше SQL-запросов. Старт меряется отдельно: импорт и
+# create_app() (startup_s) и первое обращение к БД — миграция и
+# init_* (db_init_s); --cold-start добавляет замеры в свежих процессах.
+
+import argparse
+import base64
+import json
+import math
+import os
+import platform
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+TABLES = ['packages', 'maintainers', 'acl', 'architectures', 'package_groups',
+          'package_updates', 'reports']
+
+
+# --- подготовка ---
+
+def copy_db(src, dst):
+    with sqlite3.connect(src) as source, sqlite3.connect(dst) as target:
+        source.backup(target)
+
+def sample_ids(path):
+    """Идентификаторы для сценариев: «горячий» пакет, типичный пакет и т.п."""
+    conn = sqlite3.connect(path)
+    one = lambda sql: conn.execute(sql).fetchone()[0]
+    rows = {table: one(f'SELECT COUNT(*) FROM {table}') for table in TABLES}
+    mid = lambda table, pk: one(f'SELECT {pk} FROM {table} ORDER BY {pk} '
+                                f'LIMIT 1 OFFSET {rows[table] // 2}')
+    ids = {
+        'hot_package':     one('SELECT package_id FROM package_updates GROUP BY package_id '
+                               'ORDER BY COUNT(*) DESC LIMIT 1'),
+        'package':         mid('packages', 'package_id'),
+        'maintainer':      mid('maintainers', 'maintainer_id'),
+        'busy_maintainer': one('SELECT updater_id FROM package_updates GROUP BY updater_id '
+                               'ORDER BY COUNT(*) DESC LIMIT 1'),
+        'update':          mid('package_updates', 'update_id'),
+        'report':          mid('reports', 'id'),
+        'acl':             mid('acl', 'acl_id'),
+        'max_package':     one('SELECT MAX(package_id) FROM packages'),
+        'max_maintainer':  one('SELECT MAX(maintainer_id) FROM maintainers'),
+        'max_update':      one('SELECT MAX(update_id) FROM package_updates'),
+        'max_report':      one('SELECT MAX(id) FROM reports'),
+        'max_acl':         one('SELECT MAX(acl_id) FROM acl'),
+        'max_arch':        one('SELECT MAX(arch_id) FROM architectures'),
+        'max_group':       one('SELECT MAX(group_id) FROM package_groups'),
+    }
+    name = one(f'SELECT name FROM packages WHERE package_id = {ids["package"]}')
+    ids['word'] = re.sub(r'[^a-z]', '', name.split('-')[-1])[:4] or name[:4]
+    ids['nickname'] = one(f'SELECT nickname FROM maintainers WHERE maintainer_id = {ids["maintainer"]}')
+    conn.close()
+    return ids, rows
+
+def cursor_after(pk):
+    """Курсор keyset-пагинации «после строки pk» при сортировке по первичному ключу."""
+    raw = json.dumps([pk, pk, 'next'], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+# --- сценарии ---
+#
+# (имя, метод, запрос); запрос — строка URL либо функция i -> (URL, данные)
+# для сценариев, которым на каждой итерации нужны свои данные.
+# heavy — выгрузки и длинные потоки: повторяются реже.
+
+BATCH_GROUPS = ['Editors', 'Education', 'Graphics', 'Office', 'Shells',
+                'Sound', 'Terminals', 'Toys', 'Video', 'Monitoring']
+
+def scenarios(ids, backend='postgres'):
+    p, hp, m = ids['package'], ids['hot_package'], ids['maintainer']
+    today = datetime.now().date().isoformat()
+    read = [
+        ('index',                     'GET', '/'),
+        ('search',                    'GET', f'/search?q={ids["word"]}'),
+        ('search_package',            'GET', f'/search?q={ids["word"]}&kind=package'),
+        ('lookup_packages',           'GET', f'/api/lookup/packages?q={ids["word"]}'),
+        ('lookup_maintainers',        'GET', f'/api/lookup/maintainers?q={ids["nickname"][:3]}'),
+        ('api_updates_1000',          'GET', '/api/v1/updates?limit=1000'),
+        ('api_reports_json_1000',     'GET', '/api/v1/reports?limit=1000&format=json&status=NEW'),
+        ('api_updates_package',       'GET', f'/api/v1/updates?package_id={hp}'),
+        ('export_packages_csv',       'GET', '/export/packages?format=csv', 'heavy'),
+        ('export_updates_package_gz', 'GET', f'/export/updates?format=csv.gz&joined=1&package_id={hp}'),
+        ('list_maintainers',          'GET', '/maintainers'),
+        ('list_maintainers_filter',   'GET', f'/maintainers?nickname={ids["nickname"][:3]}&sort_by=nickname'),
+        ('list_packages',             'GET', '/packages'),
+        ('list_packages_deep',        'GET', f'/packages?cursor={cursor_after(ids["max_package"] - 100)}'),
+        ('list_packages_name',        'GET', f'/packages?name={ids["word"]}&sort_by=name'),
+        ('list_architectures',        'GET', '/architectures'),
+        ('list_architectures_filter', 'GET', '/architectures?architecture=aarch64&sort_by=package_id'),
+        ('list_groups',               'GET', '/groups'),
+        ('list_groups_filter',        'GET', '/groups?group_name=Development&sort_by=group_name'),
+        ('list_updates',              'GET', '/updates'),
+        ('list_updates_500',          'GET', '/updates?per_page=500&count=0'),
+        ('list_updates_deep',         'GET', f'/updates?cursor={cursor_after(ids["max_update"] - 100)}'),
+        ('list_updates_package',      'GET', f'/updates?package_id={hp}&sort_by=update_date&sort_dir=desc'),
+        ('list_updates_version',      'GET', '/updates?sort_by=update_version&sort_dir=desc'),
+        ('list_updates_updater',      'GET', f'/updates?updater_id={ids["busy_maintainer"]}'),
+        ('list_reports',              'GET', '/reports'),
+        ('list_reports_500',          'GET', '/reports?per_page=500&count=0'),
+        ('list_reports_status',       'GET', '/reports?status=NEW&sort_by=last_changed&sort_dir=desc'),
+        ('list_reports_stale',        'GET', '/reports?stale=90'),
+        ('list_reports_stale_assignee', 'GET', f'/reports?stale=90&assignee_id={m}'),
+        ('list_acl',                  'GET', '/acl'),
+        ('list_acl_maintainer',       'GET', f'/acl?maintainer_id={m}'),
+        ('list_workload',             'GET', '/maintainers/workload'),
+        ('list_workload_updated',     'GET', '/maintainers/workload?sort_by=last_update'),
+        ('maintainer_detail',         'GET', f'/maintainers/{ids["busy_maintainer"]}'),
+        ('package_detail',            'GET', f'/packages/{p}'),
+        ('package_detail_hot',        'GET', f'/packages/{hp}'),
+        ('package_updates_hot',       'GET', f'/packages/{hp}/updates?per_page=100'),
+        ('package_reports_hot',       'GET', f'/packages/{hp}/reports?per_page=100'),
+        ('package_updates_archive',   'GET', f'/packages/{hp}/updates?archive=1'),
+        ('add_maintainer_form',       'GET', '/maintainers/add'),
+        ('edit_maintainer_form',      'GET', f'/maintainers/edit/{m}'),
+        ('add_package_form',          'GET', '/packages/add'),
+        ('complex_add_form',          'GET', '/packages/complex_add'),
+        ('edit_package_form',         'GET', f'/packages/edit/{p}'),
+        ('add_architecture_form',     'GET', '/architectures/add'),
+        ('add_group_form',            'GET', '/groups/add'),
+        ('add_update_form',           'GET', '/updates/add'),
+        ('add_report_form',           'GET', '/reports/add'),
+        ('edit_report_form',          'GET', f'/reports/edit/{ids["report"]}'),
+        ('add_acl_form',              'GET', '/acl/add'),
+        ('edit_acl_form',             'GET', f'/acl/edit/{ids["acl"]}'),
+        ('batch_form',                'GET', '/acl/batch'),
+        ('debug_metrics',             'GET', '/debug/metrics'),
+        ('prometheus_metrics',        'GET', '/metrics'),
+        ('switch_db',                 'GET', f'/switch_db/{backend}'),
+    ]
+    # записи — после чтений, на копии БД; новые строки получают id после max_*
+    write = [
+        ('add_maintainer',  'POST', lambda i: ('/maintainers/add',
+                                               {'nickname': f'bench{i}', 'full_name': f'Bench {i}'})),
+        ('edit_maintainer', 'POST', lambda i: (f'/maintainers/edit/{m}',
+                                               {'nickname': ids['nickname'], 'full_name': f'Edited {i}'})),
+        ('add_package',     'POST', lambda i: ('/packages/add',
+                                               {'name': f'bench-pkg{i}', 'description': 'bench'})),
+        ('complex_add',     'POST', lambda i: ('/packages/complex_add', {
+            'name': f'bench-complex{i}', 'description': 'bench', 'maintainer_id': m,
+            'group_name': 'Development/C', 'architectures': ['x86_64', 'aarch64'],
+            'version': '1.0-alt1', 'update_date': today, 'changelog': '- initial build'})),
+        ('edit_package',    'POST', lambda i: (f'/packages/edit/{p}',
+                                               {'name': f'bench-edited{i}', 'description': 'edited'})),
+        ('add_architecture', 'POST', lambda i: ('/architectures/add',
+                                                {'package_id': ids['max_package'] + 1 + i, 'architecture': 'noarch'})),
+        ('add_group',       'POST', lambda i: ('/groups/add',
+                                               {'package_id': ids['max_package'] + 1 + i, 'group_name': 'Other'})),
+        ('add_update',      'POST', lambda i: ('/updates/add', {
+            'package_id': p, 'updater_id': m, 'update_version': f'2.{i}-alt1',
+            'update_date': today, 'changelog': '- bench'})),
+        ('add_report',      'POST', lambda i: ('/reports/add', {
+            'package_id': p, 'status': 'NEW', 'resolution': '', 'assignee_id': m,
+            'reporter': 'bench@altlinux.org', 'summary': f'bench {i}', 'last_changed': today})),
+        ('edit_report',     'POST', lambda i: (f'/reports/edit/{ids["report"]}', {
+            'package_id': p, 'status': 'CONFIRMED', 'resolution': '', 'assignee_id': m,
+            'reporter': 'bench@altlinux.org', 'summary': f'edited {i}', 'last_changed': today})),
+        ('add_acl',         'POST', lambda i: ('/acl/add',
+                                               {'package_id': p, 'maintainer_id': m, 'role': 'helper'})),
+        ('edit_acl',        'POST', lambda i: (f'/acl/edit/{ids["acl"]}',
+                                               {'package_id': p, 'maintainer_id': m, 'role': 'owner'})),
+        ('batch_add',       'POST', lambda i: ('/groups/batch', {'rows': '\n'.join(
+            f'bench-pkg{i} {group}' for group in BATCH_GROUPS)})),
+        ('api_batch_add',   'POST', lambda i: ('/api/v1/architectures/batch', {'json': [
+            {'package_id': ids['max_package'] + 1 + i, 'architecture': a}
+            for a in ('i586', 'x86_64', 'armh')]})),
+        ('delete_update',       'GET', lambda i: (f'/updates/delete/{ids["max_update"] - i}', None)),
+        ('delete_report',       'GET', lambda i: (f'/reports/delete/{ids["max_report"] - i}', None)),
+        ('delete_acl',          'GET', lambda i: (f'/acl/delete/{ids["max_acl"] - i}', None)),
+        ('delete_architecture', 'GET', lambda i: (f'/architectures/delete/{ids["max_arch"] - i}', None)),
+        ('delete_group',        'GET', lambda i: (f'/groups/delete/{ids["max_group"] - i}', None)),
+        ('delete_maintainer',   'GET', lambda i: (f'/maintainers/delete/{ids["max_maintainer"] + 1 + i}', None)),
+        # удаление «тяжёлых» пакетов — со всеми обновлениями и баг-репортами;
+        # запрос только ставит задачу, её время — в report['jobs']
+        ('delete_package',      'GET', lambda i: (f'/packages/delete/{ids["hot_package"] + 1 + i}', None)),
+        ('submit_job',          'POST', lambda i: ('/jobs', {'kind': 'export', 'table': 'maintainers',
+                                                            'fmt': 'csv'})),
+        ('job_status',          'GET', lambda i: ('/api/v1/jobs/1', None)),
+        ('list_jobs',           'GET', lambda i: ('/jobs', None)),
+    ]
+    return read, write
+
+
+# --- замеры ---
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+# холодный старт: что выполняется в свежем интерпретаторе (каталог src,
+# та же копия БД через FLASK_*); перед замерами один холостой запуск,
+# чтобы версия схемы копии уже лежала в schema_version
+COLD_START = {
+    'import_app':     'import app',
+    'create_app':     'import app; app.create_app()',
+    'first_request':  "import app; app.create_app().test_client().get('/maintainers')",
+    'import_models':  'import models',
+    'import_stats':   'import stats',
+    'import_migrate': 'import migrate',
+}
+
+def cold_start(runs):
+    """Медиана (мс) каждого сниппета COLD_START по runs запускам python -c."""
+    timed = 'import time; started = time.perf_counter(); {}; print(time.perf_counter() - started)'
+    subprocess.run([sys.executable, '-c', COLD_START['first_request']],
+                   cwd=os.path.join(ROOT, 'src'), check=True, capture_output=True)
+    results = {}
+    for name, code in COLD_START.items():
+        times = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, '-c', timed.format(code)], cwd=os.path.join(ROOT, 'src'),
+                                 check=True, capture_output=True, text=True).stdout
+            times.append(float(out.split()[-1]) * 1000)
+        results[name] = round(percentile(times, 50), 1)
+    return results
+
+def fetch(client, method, target, i):
+    """Один запрос сценария (target или target(i)) через test client.
+
+    Возвращает (url, статус, байт, время первого куска тела по perf_counter);
+    потоковый ответ дочитывается и закрывается. Нужен и тестам, которые
+    прогоняют сценарии бенчмарка (tests/test_stats.py).
+    """
+    url, data = target(i) if callable(target) else (target, None)
+    if isinstance(data, dict) and 'json' in data:
+        resp = client.open(url, method=method, json=data['json'], buffered=False)
+    else:
+        resp = client.open(url, method=method, data=data, buffered=False)
+    # потоковые ответы дочитываются здесь
+    size, first = 0, None
+    for chunk in resp.response:
+        if first is None:
+            first = time.perf_counter()
+        size += len(chunk)
+    resp.close()
+    return url, resp.status_code, size, first or time.perf_counter()
+
+def measure(client, engines, count_statements, scenario, runs, warmup, memory, settle=None):
+    # settle() — между замерами: дождаться фоновых задач прошлого запроса и
+    # обновить копии-реплики
+    name, method, target, *flags = scenario
+    for i in range(warmup):
+        fetch(client, method, target, -1 - i)
+        if settle:
+            settle()
+    times, ttfb, statements, sizes, statuses = [], [], [], [], set()
+    for i in range(runs):
+        with ExitStack() as stack:
+            counters = [stack.enter_context(count_statements(e)) for e in engines]
+            started = time.perf_counter()
+            url, status, size, first = fetch(client, method, target, i)
+            times.append(time.perf_counter() - started)
+        ttfb.append(first - started)
+        statements.append(sum(c['count'] for c in counters))
+        sizes.append(size)
+        statuses.add(status)
+        if settle:
+            settle()
+    result = {
+        'method':     method,
+        'url':        url,
+        'runs':       runs,
+        'status':     sorted(statuses),
+        'p50_ms':     round(percentile(times, 50) * 1000, 2),
+        'p95_ms':     round(percentile(times, 95) * 1000, 2),
+        'p99_ms':     round(percentile(times, 99) * 1000, 2),
+        'max_ms':     round(max(times) * 1000, 2),
+        'mean_ms':    round(sum(times) / runs * 1000, 2),
+        # до первого куска тела: у потоковых страниц меньше полного времени
+        'ttfb_ms':    round(percentile(ttfb, 50) * 1000, 2),
+        'statements': max(statements),
+        'bytes':      max(sizes),
+    }
+    if memory:
+        tracemalloc.start()
+        fetch(client, method, target, runs)
+        result['peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+        if settle:
+            settle()
+    return result
+
+def job_times(jobs):
+    """Время выполнения фоновых задач (от старта до завершения) по видам."""
+    by_kind = {}
+    for job in jobs:
+        if job['started_at'] and job['finished_at']:
+            by_kind.setdefault(job['kind'], []).append(job)
+    result = {}
+    for kind, items in by_kind.items():
+        times = [(j['finished_at'] - j['started_at']).total_seconds() for j in items]
+        result[kind] = {'p50_ms': round(percentile(times, 50) * 1000, 2),
+                        'max_ms': round(max(times) * 1000, 2),
+                        'done':   sum(j['status'] == 'done' for j in items),
+                        'failed': sum(j['status'] == 'failed' for j in items)}
+    return result
+
+# записи для stress(): только те, что можно повторять сколько угодно раз
+# из разных потоков (удаления выбирают строки по номеру итерации)
+STRESS_WRITES = ('add_maintainer', 'edit_maintainer', 'add_package', 'add_update',
+                 'add_report', 'edit_report', 'add_acl', 'edit_acl')
+
+def rss_mb():
+    """Текущий RSS процесса в МБ (/proc, только Linux; иначе None)."""
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return None
+
+def stress(app, scenarios, threads, runs, write=(), writers=0, rounds=2):
+    """Сценарии чтения из threads потоков и, одновременно с ними, записи
+    из writers потоков; rounds одинаковых раундов. Запросов в секунду,
+    ошибки (отдельно — блокировки SQLite) и RSS после каждого раунда:
+    при стабильной памяти он не растёт от раунда к раунду."""
+    errors, lock = [], threading.Lock()
+    write = [s for s in write if s[0] in STRESS_WRITES]
+    writers = writers if write else 0
+
+    def worker(n, items, offset):
+        client = app.test_client()
+        for i in range(runs):
+            name, method, target, *_ = items[(n + i) % len(items)]
+            try:
+                _, status, _, _ = fetch(client, method, target, offset + i)
+                if status >= 500:
+                    raise RuntimeError(f'HTTP {status}')
+            except Exception as e:
+                with lock:
+                    errors.append(f'{name}: {e!r}')
+
+    rss, elapsed = [], 0.0
+    for rnd in range(rounds):
+        # у каждого писателя в каждом раунде свои номера: имена не повторяются
+        pool = [threading.Thread(target=worker, args=(n, scenarios, 0)) for n in range(threads)]
+        pool += [threading.Thread(target=worker, args=(n, write, 10 ** 6 + (rnd * writers + n) * runs))
+                 for n in range(writers)]
+        started = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed += time.perf_counter() - started
+        current = rss_mb()
+        rss.append(round(current, 1) if current is not None else None)
+    requests = (threads + writers) * runs * rounds
+    return {'threads': threads, 'writers': writers, 'requests': requests, 'seconds': round(elapsed, 2),
+            'rps': round(requests / elapsed, 1), 'errors': errors[:20], 'error_count': len(errors),
+            'locked': sum('database is locked' in e for e in errors), 'rss_mb': rss}
+
+
+# --- сравнение ---
+
+def compare(old, new, threshold=1.25, min_ms=1.0):
+    """Список строк-регрессий: p50/p95 выросли больше чем в threshold раз
+    (и больше чем на min_ms) или стало больше SQL-запросов."""
+    problems = []
+    for name, cur in new['scenarios'].items():
+        prev = old['scenarios'].get(name)
+        if prev is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if cur[key] > prev[key] * threshold and cur[key] - prev[key] > min_ms:
+                problems.append(f'{name}: {key} {prev[key]} -> {cur[key]} '
+                                f'(×{cur[key] / max(prev[key], 0.001):.2f})')
+        if cur['statements'] > prev['statements']:
+            problems.append(f'{name}: SQL-запросов {prev["statements"]} -> {cur["statements"]}')
+    return problems
+
+def print_table(results, old=None):
+    print(f'{"сценарий":32} {"p50":>9} {"p95":>9} {"p99":>9} {"TTFB":>9} {"SQL":>4} {"КиБ":>8}  {"было p50":>9}')
+    for name, r in results['scenarios'].items():
+        prev = (old or {}).get('scenarios', {}).get(name, {}).get('p50_ms', '')
+        print(f'{name:32} {r["p50_ms"]:9.2f} {r["p95_ms"]:9.2f} {r["p99_ms"]:9.2f} {r.get("ttfb_ms", ""):>9} '
+              f'{r["statements"]:4} {r.get("peak_kib", ""):>8}  {prev:>9}')
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return git('rev-parse', 'HEAD') or None, bool(git('status', '--porcelain', '--untracked-files=no'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк маршрутов sisyphus DB')
+    parser.add_argument('db', help='SQLite-файл от bench/generate.py (не изменяется)')
+    parser.add_argument('-o', '--output', help='куда сохранить результаты (JSON)')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='во сколько раз p50/p95 может вырасти без отметки о регрессии')
+    parser.add_argument('--runs', type=int, default=20, help='замеров на сценарий')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', help='регулярное выражение по именам сценариев')
+    parser.add_argument('--backend', choices=['postgres', 'clickhouse'], default='postgres',
+                        help='какая БД обслуживает чтение (session db_type)')
+    parser.add_argument('--http-cache', action='store_true', help='не отключать ETag/кэш страниц')
+    parser.add_argument('--no-memory', action='store_true', help='без прохода с tracemalloc')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='дополнительно: чтение из N потоков одновременно')
+    parser.add_argument('--writers', type=int, default=0,
+                        help='вместе с --threads: ещё N потоков пишут (STRESS_WRITES)')
+    parser.add_argument('--no-stream', action='store_true',
+                        help='списки целиком через render_template (STREAM_PAGES = False)')
+    parser.add_argument('--cold-start', type=int, default=0, metavar='N',
+                        help='дополнительно: N запусков отдельного процесса на импорт и первый запрос')
+    parser.add_argument('--replicas', type=int, default=0, metavar='N',
+                        help='читать через N SQLite-копий основной БД (REPLICA_FILES)')
+    parser.add_argument('--job-workers', type=int, default=2,
+                        help='потоков фоновых задач (0 — задача выполняется в самом запросе)')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='sisyphus-bench-')
+    main_db, analytics_db = os.path.join(workdir, 'pg.db'), os.path.join(workdir, 'ch.db')
+    copy_db(args.db, main_db)
+    copy_db(args.db, analytics_db)
+    ids, rows = sample_ids(main_db)
+
+    os.environ['FLASK_DATABASE_URL'] = f'sqlite:///{main_db}'
+    os.environ['FLASK_ANALYTICS_DATABASE_URL'] = f'sqlite:///{analytics_db}'
+    os.environ['FLASK_METRICS'] = 'true'
+    os.environ['FLASK_HTTP_CACHE'] = 'true' if args.http_cache else 'false'
+    os.environ['FLASK_JOB_WORKERS'] = str(args.job_workers)
+    os.environ['FLASK_STREAM_PAGES'] = 'false' if args.no_stream else 'true'
+    os.environ['FLASK_JOB_DIR'] = os.path.join(workdir, 'jobs')
+    # копии обновляет сам бенчмарк после каждой записи (settle), а не фоновый
+    # поток — иначе его SQL попадал бы в счётчики запросов сценариев
+    os.environ['FLASK_REPLICA_FILES'] = json.dumps(
+        [os.path.join(workdir, f'replica{n}.db') for n in range(args.replicas)])
+    os.environ['FLASK_REPLICA_REFRESH'] = '0'
+    os.environ['FLASK_REPLICA_COPY_INTERVAL'] = '0'
+    os.environ['FLASK_REPLICA_MAX_LAG'] = '86400'
+    started = time.perf_counter()
+    import app as application
+    from queries import count_statements
+    from export import peak_rss_mb
+    app = application.create_app()
+    startup = time.perf_counter() - started
+    started = time.perf_counter()
+    backends = application.backends()
+    db_init = time.perf_counter() - started
+    backends.replicas.refresh()
+
+    def settle():
+        backends.jobs.wait()
+        backends.replicas.refresh()
+
+    read, write = scenarios(ids, args.backend)
+    adapter = app.url_map.bind('localhost')
+    covered = {adapter.match((s[2] if isinstance(s[2], str) else s[2](0)[0]).split('?')[0],
+                             method=s[1])[0] for s in read + write}
+    uncovered = sorted({r.endpoint for r in app.url_map.iter_rules()} - covered - {'static'})
+    if uncovered:
+        print(f'без сценария: {", ".join(uncovered)}', file=sys.stderr)
+    if args.only:
+        read = [s for s in read if re.search(args.only, s[0])]
+        write = [s for s in write if re.search(args.only, s[0])]
+
+    client = app.test_client()
+    client.get(f'/switch_db/{args.backend}')
+    engines = (backends.engine_pg, backends.engine_ch, *(r.engine for r in backends.replicas.replicas))
+    results = {}
+    for scenario in read + write:
+        runs = max(1, args.runs // 10) if 'heavy' in scenario[3:] else args.runs
+        results[scenario[0]] = r = measure(client, engines, count_statements, scenario,
+                                           runs, args.warmup, not args.no_memory,
+                                           settle if scenario in write else None)
+        print(f'{scenario[0]:32} p50 {r["p50_ms"]:8.2f} мс  p95 {r["p95_ms"]:8.2f} мс  '
+              f'SQL {r["statements"]:3}  HTTP {",".join(map(str, r["status"]))}', file=sys.stderr)
+
+    jobs = job_times(backends.jobs.recent(limit=10000))
+    for kind, r in jobs.items():
+        print(f'задача {kind:25} p50 {r["p50_ms"]:8.2f} мс  макс {r["max_ms"]:8.2f} мс  '
+              f'выполнено {r["done"]}, ошибок {r["failed"]}', file=sys.stderr)
+
+    commit, dirty = git_commit()
+    report = {
+        'commit':      commit,
+        'dirty':       dirty,
+        'created':     datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python':      platform.python_version(),
+        'sqlite':      sqlite3.sqlite_version,
+        'db':          os.path.abspath(args.db),
+        'rows':        rows,
+        'options':     {'runs': args.runs, 'warmup': args.warmup, 'backend': args.backend,
+                        'http_cache': args.http_cache, 'job_workers': args.job_workers,
+                        'stream_pages': not args.no_stream, 'replicas': args.replicas},
+        'startup_s':   round(startup, 2),
+        'db_init_s':   round(db_init, 2),
+        'uncovered':   uncovered,
+        'scenarios':   results,
+        'jobs':        jobs,
+    }
+    if args.cold_start:
+        report['cold_start'] = cold_start(args.cold_start)
+    if args.threads:
+        report['concurrency'] = stress(app, read, args.threads, args.runs, write, args.writers)
+    report['peak_rss_mb'] = round(peak_rss_mb(), 1)
+
+    old = None
+    if args.compare:
+        with open(args.compare) as fp:
+            old = json.load(fp)
+    print_table(report, old)
+    if 'concurrency' in report:
+        c = report['concurrency']
+        print(f'\n{c["threads"]} потоков чтения, {c["writers"]} записи: {c["rps"]} запросов/с, '
+              f'ошибок {c["error_count"]} (блокировок {c["locked"]}), RSS по раундам {c["rss_mb"]} МБ')
+    print(f'пиковый RSS {report["peak_rss_mb"]} МБ, старт приложения {report["startup_s"]} с, '
+          f'подключение БД {report["db_init_s"]} с')
+    if 'cold_start' in report:
+        print('холодный старт (мс, медиана): ' +
+              ', '.join(f'{name} {ms}' for name, ms in report['cold_start'].items()))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=1)
+    if old is not None:
+        problems = compare(old, report, args.threshold)
+        print(f'\nрегрессии относительно {old.get("commit", "?")[:12]}:' if problems
+              else f'\nрегрессий относительно {old.get("commit", "?")[:12]} нет')
+        for line in problems:
+            print('  ' + line)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,391 @@
 # app.py
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from flask import (
+    Flask, render_template, request, redirect, url_for, session, flash, g,
+    has_app_context, abort, jsonify, Response, stream_with_context, send_file,
+    make_response, get_template_attribute
+)
+from werkzeug.utils import secure_filename
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import sessionmaker, joinedload
 from models import (
-    Base,
     Package, Maintainer, ACL,
     PackageArchitecture, PackageUpdate,
     PackageGroup, Report
 )
+from queries import (
+    list_query, list_filters, list_sort, sort_column, row_select, stream_rows,
+    LIST_SORTS, VIEW_STATEMENT_BUDGET
+)
+from pagination import paginate, keyset_select, encode_cursor
+from migrate import migrate
+from db import make_engine, refresh_snapshot
+import search
+import stats
+import latest
+import workload
+import triage
+import lookups
+import export
+import archive
+import batch
+import jobs
+import replicas
+from metrics import init_metrics
+import versions
+import functools
+import json
+import os
+import tempfile
+import threading
 from datetime import datetime, date
 
 app = Flask(__name__)
 app.secret_key = 'secretkey'
-
-# Два SQLite-файла, переключается через session['db_type']
-engine_pg = create_engine('sqlite:///sisyphus_pg.db', echo=False)
-SessionPG = sessionmaker(bind=engine_pg)
-Base.metadata.create_all(engine_pg)
+# Тестовый режим: падать, если страница списка выполнила больше SQL-запросов,
+# чем указано в VIEW_STATEMENT_BUDGET (признак N+1 ленивых загрузок)
+app.config['CHECK_QUERY_BUDGET'] = False
+# Считать ли по умолчанию общее число строк в списках (COUNT(*) по фильтрам);
+# можно переопределить параметром ?count=0/1
+app.config['PAGINATION_COUNT'] = True
+# Подключение к БД и пул соединений; переопределяются переменными окружения
+# FLASK_DATABASE_URL, FLASK_DB_POOL_SIZE и т.д.
+app.config['DATABASE_URL']        = 'sqlite:///sisyphus_pg.db'
+# Аналитический бэкенд («ClickHouse» в меню): отдельная БД только для чтения,
+# наполняется копией основной (python db.py). Локально — второй SQLite-файл.
+app.config['ANALYTICS_DATABASE_URL'] = 'sqlite:///sisyphus_ch.db'
+app.config['DB_POOL_SIZE']        = 5
+app.config['DB_MAX_OVERFLOW']     = 10
+app.config['DB_POOL_TIMEOUT']     = 30
+app.config['SQLITE_BUSY_TIMEOUT'] = 5000
+# строк, читаемых из курсора за раз при потоковой выдаче /api/v1
+app.config['API_CHUNK']           = 1000
+app.config['EXPORT_CHUNK']        = 10000
+# ETag/304 для страниц чтения и кэш отрендеренного HTML (versions.py)
+app.config['HTTP_CACHE']          = True
+app.config['RENDER_CACHE_SIZE']   = 256
+# обновлений и баг-репортов на странице пакета до «Показать ещё»
+app.config['DETAIL_ROWS']         = 20
+# порог «без движения» для метрик /reports, если фильтр stale не задан (triage.py)
+app.config['STALE_DAYS']          = 90
+# Списки отдаются потоком: строки читаются из курсора пачками по
+# STREAM_CHUNK и уходят клиенту по мере рендера (stream_page)
+app.config['STREAM_PAGES']        = True
+app.config['STREAM_CHUNK']        = 100
+# Server-Timing, /debug/metrics и /metrics (metrics.py); SQL дольше
+# SLOW_QUERY_MS миллисекунд пишется в лог
+app.config['METRICS']             = False
+app.config['SLOW_QUERY_MS']       = 200
+# Фоновые задачи (jobs.py): потоков на процесс (0 — выполнять сразу в
+# запросе) и каталог для загруженных файлов импорта и готовых выгрузок
+app.config['JOB_WORKERS']         = 2
+app.config['JOB_DIR']             = 'jobs'
+# Реплики для чтения (replicas.py): GET-страницы, которые только читают,
+# обслуживаются ими, записи — всегда основная БД. REPLICA_FILES — SQLite-копии,
+# которые процесс сам обновляет из основной через backup API, REPLICA_URLS —
+# готовые реплики. Раз в REPLICA_REFRESH секунд реплики сверяются с основной
+# (0 — без фонового потока), копия переснимается не чаще раза в
+# REPLICA_COPY_INTERVAL секунд; отставшая дольше REPLICA_MAX_LAG секунд не читается.
+app.config['REPLICA_FILES']       = []
+app.config['REPLICA_URLS']        = []
+app.config['REPLICA_REFRESH']     = 5
+app.config['REPLICA_COPY_INTERVAL'] = 30
+app.config['REPLICA_MAX_LAG']     = 60
+# Сводные страницы (endpoint'ы из ANALYTICS_VIEWS) читают аналитическую
+# копию сами, без переключателя: пока клиент не выбрал БД явно и копия не
+# старше его последней записи (как у реплик). [] — только через switch_db
+app.config['ANALYTICS_VIEWS']     = ['index', 'list_workload']
+app.config.from_prefixed_env()
+
+class Backends:
+    """Движки обеих БД, фабрики сессий и очередь задач процесса (см. backends())."""
+
+    def __init__(self, config, logger):
+        # Основная (OLTP) БД принимает все записи; аналитическая — копия для чтения.
+        # Какая из них обслуживает списки, выбирается через session['db_type'];
+        # сводные страницы (ANALYTICS_VIEWS) читают копию и без него.
+        self.engine_pg = make_engine(config['DATABASE_URL'], config)
+        migrate(self.engine_pg, log=logger.info)
+        self.engine_ch = make_engine(config['ANALYTICS_DATABASE_URL'], config)
+        if not inspect(self.engine_ch).has_table('packages'):
+            refresh_snapshot(self.engine_pg, self.engine_ch)
+        # снимок мог быть снят более старой версией: без новых колонок и
+        # производных таблиц; совпала schema_version — это только init_*
+        migrate(self.engine_ch, log=logger.info)
+        # ревизия копии: снимок обновляет задача, ревизию — страница /jobs
+        self.analytics_revision = _copy_revision(self.engine_ch)
+        self.sessions = {'postgres':   sessionmaker(bind=self.engine_pg),
+                         'clickhouse': sessionmaker(bind=self.engine_ch)}
+        # реплики основной БД; пока фоновый поток их не проверил, всё читается с основной
+        self.replicas = replicas.make_pool(self.engine_pg, config, prepare=_init_derived, log=logger.error)
+        # задачи пишут только в основную БД; прерванные прошлым процессом —
+        # failed, ждавшие в очереди — запускаются заново
+        self.jobs = jobs.JobRunner(self.engine_pg, config['JOB_WORKERS'], log=logger.error)
+        self.jobs.recover()
+        # счётчики — после подготовки: Backends создаются в первом запросе,
+        # и его бюджет SQL и метрики не должны включать запросы recover()
+        for engine in (self.engine_pg, self.engine_ch, *(r.engine for r in self.replicas.replicas)):
+            event.listen(engine, 'before_cursor_execute', _count_statement)
+            metrics.listen(engine)
+        event.listen(self.engine_pg, 'commit', _committed)
+        event.listen(self.engine_pg, 'rollback', _rolled_back)
+        if self.replicas and config['REPLICA_REFRESH']:
+            self.replicas.start(config['REPLICA_REFRESH'])
+
+    def close(self):
+        self.replicas.stop()
+        self.jobs.wait()
+        for engine in (self.engine_pg, self.engine_ch, *(r.engine for r in self.replicas.replicas)):
+            engine.dispose()
+
+def _copy_revision(engine):
+    try:
+        with engine.connect() as conn:
+            return versions.revision(conn)
+    except DBAPIError:
+        return None   # копия без change_versions (например, ClickHouse)
+
+def _init_derived(engine):
+    # режимы поиска, сводок и т.п. запоминаются по engine (см. migrate)
+    for init in (search.init_search, stats.init_stats, latest.init_latest,
+                 workload.init_workload, triage.init_triage):
+        init(engine)
+
+_backends = None
+_backends_lock = threading.Lock()
+
+def backends():
+    """Backends процесса; создаются при первом обращении к БД.
+
+    Импорт app и create_app() файлов БД не открывают: тесты и скрипты,
+    которым нужен только app, не платят за подключение и сверку схемы,
+    а воркеры, форкнутые после импорта, заводят соединения каждый свои.
+    """
+    global _backends
+    if _backends is None:
+        with _backends_lock:
+            if _backends is None:
+                _backends = Backends(app.config, app.logger)
+    return _backends
+
+def close_backends():
+    """Дожидается задач и закрывает движки; следующий backends() создаст их по app.config заново."""
+    global _backends
+    with _backends_lock:
+        if _backends is not None:
+            _backends.close()
+            _backends = None
+    lookups.invalidate()
+
+def create_app(config=None):
+    """Возвращает app с config поверх значений по умолчанию и FLASK_*.
+
+    Точка входа WSGI: gunicorn 'app:create_app()'. Приложение одно на
+    процесс: маршруты и хуки (в том числе metrics) регистрируются при
+    импорте, а config только меняет их поведение. Менять config можно до
+    первого обращения к БД — движки создаются по нему один раз (или после
+    close_backends()); кэш страниц и метрики при этом начинаются заново.
+    """
+    global render_cache
+    if config:
+        if _backends is not None:
+            raise RuntimeError('create_app(config) после первого обращения к БД')
+        app.config.update(config)
+        render_cache = versions.RenderCache(app.config['RENDER_CACHE_SIZE'])
+        metrics.reset(app.config['SLOW_QUERY_MS'], app.config.get('SLOW_QUERY_LOG', 100))
+    return app
+
+BACKENDS = ('postgres', 'clickhouse')
 
 def get_db():
-    return SessionCH() if session.get('db_type') == 'clickhouse' else SessionPG()
+    # одна сессия на запрос: создаётся при первом обращении,
+    # закрывается в close_db по завершении контекста приложения.
+    # Всегда основная БД — через неё идут все записи.
+    if 'db' not in g:
+        g.db = backends().sessions['postgres']()
+    return g.db
+
+def get_read_db():
+    # сессия выбранного бэкенда для страниц, которые только читают; на
+    # основном бэкенде GET читает с реплики, если есть достаточно свежая.
+    # Выбор делается раз на запрос: ETag и страница — из одной и той же БД
+    if 'read_db' not in g:
+        if session.get('db_type') == 'clickhouse' or _analytics_view():
+            g.read_db = backends().sessions['clickhouse']()
+        else:
+            replica = None
+            if request.method in ('GET', 'HEAD'):
+                replica = backends().replicas.pick(session.get('revision', 0))
+            g.read_db = replica.session() if replica is not None else get_db()
+    return g.read_db
+
+def _analytics_view():
+    # сводная страница (ANALYTICS_VIEWS) без явного выбора БД: копия годится,
+    # если в ней уже есть всё, что записал этот клиент
+    if request.endpoint not in app.config['ANALYTICS_VIEWS'] or 'db_type' in session:
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return (backends().analytics_revision or 0) >= session.get('revision', 0)
+
+def _close_sessions(store, exc=None):
+    for key in ('db', 'read_db'):
+        db = store.pop(key, None)
+        if db is not None:
+            if exc is not None:
+                db.rollback()
+            db.close()
+
+@app.teardown_appcontext
+def close_db(exc):
+    # у потоковой страницы строки читаются уже после выхода из view —
+    # её сессии закрывает stream_response, когда ответ отдан
+    if not g.get('streaming'):
+        _close_sessions(g, exc)
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.statements = g.get('statements', 0) + 1
+
+def _committed(conn):
+    # ревизия, которую записала закоммиченная транзакция (versions.bump);
+    # conn.info живёт с DBAPI-соединением, поэтому снимается и при откате
+    revision = conn.info.pop('revision', None)
+    if revision is not None and has_app_context():
+        g.revision = max(revision, g.get('revision', 0))
+
+def _rolled_back(conn):
+    conn.info.pop('revision', None)
+
+# хуки подключены всегда и включаются по app.config['METRICS']
+metrics = init_metrics(app)
+
+def _check_budget():
+    budget = VIEW_STATEMENT_BUDGET.get(request.endpoint)
+    if app.config['CHECK_QUERY_BUDGET'] and budget is not None:
+        used = g.get('statements', 0)
+        assert used <= budget, f'{request.endpoint}: {used} SQL-запросов при лимите {budget}'
+
+@app.after_request
+def check_query_budget(response):
+    # потоковая страница читает БД во время отдачи — проверяется в конце потока
+    if not response.is_streamed:
+        _check_budget()
+    return response
+
+@app.after_request
+def remember_revision(response):
+    # чтение своих записей: после запроса, закоммитившего запись (любым
+    # методом — удаления идут GET'ом), следующие GET этого клиента идут на
+    # реплику (и сводные страницы — на аналитическую копию), только когда
+    # она догонит основную (replicas.py)
+    if g.get('revision') and _backends is not None and (_backends.replicas or app.config['ANALYTICS_VIEWS']):
+        session['revision'] = g.revision
+    return response
+
+render_cache = versions.RenderCache(app.config['RENDER_CACHE_SIZE'])
+
+STREAM_ERROR = ('<div class="alert alert-danger" role="alert">'
+                'Ошибка при чтении данных: список выше неполон. Обновите страницу.</div>')
+
+def stream_page(template, **context):
+    """render_template, отдающий HTML по частям (Jinja generate()).
+
+    Списки с paginate(stream=True) читают строки из курсора по ходу рендера:
+    первый байт уходит до того, как прочитана страница, и память не растёт
+    с числом строк. При STREAM_PAGES = False — обычный render_template.
+    """
+    if not app.config['STREAM_PAGES']:
+        return render_template(template, **context)
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template).stream(context)
+    # без буфера каждый фрагмент шаблона — отдельный write()
+    stream.enable_buffering(64)
+
+    def generate():
+        try:
+            yield from stream
+        except Exception:
+            # статус 200 уже ушёл: страница обрывается с пометкой, а исключение
+            # идёт дальше — сервер рвёт ответ без завершающего чанка, и
+            # неполный HTML не попадает ни в render_cache, ни в кэши по пути
+            app.logger.exception('ошибка при отдаче %s', request.full_path)
+            yield STREAM_ERROR
+            raise
+        _check_budget()
+
+    return stream_response(generate(), mimetype='text/html')
+
+def stream_response(chunks, **kwargs):
+    """Response, отдающий chunks потоком (страницы, API, выгрузки).
+
+    Сессии запроса закрываются, когда ответ отдан: teardown приходит раньше,
+    чем генератор дочитает курсор, и сессия, которую чтение открыло бы
+    заново, осталась бы с соединением из пула.
+    """
+    g.streaming = True
+    response = Response(stream_with_context(chunks), **kwargs)
+    response.call_on_close(functools.partial(_close_sessions, g._get_current_object()))
+    return response
+
+def _cached_stream(chunks, etag):
+    # потоковая страница попадает в render_cache, если дочитана до конца
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    render_cache.put(etag, ''.join(body))
+
+def conditional(*tables, package=None, dated=False):
+    """ETag страницы из версий tables (и пакета из аргумента package маршрута).
+
+    dated — страница зависит от сегодняшней даты (фильтр «без движения» и
+    метрики triage.py): дата входит в ETag и ключ render_cache.
+
+    Совпал If-None-Match — 304 без обращения к ORM; иначе HTML берётся из
+    render_cache или рендерится и кладётся туда. Пока в сессии ждут
+    flash-сообщения, страница не кэшируется — они выводятся в layout.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if not app.config['HTTP_CACHE'] or '_flashes' in session:
+                return view(**kwargs)
+            keys = list(tables)
+            if package:
+                keys.append(versions.package_key(kwargs[package]))
+            current = versions.current(get_read_db(), keys)
+            etag = versions.etag(request.full_path, session.get('db_type'), sorted(current.items()),
+                                 triage.today() if dated else None)
+
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                body = render_cache.get(etag)
+                if body is None:
+                    body = view(**kwargs)
+                    if isinstance(body, Response) and body.is_streamed:
+                        if '_flashes' not in session:
+                            body.response = _cached_stream(body.response, etag)
+                    elif not isinstance(body, str):
+                        return body              # редирект и т.п.
+                    elif '_flashes' not in session:
+                        render_cache.put(etag, body)
+                response = make_response(body)
+            response.set_etag(etag)
+            response.last_modified = versions.last_modified(current)
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
 
 # Константы для баг-репортов
 STATUSES    = ['NEW','UNCONFIRMED','CONFIRMED','IN_PROGRESS','RESOLVED','VERIFIED','CLOSED']
 ARCHITECTURE_OPTIONS = ['i586','x86_64','aarch64','armh','noarch']
 RESOLUTIONS = ['', 'FIXED','INVALID','WONTFIX','DUPLICATE','WORKSFORME','MOVED','NOTABUG','NOTOURBUG','INSUFFICIENTDATA']
+# варианты фильтра «без движения дольше N дней» на /reports
+STALE_CHOICES = [30, 90, 180, 365]
 # Список групп (как в вашей спецификации)
 PREDEFINED_GROUPS = [
     "Accessibility","Archiving/Backup","Archiving/Cd burning","Archiving/Compression",
@@ -64,44 +424,221 @@ PREDEFINED_GROUPS = [
 DATE_MIN = date(2001, 1, 1)
 
 @app.route('/')
+@conditional('architectures', 'package_groups', 'package_updates', 'reports', 'maintainers')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', stats=stats.dashboard(get_read_db()))
 
 @app.route('/switch_db/<db>')
 def switch_db(db):
-    session['db_type'] = 'postgresql'
-    return redirect(url_for('index'))
+    if db not in BACKENDS:
+        flash(f'Неизвестная БД «{db}»', 'danger')
+    else:
+        session['db_type'] = db
+    return redirect(request.referrer or url_for('index'))
+
+
+# --- ПОИСК по пакетам, changelog'ам и баг-репортам ---
+SEARCH_KINDS = [('package','Пакеты'), ('update','Обновления'), ('report','Баг-репорты')]
+
+@app.route('/search')
+def search_view():
+    db = get_read_db()
+    q     = request.args.get('q','').strip()
+    kinds = request.args.getlist('kind') or [k for k, _ in SEARCH_KINDS]
+    results = search.resolve(db, search.search(db, q, kinds)) if q else []
+    return render_template('search.html',
+        q=q,
+        kinds=kinds,
+        kind_options=SEARCH_KINDS,
+        results=results,
+        mode=search.search_mode(db)
+    )
+
+@app.route('/api/lookup/<kind>')
+def lookup_suggest(kind):
+    if kind not in lookups.KINDS:
+        abort(404)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    items = lookups.suggest(get_read_db(), kind, request.args.get('q', ''), limit)
+    return jsonify([{'id': item[0], 'label': item[1]} for item in items])
+
+app.jinja_env.globals['lookup_get'] = lambda kind, id: lookups.get(get_read_db(), kind, id)
+
+
+# --- JSON API (только чтение) ---
+# Те же параметры фильтров и сортировки, что и у HTML-списков. Строки
+# читаются из курсора пачками по API_CHUNK и сразу уходят клиенту —
+# NDJSON (по умолчанию) или JSON-массив (?format=json), так что выгрузка
+# целой таблицы идёт в постоянной памяти. С ?limit=N — страница из N строк
+# и заголовок Link: <…&cursor=…>; rel="next" (keyset, как у HTML-списков).
+API_RESOURCES = {
+    'packages':      Package,
+    'maintainers':   Maintainer,
+    'updates':       PackageUpdate,
+    'reports':       Report,
+    'acl':           ACL,
+    'groups':        PackageGroup,
+    'architectures': PackageArchitecture,
+}
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+def _ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=_json_default) + '\n'
+
+def _json_array(rows):
+    yield '['
+    sep = ''
+    for row in rows:
+        yield sep + json.dumps(row, ensure_ascii=False, default=_json_default)
+        sep = ',\n'
+    yield ']\n'
+
+@app.route('/api/v1/<resource>')
+def api_list(resource):
+    model = API_RESOURCES.get(resource)
+    if model is None:
+        abort(404)
+    db = get_read_db()
+    conditions, _ = list_filters(db, model, request.args)
+    sort_by, sort_dir = list_sort(model, request.args)
+
+    sort_col, pk_col = sort_column(model, sort_by), getattr(model, LIST_SORTS[model][0])
+    try:
+        stmt = keyset_select(row_select(model).where(*conditions), sort_col, pk_col, sort_dir,
+                             request.args.get('cursor'))
+    except ValueError as e:
+        abort(400, str(e))
+    headers = {}
+    limit = request.args.get('limit', type=int)
+    if limit and limit > 0:
+        # граница страницы — отдельным запросом по ключам: ссылка на следующую
+        # уходит в заголовке до первой строки, а строки всё так же потоком
+        bound = db.execute(stmt.with_only_columns(sort_col, pk_col).offset(limit - 1).limit(2)).all()
+        if len(bound) == 2:
+            args = {**request.args.to_dict(), 'cursor': encode_cursor(*bound[0], 'next')}
+            headers['Link'] = f'<{url_for("api_list", resource=resource, **args)}>; rel="next"'
+        stmt = stmt.limit(limit)
+
+    rows = stream_rows(db, stmt, app.config['API_CHUNK'])
+    if request.args.get('format') == 'json':
+        return stream_response(_json_array(rows), mimetype='application/json', headers=headers)
+    return stream_response(_ndjson(rows), mimetype='application/x-ndjson', headers=headers)
+
+# Выгрузка таблицы файлом: /export/updates?format=csv.gz&joined=1&package_id=…
+# CSV отдаётся потоком; Parquet пишется во временный файл (формату нужен
+# seek для футера) и отправляется целиком.
+@app.route('/export/<resource>')
+def export_table(resource):
+    model = export.TABLES.get(resource)
+    fmt = request.args.get('format', 'csv')
+    if model is None or fmt not in export.FORMATS:
+        abort(404)
+    db = get_read_db()
+    conditions, _ = list_filters(db, model, request.args)
+    stmt = export.export_select(model, bool(request.args.get('joined')), conditions)
+    filename = f'{resource}.{fmt}'
+
+    if fmt == 'parquet':
+        out = tempfile.TemporaryFile()
+        try:
+            export.write_export(out, fmt, db, stmt, app.config['EXPORT_CHUNK'])
+        except RuntimeError as e:
+            out.close()
+            abort(501, str(e))
+        out.seek(0)
+        return send_file(out, mimetype=export.FORMATS[fmt], as_attachment=True, download_name=filename)
+
+    keys, parts = export.partitions(db, stmt, app.config['EXPORT_CHUNK'])
+    chunks = export.csv_chunks(keys, parts)
+    if fmt == 'csv.gz':
+        chunks = export.gzip_chunks(chunks)
+    return stream_response(chunks, mimetype=export.FORMATS[fmt],
+                           headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 
 # --- MAINTAINERS CRUD w/ filter & sort ---
 @app.route('/maintainers')
+@conditional('maintainers')
 def list_maintainers():
-    db = get_db()
-    f_id    = request.args.get('maintainer_id','').strip()
-    f_nick  = request.args.get('nickname','').strip()
-    f_full  = request.args.get('full_name','').strip()
-    sort_by  = request.args.get('sort_by','maintainer_id')
-    sort_dir = request.args.get('sort_dir','asc')
-
-    q = db.query(Maintainer)
-    if f_id:
-        try: q = q.filter(Maintainer.maintainer_id == int(f_id))
-        except: pass
-    if f_nick:
-        q = q.filter(Maintainer.nickname.contains(f_nick))
-    if f_full:
-        q = q.filter(Maintainer.full_name.contains(f_full))
-
-    if sort_by in ['maintainer_id','nickname','full_name']:
-        col = getattr(Maintainer, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
-
-    return render_template('maintainers.html',
-        maintainers=q.all(),
-        filters={'maintainer_id':f_id,'nickname':f_nick,'full_name':f_full},
+    db = get_read_db()
+    conditions, filters = list_filters(db, Maintainer, request.args)
+    sort_by, sort_dir = list_sort(Maintainer, request.args)
+
+    q = db.query(Maintainer).filter(*conditions)
+    page = paginate(q, getattr(Maintainer, sort_by), Maintainer.maintainer_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'], chunk=app.config['STREAM_CHUNK'])
+
+    return stream_page('maintainers.html',
+        maintainers=page.items,
+        page=page,
+        filters=filters,
+        sort={'by':sort_by,'dir':sort_dir}
+    )
+
+# Нагрузка мейнтейнеров: счётчики из maintainer_workload (workload.py),
+# сортировка по индексу (колонка, maintainer_id) — без GROUP BY по acl/reports
+@app.route('/maintainers/workload')
+@conditional('maintainers', 'acl', 'reports', 'package_updates')
+def list_workload():
+    db = get_read_db()
+    sort_by = request.args.get('sort_by', 'open_reports')
+    if sort_by not in workload.SORTS:
+        sort_by = 'open_reports'
+    sort_dir = 'asc' if request.args.get('sort_dir') == 'asc' else 'desc'
+
+    src = workload.source(db)
+    q = db.query(src).options(joinedload(src.maintainer, innerjoin=True))
+    page = paginate(q, getattr(src, sort_by), src.maintainer_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'], chunk=app.config['STREAM_CHUNK'])
+
+    return stream_page('workload.html',
+        rows=page.items,
+        page=page,
+        filters={},
         sort={'by':sort_by,'dir':sort_dir}
     )
 
+@app.route('/maintainers/<int:id>')
+@conditional('maintainers', 'acl', 'reports', 'package_updates')
+def maintainer_detail(id):
+    db = get_read_db()
+    m = db.get(Maintainer, id)
+    if not m:
+        flash('Мейнтейнер не найден', 'danger')
+        return redirect(url_for('list_maintainers'))
+
+    # по DETAIL_ROWS строк каждого вида, полные списки — ссылками на /acl,
+    # /updates и /reports с фильтром по мейнтейнеру
+    limit = app.config['DETAIL_ROWS']
+    package = joinedload(ACL.package, innerjoin=True).load_only(Package.name)
+    acl_entries = db.query(ACL).options(package).filter(ACL.maintainer_id == id)\
+                    .order_by(ACL.role != 'owner', ACL.acl_id).limit(limit).all()
+    updates = db.query(PackageUpdate)\
+                .options(joinedload(PackageUpdate.package, innerjoin=True).load_only(Package.name))\
+                .filter(PackageUpdate.updater_id == id)\
+                .order_by(PackageUpdate.update_date.desc(), PackageUpdate.update_id.desc())\
+                .limit(limit).all()
+    bugs = db.query(Report)\
+             .options(joinedload(Report.package, innerjoin=True).load_only(Package.name))\
+             .filter(Report.assignee_id == id, Report.resolution == '')\
+             .order_by(Report.id.desc()).limit(limit).all()
+    by_status = dict(workload.open_by_status(db, id))
+
+    return render_template('maintainer_detail.html',
+                           m=m,
+                           load=workload.get(db, id),
+                           open_by_status=[(s, by_status[s]) for s in STATUSES if by_status.get(s)],
+                           acl_entries=acl_entries,
+                           updates=updates,
+                           bugs=bugs)
+
 @app.route('/maintainers/add', methods=['GET','POST'])
 def add_maintainer():
     db = get_db()
@@ -152,30 +689,21 @@ def delete_maintainer(id):
 
 # --- PACKAGES CRUD w/ filter & sort ---
 @app.route('/packages')
+@conditional('packages', 'package_updates')
 def list_packages():
-    db = get_db()
-    f_id   = request.args.get('package_id','').strip()
-    f_name = request.args.get('name','').strip()
-    f_desc = request.args.get('description','').strip()
-    sort_by  = request.args.get('sort_by','package_id')
-    sort_dir = request.args.get('sort_dir','asc')
-
-    q = db.query(Package)
-    if f_id:
-        try: q = q.filter(Package.package_id == int(f_id))
-        except: pass
-    if f_name:
-        q = q.filter(Package.name.contains(f_name))
-    if f_desc:
-        q = q.filter(Package.description.contains(f_desc))
-
-    if sort_by in ['package_id','name','description']:
-        col = getattr(Package, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
+    db = get_read_db()
+    conditions, filters = list_filters(db, Package, request.args)
+    sort_by, sort_dir = list_sort(Package, request.args)
+
+    q = db.query(Package).filter(*conditions)
+    page = paginate(q, getattr(Package, sort_by), Package.package_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'])
 
     return render_template('packages.html',
-        packages=q.all(),
-        filters={'package_id':f_id,'name':f_name,'description':f_desc},
+        packages=page.items,
+        latest=latest.for_packages(db, [p.package_id for p in page.items]),
+        page=page,
+        filters=filters,
         sort={'by':sort_by,'dir':sort_dir}
     )
 
@@ -217,50 +745,67 @@ def complex_add_package():
         if not version:     errors.append('Версия обязательна')
         if not date_s:      errors.append('Дата обновления обязательна')
         if not changelog:   errors.append('Описание обновления обязательно')
+        if grp and grp not in PREDEFINED_GROUPS:
+            errors.append('Выберите группу из списка')
+        if not set(archs) <= set(ARCHITECTURE_OPTIONS):
+            errors.append('Выберите архитектуры из списка')
+
+        # всё одной транзакцией: при ошибке не остаётся пакета без связей
+        if not errors:
+            try:
+                upd_date = datetime.fromisoformat(date_s)
+                # внешние ключи SQLite не проверяет — мейнтейнер проверяем сами
+                if db.get(Maintainer, int(man_id)) is None:
+                    raise ValueError(man_id)
+                # 1) создаём пакет; flush — чтобы получить package_id
+                pkg = Package(name=name, description=description)
+                db.add(pkg)
+                db.flush()
+                pid = pkg.package_id
+
+                # 2) ACL
+                db.add(ACL(package_id=pid, maintainer_id=int(man_id), role='owner'))
+
+                # 3) Группа
+                db.add(PackageGroup(package_id=pid, group_name=grp))
+
+                # 4) Архитектуры
+                for a in set(archs):
+                    db.add(PackageArchitecture(package_id=pid, architecture=a))
+
+                # 5) Первое обновление
+                db.add(PackageUpdate(
+                    package_id=pid,
+                    updater_id=int(man_id),
+                    update_version=version,
+                    update_date=upd_date,
+                    changelog=changelog
+                ))
+
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                errors.append(f'Пакет «{name}» уже существует')
+            except ValueError:
+                db.rollback()
+                errors.append('Неверная дата или сопровождающий')
 
         if errors:
             for msg in errors:
                 flash(msg, 'danger')
             return render_template(
                 'add_complex_package.html',
-                maintainers=db.query(Maintainer).all(),
+                maintainers=lookups.maintainers(db),
                 predefined_groups=PREDEFINED_GROUPS,
                 form_data=f
             )
-
-        # 1) создаём пакет
-        pkg = Package(name=name, description=description)
-        db.add(pkg); db.commit()
-        pid = pkg.package_id
-
-        # 2) ACL
-        db.add(ACL(package_id=pid, maintainer_id=int(man_id), role='owner'))
-
-        # 3) Группа
-        db.add(PackageGroup(package_id=pid, group_name=grp))
-
-        # 4) Архитектуры
-        for a in archs:
-            db.add(PackageArchitecture(package_id=pid, architecture=a))
-
-        # 5) Первое обновление
-        upd_date = datetime.fromisoformat(date_s)
-        db.add(PackageUpdate(
-            package_id=pid,
-            updater_id=int(man_id),
-            update_version=version,
-            update_date=upd_date,
-            changelog=changelog
-        ))
-
-        db.commit()
         flash('Пакет и все связи успешно созданы', 'success')
         return redirect(url_for('list_packages'))
 
     # GET-запрос — передаём пустой MultiDict, поддерживающий getlist
     return render_template(
         'add_complex_package.html',
-        maintainers=db.query(Maintainer).all(),
+        maintainers=lookups.maintainers(db),
         predefined_groups=PREDEFINED_GROUPS,
         form_data=request.form
     )
@@ -286,72 +831,107 @@ def edit_package(id):
             return redirect(url_for('list_packages'))
     return render_template('edit_package.html', pkg=pkg)
 
+# Каскадное удаление пакета с тысячами обновлений — фоновая задача
+# (jobs.delete_package): запрос только ставит её в очередь
 @app.route('/packages/delete/<int:id>')
 def delete_package(id):
     db = get_db()
-    pkg = db.query(Package).get(id)
-    if pkg:
-        db.delete(pkg)
-        db.commit()
+    if db.get(Package, id) is None:
+        flash('Пакет не найден', 'danger')
+        return redirect(url_for('list_packages'))
+    job_id = backends().jobs.submit('delete_package', package_id=id)
+    job = backends().jobs.status(job_id)
+    if job['status'] == 'done':
         flash('Пакет удалён', 'success')
+    elif job['status'] == 'failed':
+        flash(f'Пакет не удалён: {job["error"]}', 'danger')
     else:
-        flash('Пакет не найден', 'danger')
+        flash(f'Удаление пакета поставлено в очередь (задача #{job_id})', 'success')
     return redirect(url_for('list_packages'))
 
 @app.route('/packages/<int:id>')
+@conditional('maintainers', package='id')
 def package_detail(id):
-    db = get_db()
-    pkg = db.query(Package).get(id)
+    db = get_read_db()
+    # ACL, группы и архитектуры у пакета короткие — грузим их вместе с
+    # пакетом одним SELECT'ом (LEFT JOIN), никнеймы мейнтейнеров тоже
+    pkg = db.query(Package).options(
+        joinedload(Package.acl_entries).joinedload(ACL.maintainer, innerjoin=True)
+                                       .load_only(Maintainer.nickname),
+        joinedload(Package.groups),
+        joinedload(Package.architectures),
+    ).filter(Package.package_id == id).first()
     if not pkg:
         flash('Пакет не найден', 'danger')
         return redirect(url_for('list_packages'))
 
-    acl_entries   = db.query(ACL).filter_by(package_id=id).all()
-    architectures = db.query(PackageArchitecture).filter_by(package_id=id).all()
-    groups        = db.query(PackageGroup).filter_by(package_id=id).all()
-    updates       = db.query(PackageUpdate)\
-                        .filter_by(package_id=id)\
-                        .order_by(PackageUpdate.update_date.desc())\
-                        .all()
-    bugs          = db.query(Report).filter_by(package_id=id).all()
-
+    # changelog и баг-репорты бывают тысячами — первая страница здесь,
+    # остальное по кнопке «Показать ещё»
     return render_template('package_detail.html',
                            pkg=pkg,
-                           acl_entries=acl_entries,
-                           architectures=architectures,
-                           groups=groups,
-                           updates=updates,
-                           bugs=bugs)
+                           acl_entries=pkg.acl_entries,
+                           architectures=pkg.architectures,
+                           groups=pkg.groups,
+                           updates=_package_updates(db, id),
+                           bugs=_package_reports(db, id))
+
+def _detail_args():
+    return {'per_page': app.config['DETAIL_ROWS'], 'cursor': request.args.get('cursor', '')}
+
+def _package_updates(db, id):
+    q = db.query(PackageUpdate).filter(PackageUpdate.package_id == id)
+    page = paginate(q, PackageUpdate.update_date, PackageUpdate.update_id, 'desc',
+                    _detail_args(), count_default=False)
+    # живые строки кончились — дальше по кнопке читается архив (archive.py)
+    page.archived = archive.summary(db, id)[0] if not page.next_cursor else 0
+    return page
+
+def _package_reports(db, id):
+    q = db.query(Report).options(joinedload(Report.assignee, innerjoin=True)
+                                 .load_only(Maintainer.nickname))\
+                        .filter(Report.package_id == id)
+    return paginate(q, Report.id, Report.id, 'desc', _detail_args(), count_default=False)
+
+# Следующие страницы для «Показать ещё»: строки таблицы и новая кнопка
+@app.route('/packages/<int:id>/updates')
+@conditional(package='id')
+def package_updates(id):
+    rows = get_template_attribute('_package_rows.html', 'update_rows')
+    if request.args.get('archive'):
+        items, cursor = archive.package_rows(get_read_db(), id, request.args.get('archive_cursor', type=int))
+        more = get_template_attribute('_package_rows.html', 'load_archive')
+        return rows(items, archived=True) + more(id, cursor, 'updates-rows')
+    page = _package_updates(get_read_db(), id)
+    more = get_template_attribute('_package_rows.html', 'load_more')
+    return rows(page.items) + more('package_updates', id, page, 'updates-rows')
+
+@app.route('/packages/<int:id>/reports')
+@conditional('maintainers', package='id')
+def package_reports(id):
+    page = _package_reports(get_read_db(), id)
+    rows = get_template_attribute('_package_rows.html', 'bug_rows')
+    more = get_template_attribute('_package_rows.html', 'load_more')
+    return rows(page.items) + more('package_reports', id, page, 'bugs-rows')
 
 
 # --- ARCHITECTURES CRUD w/ filter & sort ---
 @app.route('/architectures')
+@conditional('architectures', 'packages')
 def list_architectures():
-    db = get_db()
-    f_id    = request.args.get('arch_id','').strip()
-    f_pkg   = request.args.get('package_id','').strip()
-    f_arch  = request.args.get('architecture','').strip()
-    sort_by  = request.args.get('sort_by','arch_id')
-    sort_dir = request.args.get('sort_dir','asc')
-
-    q = db.query(PackageArchitecture)
-    if f_id:
-        try: q = q.filter(PackageArchitecture.arch_id == int(f_id))
-        except: pass
-    if f_pkg:
-        try: q = q.filter(PackageArchitecture.package_id == int(f_pkg))
-        except: pass
-    if f_arch:
-        q = q.filter(PackageArchitecture.architecture.contains(f_arch))
-
-    if sort_by in ['arch_id','package_id','architecture']:
-        col = getattr(PackageArchitecture, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
-
-    return render_template('architectures.html',
-        archs=q.all(),
-        packages=db.query(Package).all(),
-        filters={'arch_id':f_id,'package_id':f_pkg,'architecture':f_arch},
+    db = get_read_db()
+    conditions, filters = list_filters(db, PackageArchitecture, request.args)
+    sort_by, sort_dir = list_sort(PackageArchitecture, request.args)
+
+    q = list_query(db, PackageArchitecture).filter(*conditions)
+    page = paginate(q, getattr(PackageArchitecture, sort_by), PackageArchitecture.arch_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'], chunk=app.config['STREAM_CHUNK'])
+
+    return stream_page('architectures.html',
+        archs=page.items,
+        page=page,
+        packages=lookups.packages(db),
+        filters=filters,
         sort={'by':sort_by,'dir':sort_dir}
     )
 
@@ -368,13 +948,16 @@ def add_architecture():
             errors.append('Поле «Пакет» обязательно')
         if arch not in ARCHITECTURE_OPTIONS:
             errors.append('Выберите одну из предложенных архитектур')
+        elif pkg_id and db.query(PackageArchitecture)\
+                .filter_by(package_id=int(pkg_id), architecture=arch).first():
+            errors.append(f'Архитектура «{arch}» уже указана для этого пакета')
         if errors:
             for msg in errors:
                 flash(msg, 'danger')
             # при ошибках рендерим с сохранёнными данными
             return render_template(
                 'add_architecture.html',
-                packages=db.query(Package).all(),
+                packages=lookups.packages(db),
                 arch_options=ARCHITECTURE_OPTIONS,
                 form_data=form
             )
@@ -387,7 +970,7 @@ def add_architecture():
     # GET — передаём пустой MultiDict, поддерживает get()
     return render_template(
         'add_architecture.html',
-        packages=db.query(Package).all(),
+        packages=lookups.packages(db),
         arch_options=ARCHITECTURE_OPTIONS,
         form_data=form
     )
@@ -407,32 +990,22 @@ def delete_architecture(id):
 
 # --- GROUPS CRUD w/ filter & sort ---
 @app.route('/groups')
+@conditional('package_groups', 'packages')
 def list_groups():
-    db = get_db()
-    f_id    = request.args.get('group_id','').strip()
-    f_pkg   = request.args.get('package_id','').strip()
-    f_name  = request.args.get('group_name','').strip()
-    sort_by  = request.args.get('sort_by','group_id')
-    sort_dir = request.args.get('sort_dir','asc')
-
-    q = db.query(PackageGroup)
-    if f_id:
-        try: q = q.filter(PackageGroup.group_id == int(f_id))
-        except: pass
-    if f_pkg:
-        try: q = q.filter(PackageGroup.package_id == int(f_pkg))
-        except: pass
-    if f_name:
-        q = q.filter(PackageGroup.group_name.contains(f_name))
-
-    if sort_by in ['group_id','package_id','group_name']:
-        col = getattr(PackageGroup, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
-
-    return render_template('groups.html',
-        groups=q.all(),
-        packages=db.query(Package).all(),
-        filters={'group_id':f_id,'package_id':f_pkg,'group_name':f_name},
+    db = get_read_db()
+    conditions, filters = list_filters(db, PackageGroup, request.args)
+    sort_by, sort_dir = list_sort(PackageGroup, request.args)
+
+    q = list_query(db, PackageGroup).filter(*conditions)
+    page = paginate(q, getattr(PackageGroup, sort_by), PackageGroup.group_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'], chunk=app.config['STREAM_CHUNK'])
+
+    return stream_page('groups.html',
+        groups=page.items,
+        page=page,
+        packages=lookups.packages(db),
+        filters=filters,
         sort={'by':sort_by,'dir':sort_dir}
     )
 
@@ -449,7 +1022,7 @@ def add_group():
             db.commit()
             flash('Группа пакета добавлена', 'success')
             return redirect(url_for('list_groups'))
-    return render_template('add_group.html', packages=db.query(Package).all())
+    return render_template('add_group.html', packages=lookups.packages(db), form_data=request.form)
 
 @app.route('/groups/delete/<int:id>')
 def delete_group(id):
@@ -466,46 +1039,36 @@ def delete_group(id):
 
 # --- UPDATES CRUD w/ filter & sort & date constraint ---
 @app.route('/updates')
+@conditional('package_updates', 'packages', 'maintainers')
 def list_updates():
-    db = get_db()
-    f_id      = request.args.get('update_id','').strip()
-    f_pkg     = request.args.get('package_id','').strip()
-    f_man     = request.args.get('updater_id','').strip()
-    f_ver     = request.args.get('update_version','').strip()
-    f_date    = request.args.get('update_date','').strip()
-    sort_by   = request.args.get('sort_by','update_id')
-    sort_dir  = request.args.get('sort_dir','asc')
-
-    q = db.query(PackageUpdate)
-    if f_id:
-        try: q = q.filter(PackageUpdate.update_id == int(f_id))
-        except: pass
-    if f_pkg:
-        try: q = q.filter(PackageUpdate.package_id == int(f_pkg))
-        except: pass
-    if f_man:
-        try: q = q.filter(PackageUpdate.updater_id == int(f_man))
-        except: pass
-    if f_ver:
-        q = q.filter(PackageUpdate.update_version.contains(f_ver))
-    if f_date:
-        try:
-            d = datetime.fromisoformat(f_date)
-            q = q.filter(PackageUpdate.update_date == d)
-        except: pass
-
-    if sort_by in ['update_id','package_id','updater_id','update_version','update_date']:
-        col = getattr(PackageUpdate, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
-
-    return render_template('updates.html',
-        updates=q.all(),
-        packages=db.query(Package).all(),
-        maintainers=db.query(Maintainer).all(),
-        filters={
-            'update_id':f_id,'package_id':f_pkg,'updater_id':f_man,
-            'update_version':f_ver,'update_date':f_date
-        },
+    db = get_read_db()
+    conditions, filters = list_filters(db, PackageUpdate, request.args)
+    sort_by, sort_dir = list_sort(PackageUpdate, request.args)
+
+    # архив хранится по пакетам — читается только при фильтре по пакету,
+    # после последней страницы живых строк; такой странице нужен next_cursor
+    # до рендера, поэтому она потоком не отдаётся
+    package_id = request.args.get('package_id', type=int)
+    q = list_query(db, PackageUpdate).filter(*conditions)
+    page = paginate(q, sort_column(PackageUpdate, sort_by), PackageUpdate.update_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'] and not package_id, chunk=app.config['STREAM_CHUNK'])
+
+    archived = None
+    if package_id and not page.next_cursor:
+        if request.args.get('archive'):
+            items, cursor = archive.package_rows(db, package_id, request.args.get('archive_cursor', type=int))
+            archived = {'items': [r for r in items if archive.matches(r, filters)], 'cursor': cursor}
+        else:
+            archived = {'count': archive.summary(db, package_id)[0]}
+
+    return stream_page('updates.html',
+        updates=page.items,
+        archived=archived,
+        page=page,
+        packages=lookups.packages(db),
+        maintainers=lookups.maintainers(db),
+        filters=filters,
         sort={'by':sort_by,'dir':sort_dir}
     )
 
@@ -538,8 +1101,8 @@ def add_update():
             for msg in errors:
                 flash(msg, 'danger')
             return render_template('add_update.html',
-                                   packages=db.query(Package).all(),
-                                   maintainers=db.query(Maintainer).all(),
+                                   packages=lookups.packages(db),
+                                   maintainers=lookups.maintainers(db),
                                    date_min=DATE_MIN.isoformat(),
                                    date_max=today_iso,
                                    form_data=request.form)
@@ -557,8 +1120,8 @@ def add_update():
         return redirect(url_for('list_updates'))
 
     return render_template('add_update.html',
-                           packages=db.query(Package).all(),
-                           maintainers=db.query(Maintainer).all(),
+                           packages=lookups.packages(db),
+                           maintainers=lookups.maintainers(db),
                            date_min=DATE_MIN.isoformat(),
                            date_max=date.today().isoformat(),
                            form_data={})
@@ -578,48 +1141,37 @@ def delete_update(id):
 
 # --- REPORTS CRUD w/ filter & sort & date constraint ---
 @app.route('/reports')
+@conditional('reports', 'packages', 'maintainers', dated=True)
 def list_reports():
-    db = get_db()
-    f_id    = request.args.get('report_id','').strip()
-    f_pkg   = request.args.get('package_id','').strip()
-    f_stat  = request.args.get('status','').strip()
-    f_res   = request.args.get('resolution','').strip()
-    f_assn  = request.args.get('assignee_id','').strip()
-    f_rep   = request.args.get('reporter','').strip()
-    sort_by = request.args.get('sort_by','id')
-    sort_dir= request.args.get('sort_dir','asc')
-
-    q = db.query(Report)
-    if f_id:
-        try: q = q.filter(Report.id == int(f_id))
-        except: pass
-    if f_pkg:
-        try: q = q.filter(Report.package_id == int(f_pkg))
-        except: pass
-    if f_stat:
-        q = q.filter(Report.status.contains(f_stat))
-    if f_res:
-        q = q.filter(Report.resolution.contains(f_res))
-    if f_assn:
-        try: q = q.filter(Report.assignee_id == int(f_assn))
-        except: pass
-    if f_rep:
-        q = q.filter(Report.reporter.contains(f_rep))
-
-    if sort_by in ['id','package_id','status','resolution','assignee_id','reporter','last_changed']:
-        col = getattr(Report, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
-
-    return render_template('reports.html',
-        reports=q.all(),
-        packages=db.query(Package).all(),
-        maintainers=db.query(Maintainer).all(),
+    db = get_read_db()
+    conditions, filters = list_filters(db, Report, request.args)
+    sort_by, sort_dir = list_sort(Report, request.args)
+
+    q = list_query(db, Report).filter(*conditions)
+    page = paginate(q, getattr(Report, sort_by), Report.id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'], chunk=app.config['STREAM_CHUNK'])
+
+    # при фильтре по пакету или исполнителю — его метрики из aging_metrics
+    aging = None
+    days = int(filters['stale']) if filters['stale'].isdigit() else app.config['STALE_DAYS']
+    for scope, param in (('package', 'package_id'), ('assignee', 'assignee_id')):
+        if filters[param].isdigit():
+            aging = triage.metrics(db, scope, int(filters[param]), days)
+            if aging:
+                aging.update(scope=scope, days=days)
+            break
+
+    return stream_page('reports.html',
+        reports=page.items,
+        page=page,
+        aging=aging,
+        stale_choices=STALE_CHOICES,
+        packages=lookups.packages(db),
+        maintainers=lookups.maintainers(db),
         statuses=STATUSES,
         resolutions=RESOLUTIONS,
-        filters={
-            'report_id':f_id,'package_id':f_pkg,'status':f_stat,
-            'resolution':f_res,'assignee_id':f_assn,'reporter':f_rep
-        },
+        filters=filters,
         sort={'by':sort_by,'dir':sort_dir}
     )
 
@@ -656,8 +1208,8 @@ def add_report():
             for msg in errors:
                 flash(msg, 'danger')
             return render_template('add_report.html',
-                packages=db.query(Package).all(),
-                maintainers=db.query(Maintainer).all(),
+                packages=lookups.packages(db),
+                maintainers=lookups.maintainers(db),
                 statuses=STATUSES,
                 resolutions=RESOLUTIONS,
                 date_min=DATE_MIN.isoformat(),
@@ -680,8 +1232,8 @@ def add_report():
         return redirect(url_for('list_reports'))
 
     return render_template('add_report.html',
-        packages=db.query(Package).all(),
-        maintainers=db.query(Maintainer).all(),
+        packages=lookups.packages(db),
+        maintainers=lookups.maintainers(db),
         statuses=STATUSES,
         resolutions=RESOLUTIONS,
         date_min=DATE_MIN.isoformat(),
@@ -728,8 +1280,8 @@ def edit_report(id):
                 flash(msg, 'danger')
             return render_template('edit_report.html',
                 report=rpt,
-                packages=db.query(Package).all(),
-                maintainers=db.query(Maintainer).all(),
+                packages=lookups.packages(db),
+                maintainers=lookups.maintainers(db),
                 statuses=STATUSES,
                 resolutions=RESOLUTIONS,
                 date_min=DATE_MIN.isoformat(),
@@ -749,8 +1301,9 @@ def edit_report(id):
 
     return render_template('edit_report.html',
         report=rpt,
-        packages=db.query(Package).all(),
-        maintainers=db.query(Maintainer).all(),
+        history=triage.history(db, id),
+        packages=lookups.packages(db),
+        maintainers=lookups.maintainers(db),
         statuses=STATUSES,
         resolutions=RESOLUTIONS,
         date_min=DATE_MIN.isoformat(),
@@ -772,37 +1325,23 @@ def delete_report(id):
 
 # --- ACL CRUD w/ filter & sort ---
 @app.route('/acl')
+@conditional('acl', 'packages', 'maintainers')
 def list_acl():
-    db = get_db()
-    f_id    = request.args.get('acl_id','').strip()
-    f_pkg   = request.args.get('package_id','').strip()
-    f_man   = request.args.get('maintainer_id','').strip()
-    f_role  = request.args.get('role','').strip()
-    sort_by = request.args.get('sort_by','acl_id')
-    sort_dir= request.args.get('sort_dir','asc')
-
-    q = db.query(ACL)
-    if f_id:
-        try: q = q.filter(ACL.acl_id == int(f_id))
-        except: pass
-    if f_pkg:
-        try: q = q.filter(ACL.package_id == int(f_pkg))
-        except: pass
-    if f_man:
-        try: q = q.filter(ACL.maintainer_id == int(f_man))
-        except: pass
-    if f_role:
-        q = q.filter(ACL.role.contains(f_role))
-
-    if sort_by in ['acl_id','package_id','maintainer_id','role']:
-        col = getattr(ACL, sort_by)
-        q = q.order_by(col.desc() if sort_dir=='desc' else col.asc())
-
-    return render_template('acl.html',
-        acl=q.all(),
-        packages=db.query(Package).all(),
-        maintainers=db.query(Maintainer).all(),
-        filters={'acl_id':f_id,'package_id':f_pkg,'maintainer_id':f_man,'role':f_role},
+    db = get_read_db()
+    conditions, filters = list_filters(db, ACL, request.args)
+    sort_by, sort_dir = list_sort(ACL, request.args)
+
+    q = list_query(db, ACL).filter(*conditions)
+    page = paginate(q, getattr(ACL, sort_by), ACL.acl_id, sort_dir,
+                    request.args, app.config['PAGINATION_COUNT'],
+                    stream=app.config['STREAM_PAGES'], chunk=app.config['STREAM_CHUNK'])
+
+    return stream_page('acl.html',
+        acl=page.items,
+        page=page,
+        packages=lookups.packages(db),
+        maintainers=lookups.maintainers(db),
+        filters=filters,
         sort={'by':sort_by,'dir':sort_dir}
     )
 
@@ -821,8 +1360,8 @@ def add_acl():
             flash('ACL-запись добавлена', 'success')
             return redirect(url_for('list_acl'))
     return render_template('add_acl.html',
-                           packages=db.query(Package).all(),
-                           maintainers=db.query(Maintainer).all())
+                           packages=lookups.packages(db),
+                           maintainers=lookups.maintainers(db))
 
 @app.route('/acl/edit/<int:id>', methods=['GET','POST'])
 def edit_acl(id):
@@ -846,8 +1385,8 @@ def edit_acl(id):
             return redirect(url_for('list_acl'))
     return render_template('edit_acl.html',
                            entry=entry,
-                           packages=db.query(Package).all(),
-                           maintainers=db.query(Maintainer).all())
+                           packages=lookups.packages(db),
+                           maintainers=lookups.maintainers(db))
 
 @app.route('/acl/delete/<int:id>')
 def delete_acl(id):
@@ -862,6 +1401,155 @@ def delete_acl(id):
     return redirect(url_for('list_acl'))
 
 
+# --- МЕТРИКИ (только при METRICS = True) ---
+@app.route('/debug/metrics')
+def debug_metrics():
+    if not app.config['METRICS']:
+        abort(404)
+    routes, slow, slow_total = metrics.snapshot()
+    return render_template('debug_metrics.html',
+                           routes=sorted(routes.items(), key=lambda kv: -kv[1]['seconds']),
+                           slow=[(datetime.fromtimestamp(at).strftime('%d.%m %H:%M:%S'), *rest)
+                                 for at, *rest in slow],
+                           slow_total=slow_total,
+                           slow_ms=app.config['SLOW_QUERY_MS'],
+                           uptime=datetime.now().timestamp() - metrics.started)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if not app.config['METRICS']:
+        abort(404)
+    return Response(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# --- МАССОВОЕ ДОБАВЛЕНИЕ архитектур, групп и ACL ---
+# раздел -> (заголовок, список для возврата, допустимые значения)
+BATCH_VIEWS = {
+    'architectures': ('Архитектуры',       'list_architectures', ARCHITECTURE_OPTIONS),
+    'groups':        ('Группы пакетов',    'list_groups',        PREDEFINED_GROUPS),
+    'acl':           ('ACL-записи',        'list_acl',           None),
+}
+
+@app.route('/<any(architectures, groups, acl):kind>/batch', methods=['GET','POST'])
+def batch_add(kind):
+    db = get_db()
+    title, list_endpoint, choices = BATCH_VIEWS[kind]
+    text = request.form.get('rows', '')
+    errors = []
+    if request.method == 'POST':
+        rows, errors = batch.validate(db, kind, batch.parse_lines(kind, text), choices)
+        if errors:
+            flash('Ничего не добавлено — исправьте ошибки в строках', 'danger')
+        elif not rows:
+            flash('Нет строк для добавления', 'danger')
+        else:
+            count = batch.insert_rows(db, kind, rows)
+            db.commit()
+            flash(f'Добавлено записей: {count}', 'success')
+            return redirect(url_for(list_endpoint))
+    return render_template('batch_add.html',
+                           kind=kind, title=title, list_endpoint=list_endpoint,
+                           choices=choices, text=text, errors=errors)
+
+# JSON: [{"package": "bash", "architecture": "x86_64"}, …] или {"rows": […]};
+# вместо имён можно передавать package_id / maintainer_id
+@app.route('/api/v1/<any(architectures, groups, acl):kind>/batch', methods=['POST'])
+def api_batch_add(kind):
+    data = request.get_json(silent=True)
+    rows = data.get('rows') if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        return jsonify(error='ожидается JSON-массив строк или {"rows": [...]}'), 400
+    if not rows:
+        return jsonify(error='нет строк для добавления'), 400
+    db = get_db()
+    rows, errors = batch.validate(db, kind, rows, BATCH_VIEWS[kind][2])
+    if errors:
+        return jsonify(inserted=0, errors=[{'row': n, 'error': msg} for n, msg in errors]), 422
+    count = batch.insert_rows(db, kind, rows)
+    db.commit()
+    return jsonify(inserted=count), 201
+
+
+# --- ФОНОВЫЕ ЗАДАЧИ ---
+# вид -> (название, поля формы)
+JOB_FORMS = {
+    'rebuild': ('Перестроить поиск, сводки и метрики', ()),
+    'export':  ('Выгрузить таблицу в файл',           ('table', 'fmt')),
+    'archive': ('Перенести старые обновления в архив', ('before', 'keep')),
+    'import':  ('Импорт pkglist/JSON',                ('file',)),
+    'refresh_analytics': ('Обновить аналитическую копию', ()),
+}
+
+def _job_params(kind, form, files):
+    if kind == 'export':
+        table, fmt = form.get('table'), form.get('fmt', 'csv.gz')
+        if table not in export.TABLES or fmt not in export.FORMATS:
+            raise ValueError('неизвестная таблица или формат')
+        return {'table': table, 'fmt': fmt, 'directory': app.config['JOB_DIR']}
+    if kind == 'archive':
+        params = {'before': form.get('before') or None,
+                  'keep': int(form['keep']) if form.get('keep') else None}
+        if params['before']:
+            date.fromisoformat(params['before'])
+        if params['before'] is None and params['keep'] is None:
+            raise ValueError('укажите дату и/или число последних обновлений')
+        return params
+    if kind == 'import':
+        upload = files.get('file')
+        if not upload or not upload.filename:
+            raise ValueError('выберите файл')
+        os.makedirs(app.config['JOB_DIR'], exist_ok=True)
+        path = os.path.join(app.config['JOB_DIR'], f'import-{datetime.now():%Y%m%d-%H%M%S}-'
+                                                   f'{secure_filename(upload.filename)}')
+        upload.save(path)
+        return {'paths': [path]}
+    if kind == 'refresh_analytics':
+        return {'url': app.config['ANALYTICS_DATABASE_URL']}
+    return {}
+
+def _analytics_revisions():
+    """(ревизия основной БД, ревизия аналитической копии) — насколько копия отстала."""
+    copy = backends().analytics_revision = _copy_revision(backends().engine_ch)
+    return versions.revision(get_db()), copy
+
+@app.route('/jobs', methods=['GET','POST'])
+def list_jobs():
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        if kind not in JOB_FORMS:
+            abort(400)
+        try:
+            job_id = backends().jobs.submit(kind, **_job_params(kind, request.form, request.files))
+        except ValueError as e:
+            flash(f'Задача не запущена: {e}', 'danger')
+        else:
+            flash(f'Задача #{job_id} поставлена в очередь', 'success')
+        return redirect(url_for('list_jobs'))
+    primary, copy = _analytics_revisions()
+    return render_template('jobs.html', jobs=backends().jobs.recent(), forms=JOB_FORMS,
+                           tables=export.TABLES, formats=export.FORMATS,
+                           revision=primary, analytics_revision=copy)
+
+@app.route('/api/v1/jobs/<int:job_id>')
+def job_status(job_id):
+    job = backends().jobs.status(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/download')
+def job_download(job_id):
+    job = backends().jobs.status(job_id)
+    if job is None or job['kind'] != 'export' or job['status'] != 'done':
+        abort(404)
+    path = job['result']['path']
+    # отдаём только файлы из каталога задач
+    if os.path.dirname(path) != os.path.abspath(app.config['JOB_DIR']) or not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype=export.FORMATS[job['params']['fmt']], as_attachment=True,
+                     download_name=os.path.basename(path))
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
 
@@ -0,0 +1,237 @@
+# archive.py
+#
+# Архив старых обновлений: записи package_updates старше горизонта (или
+# сверх последних N у пакета) переносятся в update_archive — пачками по
+# пакету, JSON + zlib в одном BLOB'е на до BLOB_ROWS строк.
+#
+#   python archive.py --older-than 730              # старше двух лет
+#   python archive.py --keep 50 --db sisyphus_pg.db # всё, кроме 50 последних у пакета
+#   python archive.py --older-than 365 --keep 20 --vacuum
+#   python archive.py --restore                     # вернуть всё обратно
+#
+# Заданы оба порога — в архив уходит только то, что старше горизонта И
+# не входит в N последних: у пакета всегда остаётся свежая история.
+# Архивные записи не попадают в поиск, сводки дашборда и выгрузки;
+# страница пакета и /updates?package_id=… дочитывают их после живых строк.
+# sync.py, заменяя changelog пакета целиком, удаляет и его архив.
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import date, timedelta
+
+from sqlalchemy import and_, create_engine, delete, func, insert, select
+from sqlalchemy.orm import aliased
+from models import Base, Package, PackageUpdate, UpdateArchive
+import versions
+
+# поля строки в BLOB'е (package_id хранится в колонке архива)
+FIELDS = ('update_id', 'updater_id', 'update_version', 'update_date', 'changelog')
+BLOB_ROWS = 500
+# пакетов на один проход выборки кандидатов
+CHUNK = 500
+
+
+def pack(rows):
+    """Список строк (кортежи в порядке FIELDS) -> сжатый BLOB."""
+    payload = [[uid, mid, ver, day.isoformat(), log] for uid, mid, ver, day, log in rows]
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode(), 9)
+
+def unpack(data, package_id):
+    """BLOB -> строки-словари с теми же ключами, что у PackageUpdate."""
+    rows = []
+    for uid, mid, ver, day, log in json.loads(zlib.decompress(data)):
+        rows.append({'update_id': uid, 'package_id': package_id, 'updater_id': mid,
+                     'update_version': ver, 'update_date': date.fromisoformat(day),
+                     'changelog': log})
+    return rows
+
+
+def candidates(pids, before=None, keep=None):
+    """SELECT архивируемых строк пакетов pids: по пакету от старых к новым."""
+    ranked = select(
+        PackageUpdate.package_id, *(getattr(PackageUpdate, f) for f in FIELDS),
+        func.row_number().over(partition_by=PackageUpdate.package_id,
+                               order_by=(PackageUpdate.update_date.desc(),
+                                         PackageUpdate.update_id.desc())).label('rank'),
+    ).where(PackageUpdate.package_id.in_(pids)).subquery()
+    conditions = []
+    if before is not None:
+        conditions.append(ranked.c.update_date < before)
+    if keep is not None:
+        conditions.append(ranked.c.rank > keep)
+    return select(ranked.c.package_id, *(ranked.c[f] for f in FIELDS))\
+        .where(and_(*conditions))\
+        .order_by(ranked.c.package_id, ranked.c.update_date, ranked.c.update_id)
+
+
+def archive_updates(conn, before=None, keep=None, blob_rows=BLOB_ROWS):
+    """Переносит строки в архив; возвращает статистику переноса."""
+    if before is None and keep is None:
+        raise ValueError('нужен горизонт (before) и/или число последних записей (keep)')
+    stats = {'rows': 0, 'packages': 0, 'blobs': 0, 'raw_bytes': 0, 'packed_bytes': 0}
+    pids = list(conn.execute(select(Package.package_id).order_by(Package.package_id)).scalars())
+    for i in range(0, len(pids), CHUNK):
+        by_package = {}
+        for pid, *row in conn.execute(candidates(pids[i:i + CHUNK], before, keep)):
+            by_package.setdefault(pid, []).append(row)
+        for pid, rows in by_package.items():
+            # старые пачки получают меньшие archive_id — новые идут первыми при ORDER BY DESC
+            for j in range(0, len(rows), blob_rows):
+                part = rows[j:j + blob_rows]
+                data = pack(part)
+                conn.execute(insert(UpdateArchive).values(
+                    package_id=pid, first_date=part[0][3], last_date=part[-1][3],
+                    row_count=len(part), data=data))
+                stats['blobs'] += 1
+                stats['packed_bytes'] += len(data)
+                stats['raw_bytes'] += sum(len(r[2]) + len(r[4].encode()) for r in part)
+            ids = [r[0] for r in rows]
+            for j in range(0, len(ids), CHUNK):
+                conn.execute(delete(PackageUpdate).where(PackageUpdate.update_id.in_(ids[j:j + CHUNK])))
+            stats['rows'] += len(rows)
+            stats['packages'] += 1
+    if stats['rows']:
+        versions.bump_bulk(conn)
+    return stats
+
+def restore_updates(conn, package_ids=None):
+    """Возвращает архив (всех пакетов или package_ids) в package_updates."""
+    stmt = select(UpdateArchive.archive_id).order_by(UpdateArchive.archive_id)
+    if package_ids is not None:
+        stmt = stmt.where(UpdateArchive.package_id.in_(package_ids))
+    restored = 0
+    # по одному BLOB'у за раз — архив целиком в память не читаем
+    for archive_id in conn.execute(stmt).scalars().all():
+        pid, data = conn.execute(select(UpdateArchive.package_id, UpdateArchive.data)
+                                 .where(UpdateArchive.archive_id == archive_id)).one()
+        rows = unpack(data, pid)
+        conn.execute(insert(PackageUpdate), rows)
+        conn.execute(delete(UpdateArchive).where(UpdateArchive.archive_id == archive_id))
+        restored += len(rows)
+    if restored:
+        versions.bump_bulk(conn)
+    return restored
+
+
+# --- чтение ---
+
+def summary(db, package_id):
+    """(число архивных записей, самая поздняя дата) пакета; (0, None) — архива нет."""
+    count, last = db.execute(select(func.sum(UpdateArchive.row_count), func.max(UpdateArchive.last_date))
+                             .where(UpdateArchive.package_id == package_id)).one()
+    return count or 0, last
+
+def package_rows(db, package_id, cursor=None):
+    """Одна пачка архива пакета, от новых к старым: (строки, курсор следующей пачки).
+
+    cursor — archive_id пачки, с которой продолжить (из прошлого вызова).
+    """
+    older = aliased(UpdateArchive)
+    next_id = select(func.max(older.archive_id))\
+        .where(older.package_id == package_id, older.archive_id < UpdateArchive.archive_id)\
+        .scalar_subquery()
+    stmt = select(UpdateArchive.data, next_id)\
+        .where(UpdateArchive.package_id == package_id)\
+        .order_by(UpdateArchive.archive_id.desc()).limit(1)
+    if cursor:
+        stmt = stmt.where(UpdateArchive.archive_id <= cursor)
+    found = db.execute(stmt).first()
+    if found is None:
+        return [], None
+    rows = unpack(found[0], package_id)
+    rows.sort(key=lambda r: (r['update_date'], r['update_id']), reverse=True)
+    return rows, found[1]
+
+
+def matches(row, filters):
+    """Фильтры формы /updates (значения из list_filters) для архивной строки."""
+    for key in ('update_id', 'updater_id'):
+        if filters.get(key) and str(row[key]) != filters[key]:
+            return False
+    if filters.get('update_version') and \
+            filters['update_version'].lower() not in row['update_version'].lower():
+        return False
+    if filters.get('update_date') and row['update_date'].isoformat() != filters['update_date']:
+        return False
+    return True
+
+
+# --- замеры ---
+
+def file_size(engine):
+    path = engine.url.database
+    return os.path.getsize(path) if path and os.path.exists(path) else None
+
+def query_times(engine, package_id=None):
+    """Время типичных запросов к package_updates, мс."""
+    queries = {
+        'count':         select(func.count()).select_from(PackageUpdate),
+        'scan_changelog': select(func.sum(func.length(PackageUpdate.changelog))),
+        'recent_page':   select(PackageUpdate).order_by(PackageUpdate.update_date.desc(),
+                                                        PackageUpdate.update_id.desc()).limit(50),
+    }
+    if package_id is not None:
+        queries['package_page'] = select(PackageUpdate)\
+            .where(PackageUpdate.package_id == package_id)\
+            .order_by(PackageUpdate.update_date.desc()).limit(20)
+    times = {}
+    with engine.connect() as conn:
+        for name, stmt in queries.items():
+            started = time.perf_counter()
+            conn.execute(stmt).all()
+            times[name] = round((time.perf_counter() - started) * 1000, 1)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Архив старых обновлений пакетов')
+    parser.add_argument('--db', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--older-than', type=int, metavar='ДНЕЙ', help='горизонт в днях от сегодня')
+    parser.add_argument('--before', type=date.fromisoformat, metavar='ГГГГ-ММ-ДД', help='горизонт датой')
+    parser.add_argument('--keep', type=int, metavar='N', help='оставлять N последних обновлений пакета')
+    parser.add_argument('--restore', action='store_true', help='вернуть архив в package_updates')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM после переноса (уменьшает файл)')
+    args = parser.parse_args(argv)
+
+    before = args.before or (date.today() - timedelta(days=args.older_than)
+                             if args.older_than is not None else None)
+    if not args.restore and before is None and args.keep is None:
+        parser.error('укажите --older-than/--before и/или --keep')
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        hot = conn.execute(select(PackageUpdate.package_id).group_by(PackageUpdate.package_id)
+                           .order_by(func.count().desc()).limit(1)).scalar()
+    size_before, times_before = file_size(engine), query_times(engine, hot)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if args.restore:
+            print(f'возвращено записей: {restore_updates(conn)}')
+        else:
+            stats = archive_updates(conn, before, args.keep)
+            ratio = stats['raw_bytes'] / stats['packed_bytes'] if stats['packed_bytes'] else 0
+            print(f'в архив: записей {stats["rows"]} из {stats["packages"]} пакетов, '
+                  f'пачек {stats["blobs"]}, {stats["raw_bytes"] >> 10} -> '
+                  f'{stats["packed_bytes"] >> 10} КиБ (×{ratio:.1f})')
+    print(f'перенос: {time.perf_counter() - started:.1f} с')
+    if args.vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+
+    size_after, times_after = file_size(engine), query_times(engine, hot)
+    if size_before is not None:
+        print(f'файл: {size_before >> 20} -> {size_after >> 20} МБ'
+              + ('' if args.vacuum else ' (без --vacuum место только помечается свободным)'))
+    for name, ms in times_before.items():
+        print(f'{name:15} {ms:8.1f} -> {times_after[name]:8.1f} мс')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# batch.py
+#
+# Массовое добавление архитектур, групп и ACL-записей (формы /<раздел>/batch
+# и POST /api/v1/<раздел>/batch).
+#
+# Все строки проверяются заранее: пакеты и мейнтейнеры — одним IN-запросом
+# на пачку, значения — по множествам допустимых, дубли — по множеству уже
+# существующих пар. Если ошибок нет, строки вставляются одним executemany
+# в текущей транзакции; иначе не вставляется ничего, а ошибки возвращаются
+# с номерами строк.
+
+from sqlalchemy import insert, select
+from models import Package, Maintainer, ACL, PackageArchitecture, PackageGroup
+import versions
+
+BATCH_MAX = 1000
+CHUNK = 500
+
+# раздел -> (модель, поля строки, поле со значением из фиксированного списка)
+KINDS = {
+    'architectures': (PackageArchitecture, ('package_id', 'architecture'),            'architecture'),
+    'groups':        (PackageGroup,        ('package_id', 'group_name'),              'group_name'),
+    'acl':           (ACL,                 ('package_id', 'maintainer_id', 'role'),   None),
+}
+
+
+def parse_lines(kind, text):
+    """Строки формы «пакет значение» / «пакет мейнтейнер роль» в dict'ы."""
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if kind == 'acl':
+            parts = line.split(None, 2)
+            parts += [''] * (3 - len(parts))
+            rows.append({'package': parts[0], 'maintainer': parts[1], 'role': parts[2].strip()})
+        else:
+            parts = line.split(None, 1)
+            field = KINDS[kind][2]
+            rows.append({'package': parts[0], field: parts[1].strip() if len(parts) > 1 else ''})
+    return rows
+
+
+def _ids(db, id_col, name_col, ids, names):
+    """Существующие id из ids и {имя: id} для names — по IN-запросу на пачку."""
+    found_ids, by_name = set(), {}
+    ids, names = list(ids), list(names)
+    for i in range(0, len(ids), CHUNK):
+        found_ids.update(db.execute(select(id_col).where(id_col.in_(ids[i:i + CHUNK]))).scalars())
+    for i in range(0, len(names), CHUNK):
+        by_name.update(db.execute(select(name_col, id_col).where(name_col.in_(names[i:i + CHUNK]))).all())
+    return found_ids, by_name
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _resolve(row, id_key, name_key, found_ids, by_name):
+    if row.get(id_key) not in (None, ''):
+        value = _as_int(row[id_key])
+        return value if value in found_ids else None
+    return by_name.get(str(row.get(name_key) or '').strip())
+
+
+def validate(db, kind, rows, choices=None):
+    """Проверяет rows; возвращает (строки для вставки, [(номер строки, ошибка)]).
+
+    Строка может ссылаться на пакет по package_id или по имени (package),
+    на мейнтейнера — по maintainer_id или никнейму (maintainer).
+    choices — допустимые значения поля со списком (ARCHITECTURE_OPTIONS…).
+    """
+    model, fields, choice_field = KINDS[kind]
+    if len(rows) > BATCH_MAX:
+        return [], [(0, f'Не больше {BATCH_MAX} строк за раз')]
+    if not all(isinstance(row, dict) for row in rows):
+        return [], [(0, 'Каждая строка должна быть объектом')]
+    choices = set(choices or ())
+
+    pkg_ids, pkg_names = _ids(db, Package.package_id, Package.name,
+                              {_as_int(r.get('package_id')) for r in rows} - {None},
+                              {str(r.get('package') or '').strip() for r in rows} - {''})
+    if 'maintainer_id' in fields:
+        man_ids, man_names = _ids(db, Maintainer.maintainer_id, Maintainer.nickname,
+                                  {_as_int(r.get('maintainer_id')) for r in rows} - {None},
+                                  {str(r.get('maintainer') or '').strip() for r in rows} - {''})
+
+    clean, errors = [], []
+    for n, row in enumerate(rows, 1):
+        item = {'package_id': _resolve(row, 'package_id', 'package', pkg_ids, pkg_names)}
+        if item['package_id'] is None:
+            errors.append((n, f"Пакет «{row.get('package_id') or row.get('package') or ''}» не найден"))
+            continue
+        if 'maintainer_id' in fields:
+            item['maintainer_id'] = _resolve(row, 'maintainer_id', 'maintainer', man_ids, man_names)
+            if item['maintainer_id'] is None:
+                errors.append((n, f"Мейнтейнер «{row.get('maintainer_id') or row.get('maintainer') or ''}» не найден"))
+                continue
+        for field in fields:
+            if field not in item:
+                item[field] = str(row.get(field) or '').strip()
+                if not item[field]:
+                    errors.append((n, f'Поле «{field}» обязательно'))
+                    break
+                if field == choice_field and item[field] not in choices:
+                    errors.append((n, f'«{item[field]}» нет среди допустимых значений'))
+                    break
+        else:
+            clean.append((n, item))
+
+    # дубли в самой пачке и с уже существующими строками
+    if choice_field:
+        col = getattr(model, choice_field)
+        pids = sorted({item['package_id'] for _, item in clean})
+        existing = set()
+        for i in range(0, len(pids), CHUNK):
+            existing.update(db.execute(select(model.package_id, col)
+                                       .where(model.package_id.in_(pids[i:i + CHUNK]))).all())
+        unique = []
+        for n, item in clean:
+            pair = (item['package_id'], item[choice_field])
+            if pair in existing:
+                errors.append((n, f'«{pair[1]}» уже указана для этого пакета'))
+            else:
+                existing.add(pair)
+                unique.append((n, item))
+        clean = unique
+
+    errors.sort()
+    return [item for _, item in clean], errors
+
+
+def insert_rows(db, kind, rows):
+    """executemany в транзакции сессии; ORM bulk INSERT идёт мимо flush,
+    поэтому счётчики versions и хэши пакетов для sync сбрасываются явно."""
+    model = KINDS[kind][0]
+    if rows:
+        db.execute(insert(model), rows)
+        versions.bump(db.connection(), {model.__tablename__} |
+                      {versions.package_key(row['package_id']) for row in rows})
+        versions.forget_hashes(db.connection(), {row['package_id'] for row in rows})
+    return len(rows)
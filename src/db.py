@@ -0,0 +1,107 @@
+# db.py
+#
+# Создание engine'ов с настройками пула и SQLite-прагмами и обновление
+# копии БД для аналитического бэкенда:
+#
+#   python db.py --from sqlite:///sisyphus_pg.db --to sqlite:///sisyphus_ch.db
+#
+# Копия сама не обновляется: её снимает первый старт приложения, дальше —
+# эта команда (по крону) или задача «refresh_analytics» на странице /jobs,
+# где видно, на сколько ревизий копия отстала от основной.
+
+from sqlalchemy import create_engine, event
+
+
+def _sqlite_pragmas(busy_timeout):
+    def on_connect(dbapi_conn, conn_record):
+        # WAL: читатели не блокируют писателя и наоборот;
+        # busy_timeout: ждать освобождения блокировки, а не сразу
+        # падать с «database is locked»; NORMAL в WAL-режиме безопасен
+        # и не делает fsync на каждый коммит
+        cur = dbapi_conn.cursor()
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cur.execute('PRAGMA synchronous=NORMAL')
+        cur.close()
+    return on_connect
+
+
+def make_engine(url, config):
+    """Engine для url с параметрами пула из config (app.config)."""
+    kwargs = {'echo': config.get('SQLALCHEMY_ECHO', False)}
+    is_sqlite = url.startswith('sqlite')
+    is_memory = is_sqlite and (url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url)
+    if not is_memory:
+        kwargs.update(
+            pool_size=config.get('DB_POOL_SIZE', 5),
+            max_overflow=config.get('DB_MAX_OVERFLOW', 10),
+            pool_timeout=config.get('DB_POOL_TIMEOUT', 30),
+            pool_recycle=config.get('DB_POOL_RECYCLE', -1),
+            pool_pre_ping=config.get('DB_POOL_PRE_PING', False),
+        )
+    if is_sqlite:
+        # соединения пула переходят между потоками gunicorn
+        kwargs['connect_args'] = {'check_same_thread': False}
+
+    engine = create_engine(url, **kwargs)
+    if is_sqlite and not is_memory:
+        event.listen(engine, 'connect', _sqlite_pragmas(config.get('SQLITE_BUSY_TIMEOUT', 5000)))
+    return engine
+
+
+# --- копия основной БД для аналитического бэкенда ---
+
+REFRESH_CHUNK = 10000
+
+def refresh_snapshot(src, dst):
+    """Переносит содержимое src в dst.
+
+    SQLite -> SQLite — через backup API (согласованный постраничный снимок
+    вместе с индексами и FTS). Для остальных пар (например, ClickHouse через
+    clickhouse-sqlalchemy) — потаблично пачками по REFRESH_CHUNK строк.
+    """
+    if src.dialect.name == 'sqlite' and dst.dialect.name == 'sqlite':
+        src_conn, dst_conn = src.raw_connection(), dst.raw_connection()
+        try:
+            src_conn.driver_connection.backup(dst_conn.driver_connection)
+        finally:
+            dst_conn.close()
+            src_conn.close()
+        return
+
+    from models import Base
+    Base.metadata.create_all(dst)
+    with src.connect() as s, dst.begin() as d:
+        for table in reversed(Base.metadata.sorted_tables):
+            d.execute(table.delete())
+        for table in Base.metadata.sorted_tables:
+            result = s.execution_options(stream_results=True, yield_per=REFRESH_CHUNK)\
+                      .execute(table.select())
+            for part in result.partitions(REFRESH_CHUNK):
+                d.execute(table.insert(), [row._asdict() for row in part])
+
+
+def refresh_analytics(src, dst, log=print):
+    """Новый снимок src в dst и миграция dst до текущих моделей.
+
+    Снимок с не мигрированной основной БД (или ClickHouse, куда
+    переносятся только таблицы) иначе остался бы со старой схемой и без
+    производных таблиц, которых ждут страницы.
+    """
+    from migrate import migrate
+    refresh_snapshot(src, dst)
+    migrate(dst, log=log)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Обновить копию БД для аналитического бэкенда')
+    parser.add_argument('--from', dest='src', default='sqlite:///sisyphus_pg.db', help='URL основной БД')
+    parser.add_argument('--to', dest='dst', default='sqlite:///sisyphus_ch.db', help='URL аналитической БД')
+    args = parser.parse_args(argv)
+    refresh_analytics(make_engine(args.src, {}), make_engine(args.dst, {}))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
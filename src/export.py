@@ -0,0 +1,164 @@
+# export.py
+#
+# Выгрузка таблиц для офлайн-анализа в постоянной памяти.
+#
+#   python export.py updates -o updates.csv.gz
+#   python export.py reports --format parquet --joined -o reports.parquet
+#   python export.py acl --chunk 50000 --db sisyphus_pg.db
+#
+# Строки читаются из курсора пачками (yield_per / partitions) и сразу
+# пишутся в файл: CSV, CSV+gzip или Parquet (колоночный, zstd). Parquet
+# требует pyarrow — он необязателен и импортируется только по запросу.
+# Тот же код отдаёт выгрузку через /export/<таблица>.<формат>.
+
+import argparse
+import csv
+import io
+import resource
+import sys
+import time
+import zlib
+from datetime import date
+
+from sqlalchemy import Date, Integer, create_engine
+from models import (
+    Package, Maintainer, ACL,
+    PackageArchitecture, PackageUpdate,
+    PackageGroup, Report
+)
+from queries import row_select, LIST_SORTS
+
+TABLES = {
+    'packages':      Package,
+    'maintainers':   Maintainer,
+    'updates':       PackageUpdate,
+    'reports':       Report,
+    'acl':           ACL,
+    'groups':        PackageGroup,
+    'architectures': PackageArchitecture,
+}
+FORMATS = {
+    'csv':     'text/csv',
+    'csv.gz':  'application/gzip',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORT_CHUNK = 10000
+
+
+def export_select(model, joined=False, conditions=()):
+    pk = getattr(model, LIST_SORTS[model][0])
+    return row_select(model, labels=joined).where(*conditions).order_by(pk)
+
+def partitions(conn, stmt, chunk=EXPORT_CHUNK):
+    """(имена колонок, генератор пачек строк); stream_results — серверный курсор там, где он есть."""
+    result = conn.execute(stmt.execution_options(stream_results=True, yield_per=chunk))
+    return list(result.keys()), result.partitions(chunk)
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def csv_chunks(keys, parts):
+    """CSV по кускам: одна строка-заголовок и по куску на пачку строк."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(keys)
+    for part in parts:
+        writer.writerows([_cell(v) for v in row] for row in part)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def gzip_chunks(chunks, level=6):
+    # wbits=31 — gzip-контейнер, читается zcat/pandas как обычный .gz
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk.encode())
+        if data:
+            yield data
+    yield z.flush()
+
+
+def _arrow_schema(stmt):
+    import pyarrow as pa
+    fields = []
+    for col in stmt.selected_columns:
+        if isinstance(col.type, Integer):
+            kind = pa.int64()
+        elif isinstance(col.type, Date):
+            kind = pa.date32()
+        else:
+            kind = pa.string()
+        fields.append(pa.field(col.name, kind, nullable=True))
+    return pa.schema(fields)
+
+def write_parquet(out, stmt, keys, parts, compression='zstd'):
+    """Parquet с одной row group на пачку строк; out — путь или бинарный файл."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('для выгрузки в Parquet нужен pyarrow (pip install pyarrow)')
+    schema = _arrow_schema(stmt)
+    with pq.ParquetWriter(out, schema, compression=compression) as writer:
+        for part in parts:
+            columns = list(zip(*part)) or [[] for _ in keys]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema))
+
+def write_export(out, fmt, conn, stmt, chunk=EXPORT_CHUNK):
+    """Пишет выгрузку stmt в бинарный файл out; возвращает число строк."""
+    keys, parts = partitions(conn, stmt, chunk)
+    counted = {'rows': 0}
+
+    def counting(parts):
+        for part in parts:
+            counted['rows'] += len(part)
+            yield part
+
+    if fmt == 'parquet':
+        write_parquet(out, stmt, keys, counting(parts))
+    elif fmt == 'csv.gz':
+        for data in gzip_chunks(csv_chunks(keys, counting(parts))):
+            out.write(data)
+    else:
+        for text in csv_chunks(keys, counting(parts)):
+            out.write(text.encode())
+    return counted['rows']
+
+
+def peak_rss_mb():
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Выгрузка таблиц sisyphus DB в CSV/Parquet')
+    parser.add_argument('table', choices=TABLES)
+    parser.add_argument('--db', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--format', choices=FORMATS, help='по умолчанию — по расширению -o, иначе csv')
+    parser.add_argument('--joined', action='store_true',
+                        help='добавить имя пакета и никнейм мейнтейнера')
+    parser.add_argument('--chunk', type=int, default=EXPORT_CHUNK, help='строк на пачку')
+    parser.add_argument('-o', '--output', help='файл (по умолчанию <table>.<format>)')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or next((f for f in ('csv.gz', 'parquet', 'csv')
+                               if args.output and args.output.endswith('.' + f)), 'csv')
+    output = args.output or f'{args.table}.{fmt}'
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    started = time.perf_counter()
+    rss_before = peak_rss_mb()
+    with engine.connect() as conn, open(output, 'wb') as out:
+        rows = write_export(out, fmt, conn, export_select(TABLES[args.table], args.joined), args.chunk)
+    print(f'{output}: строк {rows}, {time.perf_counter() - started:.1f} с, '
+          f'пиковый RSS {rss_before:.0f} -> {peak_rss_mb():.0f} МБ')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
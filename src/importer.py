@@ -0,0 +1,435 @@
+# importer.py
+#
+# Массовая загрузка метаданных репозитория ALT (Sisyphus) в БД.
+#
+#   python importer.py pkglist.classic.xz srclist.classic.bz2
+#   python importer.py --db sisyphus_pg.db dump.jsonl
+#
+# Поддерживаемые входные файлы (сжатие xz/bz2/gz определяется по сигнатуре):
+#   * pkglist/srclist apt-rpm — подряд идущие заголовки RPM;
+#   * JSON-дамп: массив объектов или JSON Lines, по объекту на пакет:
+#       {"name": ..., "description": ..., "group": ...,
+#        "architectures": [...],
+#        "acl":     [{"nickname": ..., "full_name": ..., "role": ...}],
+#        "updates": [{"nickname": ..., "full_name": ..., "version": ...,
+#                     "date": "YYYY-MM-DD", "changelog": ...}]}
+#
+# Файлы читаются потоково, мейнтейнеры ищутся по никнейму в словаре в памяти,
+# строки пишутся Core executemany-вставками пачками по BATCH_SIZE пакетов,
+# каждая пачка — одна транзакция. Новые пакеты вставляются целиком; для уже
+# существующих (по имени) добавляются только недостающие архитектуры —
+# изменения содержимого применяет sync.py по хэшу содержимого пакета.
+
+import argparse
+import bz2
+import gzip
+import hashlib
+import json
+import lzma
+import re
+import struct
+import sys
+import time
+from datetime import date, datetime, timezone
+
+from sqlalchemy import create_engine, event, func, select, update
+from models import (
+    Base,
+    Package, Maintainer, ACL,
+    PackageArchitecture, PackageUpdate,
+    PackageGroup
+)
+import search
+import stats
+import latest
+import workload
+import versions
+
+BATCH_SIZE = 5000
+
+
+# --- чтение входных файлов ---
+
+def open_input(path):
+    """Открывает файл, прозрачно распаковывая xz/bz2/gzip."""
+    with open(path, 'rb') as f:
+        magic = f.read(6)
+    if magic.startswith(b'\xfd7zXZ'):
+        return lzma.open(path, 'rb')
+    if magic.startswith(b'BZh'):
+        return bz2.open(path, 'rb')
+    if magic.startswith(b'\x1f\x8b'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+RPM_HEADER_MAGIC = b'\x8e\xad\xe8\x01'
+
+RPMTAG_NAME          = 1000
+RPMTAG_VERSION       = 1001
+RPMTAG_RELEASE       = 1002
+RPMTAG_EPOCH         = 1003
+RPMTAG_SUMMARY       = 1004
+RPMTAG_DESCRIPTION   = 1005
+RPMTAG_PACKAGER      = 1015
+RPMTAG_GROUP         = 1016
+RPMTAG_ARCH          = 1022
+RPMTAG_CHANGELOGTIME = 1080
+RPMTAG_CHANGELOGNAME = 1081
+RPMTAG_CHANGELOGTEXT = 1082
+
+_RPM_TAGS = {
+    RPMTAG_NAME, RPMTAG_VERSION, RPMTAG_RELEASE, RPMTAG_EPOCH, RPMTAG_SUMMARY,
+    RPMTAG_DESCRIPTION, RPMTAG_PACKAGER, RPMTAG_GROUP, RPMTAG_ARCH,
+    RPMTAG_CHANGELOGTIME, RPMTAG_CHANGELOGNAME, RPMTAG_CHANGELOGTEXT,
+}
+
+def _read_exact(fp, n):
+    data = fp.read(n)
+    while len(data) < n:
+        chunk = fp.read(n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def _rpm_value(data, type_, offset, count):
+    if type_ == 4:                                   # INT32
+        return list(struct.unpack_from(f'>{count}i', data, offset))
+    if type_ in (6, 8, 9):                           # STRING / STRING_ARRAY / I18NSTRING
+        values = []
+        for _ in range(count if type_ != 6 else 1):
+            end = data.index(b'\0', offset)
+            values.append(data[offset:end].decode('utf-8', 'replace'))
+            offset = end + 1
+        return values
+    return None
+
+def read_rpm_headers(fp):
+    """Итератор по заголовкам RPM в pkglist/srclist: dict tag -> список значений."""
+    while True:
+        head = _read_exact(fp, 16)
+        if len(head) < 16:
+            return
+        if head[:4] != RPM_HEADER_MAGIC:
+            raise ValueError('битый pkglist: нет сигнатуры заголовка RPM')
+        nindex, hsize = struct.unpack('>ii', head[8:16])
+        index = _read_exact(fp, nindex * 16)
+        data  = _read_exact(fp, hsize)
+        hdr = {}
+        for i in range(nindex):
+            tag, type_, offset, count = struct.unpack_from('>iiii', index, i * 16)
+            if tag in _RPM_TAGS:
+                hdr[tag] = _rpm_value(data, type_, offset, count)
+        yield hdr
+
+
+def read_json(fp, chunk_size=1 << 20):
+    """Потоково читает JSON-массив объектов или JSON Lines."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    eof = False
+    while True:
+        buf = buf.lstrip(' \t\r\n,[]')
+        if buf:
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                buf = buf[end:]
+                continue
+        if eof:
+            return
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf += chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+
+
+# --- нормализация в записи пакетов ---
+
+_PERSON = re.compile(r'^\s*(?P<full>[^<]*?)\s*<(?P<nick>[^@>\s]+)(?:@|\s+at\s+)[^>]*>\s*(?P<rest>.*)$')
+
+def parse_person(value):
+    """'Иван Иванов <ivan@altlinux.org> 1.0-alt1' -> ('ivan', 'Иван Иванов', '1.0-alt1')."""
+    m = _PERSON.match(value or '')
+    if not m:
+        return None, None, (value or '').strip()
+    return m.group('nick').lower(), m.group('full') or m.group('nick'), m.group('rest').strip()
+
+def _first(hdr, tag, default=''):
+    values = hdr.get(tag)
+    return values[0] if values else default
+
+def rpm_record(hdr):
+    """Заголовок RPM -> запись пакета в формате JSON-дампа."""
+    record = {
+        'name':          _first(hdr, RPMTAG_NAME),
+        'description':   _first(hdr, RPMTAG_DESCRIPTION) or _first(hdr, RPMTAG_SUMMARY),
+        'group':         _first(hdr, RPMTAG_GROUP),
+        'architectures': [_first(hdr, RPMTAG_ARCH)] if hdr.get(RPMTAG_ARCH) else [],
+        'acl':           [],
+        'updates':       [],
+    }
+    nick, full, _ = parse_person(_first(hdr, RPMTAG_PACKAGER))
+    if nick:
+        record['acl'].append({'nickname': nick, 'full_name': full, 'role': 'owner'})
+
+    times = hdr.get(RPMTAG_CHANGELOGTIME) or []
+    names = hdr.get(RPMTAG_CHANGELOGNAME) or []
+    texts = hdr.get(RPMTAG_CHANGELOGTEXT) or []
+    for ts, name, text in zip(times, names, texts):
+        nick, full, version = parse_person(name)
+        if not nick:
+            continue
+        record['updates'].append({
+            'nickname':  nick,
+            'full_name': full,
+            'version':   version[:50],
+            'date':      datetime.fromtimestamp(ts, timezone.utc).date(),
+            'changelog': text,
+        })
+    return record
+
+def read_records(path):
+    fp = open_input(path)
+    with fp:
+        if path.endswith(('.json', '.jsonl', '.json.gz', '.jsonl.gz', '.json.xz', '.jsonl.xz')):
+            yield from read_json(fp)
+        else:
+            for hdr in read_rpm_headers(fp):
+                yield rpm_record(hdr)
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def core_hash(record):
+    """sha1 содержимого пакета без архитектур: описание, группы, ACL, changelog.
+
+    Запись может прийти как из входного файла (поле group), так и собранной
+    из БД (список groups) — хэш у одинакового содержимого совпадает.
+    """
+    groups = [record['group']] if record.get('group') else record.get('groups') or []
+    payload = [
+        record.get('description') or '',
+        sorted(g[:100] for g in groups),
+        sorted([a['nickname'], a.get('role') or 'owner'] for a in record.get('acl') or []),
+        sorted([u['nickname'], u.get('version') or '', _as_date(u['date']).isoformat(),
+                u.get('changelog') or ''] for u in record.get('updates') or []),
+    ]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+def content_hash(record, archs=None, core=None):
+    """Хэш пакета целиком. Архитектуры хэшируются отдельно: в pkglist'ах
+    каждая архитектура приходит своим файлом, и их нужно объединять."""
+    archs = sorted(set(a for a in (archs if archs is not None else record.get('architectures') or []) if a))
+    raw = (core or core_hash(record)) + '|' + ','.join(archs)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# --- загрузка ---
+
+def _fast_pragmas(dbapi_conn, conn_record):
+    # на время импорта: без fsync на каждую транзакцию и с большим кэшем страниц
+    cur = dbapi_conn.cursor()
+    cur.execute('PRAGMA synchronous=OFF')
+    cur.execute('PRAGMA cache_size=-200000')
+    cur.execute('PRAGMA temp_store=MEMORY')
+    cur.close()
+
+
+class Importer:
+    def __init__(self, engine, batch_size=BATCH_SIZE, load_archs=True):
+        self.engine     = engine
+        self.batch_size = batch_size
+        self.batch      = []
+        self.stats      = {'packages': 0, 'maintainers': 0, 'acl': 0,
+                           'architectures': 0, 'groups': 0, 'updates': 0, 'skipped': 0}
+
+        with engine.connect() as conn:
+            self.maintainers = dict(conn.execute(select(Maintainer.nickname, Maintainer.maintainer_id)).all())
+            self.packages    = dict(conn.execute(select(Package.name, Package.package_id)).all())
+            # для синхронизации не нужно: новые пакеты получают новые id
+            self.archs       = {tuple(row) for row in conn.execute(
+                select(PackageArchitecture.package_id, PackageArchitecture.architecture))} \
+                if load_archs else set()
+            self.next_id = {
+                model: (conn.execute(select(func.max(pk))).scalar() or 0) + 1
+                for model, pk in ((Package, Package.package_id),
+                                  (Maintainer, Maintainer.maintainer_id))
+            }
+
+    def _maintainer_id(self, nick, full_name, rows):
+        mid = self.maintainers.get(nick)
+        if mid is None:
+            mid = self.next_id[Maintainer]
+            self.next_id[Maintainer] += 1
+            self.maintainers[nick] = mid
+            rows.append({'maintainer_id': mid, 'nickname': nick[:50], 'full_name': (full_name or nick)[:100]})
+        return mid
+
+    def add(self, record):
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    @staticmethod
+    def new_rows():
+        return {Maintainer: [], Package: [], ACL: [], PackageGroup: [],
+                PackageArchitecture: [], PackageUpdate: []}
+
+    def child_rows(self, pid, rec, rows):
+        """Строки групп, ACL и changelog'а пакета pid из записи rec."""
+        if rec.get('group'):
+            rows[PackageGroup].append({'package_id': pid, 'group_name': rec['group'][:100]})
+        for entry in rec.get('acl') or []:
+            mid = self._maintainer_id(entry['nickname'], entry.get('full_name'), rows[Maintainer])
+            rows[ACL].append({'package_id': pid, 'maintainer_id': mid,
+                              'role': entry.get('role') or 'owner'})
+        for upd in rec.get('updates') or []:
+            mid = self._maintainer_id(upd['nickname'], upd.get('full_name'), rows[Maintainer])
+            rows[PackageUpdate].append({
+                'package_id':     pid,
+                'updater_id':     mid,
+                'update_version': upd.get('version') or '',
+                'update_date':    _as_date(upd['date']),
+                'changelog':      upd.get('changelog') or '',
+            })
+
+    def arch_rows(self, pid, rec, rows):
+        added = False
+        for arch in rec.get('architectures') or []:
+            if arch and (pid, arch) not in self.archs:
+                self.archs.add((pid, arch))
+                rows[PackageArchitecture].append({'package_id': pid, 'architecture': arch})
+                added = True
+        return added
+
+    def new_package(self, rec, rows):
+        pid = self.next_id[Package]
+        self.next_id[Package] += 1
+        self.packages[rec['name']] = pid
+        rows[Package].append({'package_id': pid, 'name': rec['name'][:150],
+                              'description': rec.get('description') or '',
+                              'content_hash': content_hash(rec)})
+        self.arch_rows(pid, rec, rows)
+        self.child_rows(pid, rec, rows)
+        return pid
+
+    def write(self, conn, rows):
+        # порядок словаря rows учитывает внешние ключи: мейнтейнеры и пакеты первыми
+        for model, values in rows.items():
+            if values:
+                conn.execute(model.__table__.insert(), values)
+        for model, key in ((Maintainer, 'maintainers'), (Package, 'packages'), (ACL, 'acl'),
+                           (PackageArchitecture, 'architectures'), (PackageGroup, 'groups'),
+                           (PackageUpdate, 'updates')):
+            self.stats[key] += len(rows[model])
+
+    def flush(self):
+        if not self.batch:
+            return
+        rows = self.new_rows()
+        # существующие пакеты, которым добавились архитектуры: их хэш устарел
+        stale = []
+
+        for rec in self.batch:
+            rec['name'] = (rec.get('name') or '').strip()
+            if not rec['name']:
+                self.stats['skipped'] += 1
+                continue
+            pid = self.packages.get(rec['name'])
+            if pid is None:
+                self.new_package(rec, rows)
+            elif self.arch_rows(pid, rec, rows):
+                stale.append(pid)
+
+        with self.engine.begin() as conn:
+            self.write(conn, rows)
+            if stale:
+                conn.execute(update(Package).where(Package.package_id.in_(stale))
+                                            .values(content_hash=None))
+        self.batch = []
+
+
+def run_import(engine, paths, batch_size=BATCH_SIZE, log=print, online=False):
+    """Импортирует файлы paths; возвращает статистику.
+
+    online — файл одновременно пишут веб-запросы (задача jobs.py): триггеры
+    поиска и сводок не снимаются, а PRAGMA у соединений обычные. Медленнее,
+    зато сделанное приложением во время импорта не выпадает из сводок и
+    ничего не пишется с synchronous=OFF.
+    """
+    Base.metadata.create_all(engine)
+    mode = search.init_search(engine)
+    summaries = stats.init_stats(engine) == 'summary'
+    latest.init_latest(engine)
+    workload.init_workload(engine)
+    bulk = not online
+    if bulk:
+        event.listen(engine, 'connect', _fast_pragmas)
+        engine.dispose()
+
+    started = time.perf_counter()
+    importer = Importer(engine, batch_size)
+    try:
+        # FTS-индекс и сводки дешевле перестроить одним INSERT … SELECT в конце,
+        # чем обновлять триггером на каждую вставленную строку
+        if bulk:
+            with engine.begin() as conn:
+                if mode != 'like':
+                    search.drop_triggers(conn)
+                if summaries:
+                    stats.drop_triggers(conn)
+                    latest.drop_triggers(conn)
+                    workload.drop_triggers(conn)
+        for path in paths:
+            for record in read_records(path):
+                importer.add(record)
+            importer.flush()
+            log(f'{path}: пакетов {importer.stats["packages"]}, '
+                f'обновлений {importer.stats["updates"]}, '
+                f'{time.perf_counter() - started:.1f} с')
+    finally:
+        importer.flush()
+        with engine.begin() as conn:
+            if bulk and mode != 'like':
+                search.rebuild_search(conn)
+                search.create_triggers(conn)
+            if bulk and summaries:
+                stats.rebuild_stats(conn)
+                stats.create_triggers(conn)
+                latest.rebuild_latest(conn)
+                latest.create_triggers(conn)
+                workload.rebuild_workload(conn)
+                workload.create_triggers(conn)
+            versions.bump_bulk(conn)
+        if bulk:
+            event.remove(engine, 'connect', _fast_pragmas)
+            engine.dispose()
+
+    importer.stats['elapsed'] = round(time.perf_counter() - started, 2)
+    return importer.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Импорт pkglist/srclist или JSON-дампа в sisyphus DB')
+    parser.add_argument('files', nargs='+', help='pkglist/srclist (.xz/.bz2/.gz) или .json/.jsonl')
+    parser.add_argument('--db', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help='пакетов на транзакцию')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    stats = run_import(engine, args.files, args.batch)
+    print(', '.join(f'{k}: {v}' for k, v in stats.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# jobs.py
+#
+# Фоновые задачи для долгих операций: каскадное удаление пакета, импорт,
+# выгрузка, архивирование, перестройка индексов, обновление аналитической
+# копии.
+#
+# Задача — строка таблицы jobs (вид, параметры JSON, статус, итог), так что
+# очередь и история переживают перезапуск; выполняет её пул потоков
+# процесса, поставившего задачу (JOB_WORKERS; 0 — сразу в том же потоке,
+# удобно для отладки и проверок без потоков). Прогресс идёт в память
+# процесса и в таблицу пишется только при завершении: задача держит
+# пишущую транзакцию SQLite, и отдельная запись прогресса ждала бы её конца.
+# При старте задачи, оставшиеся в очереди, запускаются заново, а
+# прерванные посередине помечаются как failed. Прерванной считается задача,
+# чей процесс-владелец (jobs.owner, 'хост:pid') завершился: воркеры gunicorn
+# стартуют в разное время, и новый не должен ронять задачи соседей.
+#
+#   runner = JobRunner(engine, workers=2)
+#   job_id = runner.submit('delete_package', package_id=42)
+#   runner.status(job_id)  # {'status': 'running', 'done': 3, 'total': 7, ...}
+
+import json
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, select, update
+from models import (
+    Package, ACL, PackageArchitecture, PackageUpdate,
+    PackageGroup, Report, UpdateArchive, Job
+)
+from db import make_engine, refresh_analytics
+import archive
+import export
+import latest
+import lookups
+import search
+import stats
+import triage
+import versions
+import workload
+
+# вид задачи -> функция(engine, progress, **params) -> итог (JSON-совместимый)
+TASKS = {}
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+# что удаляется вместе с пакетом (как cascade='all, delete-orphan' у Package)
+PACKAGE_CHILDREN = [ACL, PackageArchitecture, PackageGroup, PackageUpdate, UpdateArchive, Report]
+
+
+def task(kind):
+    def register(fn):
+        TASKS[kind] = fn
+        return fn
+    return register
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# задачи, которые сейчас выполняет этот процесс (любым JobRunner'ом)
+_active = set()
+
+def _owner():
+    # pid — на момент вызова: воркеры форкаются уже после импорта
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def _orphaned(job_id, owner):
+    """Задача в статусе running, которую уже никто не выполняет."""
+    if not owner:
+        return True                   # записана до появления jobs.owner
+    host, _, pid = owner.rpartition(':')
+    if not pid.isdigit():
+        return True                   # испорченная запись — выполнять её некому
+    if host != socket.gethostname():
+        return False                  # процесс на другой машине отсюда не проверить
+    if int(pid) == os.getpid():
+        return job_id not in _active
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass                          # процесс есть, но чужой
+    return False
+
+
+class Progress:
+    """Счётчик шагов задачи: progress.step('удалены обновления') / progress.total = n."""
+
+    def __init__(self, total=0):
+        self.done, self.total, self.message = 0, total, ''
+
+    def step(self, message='', n=1):
+        self.done += n
+        self.message = message
+
+    def as_dict(self):
+        return {'done': self.done, 'total': self.total, 'message': self.message}
+
+
+# --- задачи ---
+
+@task('delete_package')
+def delete_package(engine, progress, package_id):
+    """Пакет со всеми дочерними строками — DELETE … WHERE package_id = ? по таблицам."""
+    progress.total = len(PACKAGE_CHILDREN) + 1
+    deleted = {}
+    with engine.begin() as conn:
+        name = conn.execute(select(Package.name).where(Package.package_id == package_id)).scalar()
+        if name is None:
+            raise LookupError(f'пакет {package_id} не найден')
+        for model in PACKAGE_CHILDREN + [Package]:
+            res = conn.execute(delete(model).where(model.package_id == package_id))
+            deleted[model.__tablename__] = res.rowcount
+            progress.step(f'{model.__tablename__}: {res.rowcount}')
+        versions.bump(conn, {table for table, n in deleted.items() if n} | {versions.package_key(package_id)})
+    lookups.invalidate('packages')
+    return {'package': name, 'deleted': deleted}
+
+@task('import')
+def import_files(engine, progress, paths):
+    from importer import run_import
+    progress.total = len(paths)
+    # свой engine — с теми же PRAGMA и busy_timeout, что у приложения; импорт
+    # идёт в файл, который одновременно пишут веб-запросы, поэтому триггеры
+    # сводок остаются на месте (online)
+    own = make_engine(engine.url.render_as_string(hide_password=False), {})
+    try:
+        result = run_import(own, paths, log=lambda line: progress.step(line), online=True)
+    finally:
+        own.dispose()
+    lookups.invalidate()
+    return result
+
+@task('export')
+def export_table(engine, progress, table, fmt='csv.gz', joined=False, directory='exports'):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{table}-{_now():%Y%m%d-%H%M%S}.{fmt}')
+    progress.total = 1
+    with engine.connect() as conn, open(path, 'wb') as out:
+        rows = export.write_export(out, fmt, conn, export.export_select(export.TABLES[table], joined))
+    progress.step(f'строк: {rows}')
+    return {'path': os.path.abspath(path), 'rows': rows, 'bytes': os.path.getsize(path)}
+
+@task('archive')
+def archive_updates(engine, progress, before=None, keep=None):
+    from datetime import date
+    progress.total = 1
+    with engine.begin() as conn:
+        result = archive.archive_updates(conn, date.fromisoformat(before) if before else None, keep)
+    progress.step(f'в архив: {result["rows"]}')
+    return result
+
+@task('rebuild')
+def rebuild_indexes(engine, progress):
+    """FTS-индекс, сводки, текущие версии, нагрузка и метрики баг-репортов — заново."""
+    if engine.dialect.name != 'sqlite':
+        raise ValueError('перестройка нужна только для SQLite: на других СУБД всё считается на лету')
+    steps = [('сводки', stats.rebuild_stats), ('версии', latest.rebuild_latest),
+             ('нагрузка', workload.rebuild_workload),
+             ('история баг-репортов', triage.rebuild_aging)]
+    # режим поиска узнаём до транзакции: init_search сам открывает пишущее соединение
+    if search.init_search(engine) != 'like':
+        steps.insert(0, ('поиск', search.rebuild_search))
+    progress.total = len(steps) + 1
+    with engine.begin() as conn:
+        for title, rebuild in steps:
+            rebuild(conn)
+            progress.step(title)
+        conn.exec_driver_sql('ANALYZE')
+        progress.step('ANALYZE')
+        versions.bump_bulk(conn)
+    return {'rebuilt': [title for title, _ in steps]}
+
+@task('refresh_analytics')
+def refresh_analytics_copy(engine, progress, url):
+    """Снимок основной БД в аналитическую (url) с миграцией — см. db.refresh_analytics."""
+    # свой engine, как у импорта: страницы аналитического бэкенда читают
+    # через пул приложения, а копия перезаписывается целиком
+    target = make_engine(url, {})
+    try:
+        refresh_analytics(engine, target, log=lambda line: progress.step(line))
+        with target.connect() as conn:
+            revision = versions.revision(conn)
+    finally:
+        target.dispose()
+    return {'revision': revision}
+
+
+# --- очередь ---
+
+class JobRunner:
+    def __init__(self, engine, workers=2, log=None):
+        self.engine = engine
+        self.log = log
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='job') if workers else None
+        self._progress = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, **params):
+        """Ставит задачу в очередь; возвращает её id."""
+        if kind not in TASKS:
+            raise ValueError(f'неизвестная задача «{kind}»')
+        with self.engine.begin() as conn:
+            job_id = conn.execute(insert(Job).values(
+                kind=kind, params=json.dumps(params, ensure_ascii=False),
+                status='queued', created_at=_now())).inserted_primary_key[0]
+        self._start(job_id)
+        return job_id
+
+    def _start(self, job_id):
+        if self.pool is None:
+            self.run(job_id)
+        else:
+            self.pool.submit(self.run, job_id)
+
+    def run(self, job_id):
+        with self.engine.begin() as conn:
+            claimed = conn.execute(update(Job).where(Job.job_id == job_id, Job.status == 'queued')
+                                              .values(status='running', owner=_owner(),
+                                                      started_at=_now())).rowcount
+            job = conn.execute(select(Job.kind, Job.params).where(Job.job_id == job_id)).one()
+        if not claimed:
+            return
+        progress = Progress()
+        with self._lock:
+            self._progress[job_id] = progress
+            _active.add(job_id)
+        try:
+            result = TASKS[job.kind](self.engine, progress, **json.loads(job.params or '{}'))
+            values = {'status': 'done', 'result': json.dumps(result, ensure_ascii=False, default=str)}
+        except Exception as e:
+            values = {'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+            if self.log:
+                self.log(f'задача {job_id} ({job.kind}) упала:\n{traceback.format_exc()}')
+        with self.engine.begin() as conn:
+            conn.execute(update(Job).where(Job.job_id == job_id).values(
+                finished_at=_now(), done=progress.done, total=progress.total,
+                message=progress.message[:500], **values))
+        with self._lock:
+            self._progress.pop(job_id, None)
+            _active.discard(job_id)
+
+    def progress(self, job_id):
+        with self._lock:
+            progress = self._progress.get(job_id)
+            return progress.as_dict() if progress else None
+
+    def recover(self):
+        """После перезапуска: задачи умерших процессов — failed, ждавшие в очереди — запускаются."""
+        with self.engine.begin() as conn:
+            running = conn.execute(select(Job.job_id, Job.owner).where(Job.status == 'running')).all()
+            orphaned = [job_id for job_id, owner in running if _orphaned(job_id, owner)]
+            if orphaned:
+                # status в условии: задача могла завершиться, пока проверяли владельцев
+                conn.execute(update(Job).where(Job.job_id.in_(orphaned), Job.status == 'running')
+                             .values(status='failed', error='прервана перезапуском', finished_at=_now()))
+            queued = conn.execute(select(Job.job_id).where(Job.status == 'queued')
+                                  .order_by(Job.job_id)).scalars().all()
+        for job_id in queued:
+            self._start(job_id)
+        return len(queued)
+
+    def wait(self):
+        """Дождаться всех запущенных задач (для проверок и завершения процесса)."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix='job')
+
+    # --- чтение ---
+
+    def _row(self, job):
+        row = {c: getattr(job, c) for c in ('job_id', 'kind', 'status', 'owner', 'done', 'total',
+                                             'message', 'error', 'created_at', 'started_at', 'finished_at')}
+        row['params'] = json.loads(job.params or '{}')
+        row['result'] = json.loads(job.result) if job.result else None
+        live = self.progress(job.job_id) if job.status == 'running' else None
+        if live:
+            row.update(live)
+        return row
+
+    def status(self, job_id):
+        with self.engine.connect() as conn:
+            job = conn.execute(select(Job).where(Job.job_id == job_id)).first()
+        return self._row(job) if job else None
+
+    def recent(self, limit=50, status=None):
+        stmt = select(Job).order_by(Job.job_id.desc()).limit(limit)
+        if status:
+            stmt = stmt.where(Job.status == status)
+        with self.engine.connect() as conn:
+            return [self._row(job) for job in conn.execute(stmt)]
@@ -0,0 +1,142 @@
+# latest.py
+#
+# Текущая версия каждого пакета: package_latest хранит старшее по версии
+# RPM (version_key, при равенстве — более позднее) обновление пакета.
+#
+#   python latest.py                 # сверить package_latest с package_updates
+#   python latest.py --rebuild       # пересчитать целиком
+#
+# Как и сводки stats.py, таблицу поддерживают SQLite-триггеры на
+# package_updates — для ORM и для массовых Core-вставок: вставка сравнивает
+# новую строку с текущей (UPSERT), удаление текущей строки выбирает
+# следующую по индексу (package_id, version_key). Поэтому список пакетов
+# с версией и датой — поиск по первичному ключу, а не GROUP BY по всем
+# обновлениям. Не на SQLite версии считаются оконной функцией на лету.
+
+import argparse
+import sys
+
+from sqlalchemy import create_engine, func, select
+from models import PackageLatest, PackageUpdate
+
+COLUMNS = 'package_id, update_id, update_version, version_key, update_date'
+ORDER = 'version_key DESC, update_date DESC, update_id DESC'
+
+# режим по engine: 'table' | 'live'
+_modes = {}
+
+
+def _live_sql(where=''):
+    return (f'SELECT {COLUMNS} FROM (SELECT {COLUMNS}, ROW_NUMBER() OVER '
+            f'(PARTITION BY package_id ORDER BY {ORDER}) AS rn FROM package_updates {where}) AS ranked '
+            f'WHERE rn = 1')
+
+def _pick(row):
+    # текущая строка пакета row.package_id заново — после удаления или изменения
+    return (f'DELETE FROM package_latest WHERE package_id = {row}.package_id AND update_id = {row}.update_id; '
+            f'INSERT INTO package_latest({COLUMNS}) SELECT {COLUMNS} FROM package_updates '
+            f'WHERE package_id = {row}.package_id '
+            f'AND NOT EXISTS (SELECT 1 FROM package_latest WHERE package_id = {row}.package_id) '
+            f'ORDER BY {ORDER} LIMIT 1;')
+
+def _offer(row):
+    # строка row становится текущей, если она старше по версии
+    values = ', '.join(f'{row}.{col.strip()}' for col in COLUMNS.split(','))
+    return (f'INSERT INTO package_latest({COLUMNS}) VALUES ({values}) '
+            f'ON CONFLICT(package_id) DO UPDATE SET update_id = excluded.update_id, '
+            f'update_version = excluded.update_version, version_key = excluded.version_key, '
+            f'update_date = excluded.update_date '
+            f'WHERE (excluded.version_key, excluded.update_date, excluded.update_id) > '
+            f'(package_latest.version_key, package_latest.update_date, package_latest.update_id);')
+
+def create_triggers(conn):
+    conn.exec_driver_sql(
+        f'CREATE TRIGGER IF NOT EXISTS package_updates_latest_ai AFTER INSERT ON package_updates '
+        f'BEGIN {_offer("new")} END')
+    conn.exec_driver_sql(
+        f'CREATE TRIGGER IF NOT EXISTS package_updates_latest_ad AFTER DELETE ON package_updates '
+        f'BEGIN {_pick("old")} END')
+    conn.exec_driver_sql(
+        f'CREATE TRIGGER IF NOT EXISTS package_updates_latest_au AFTER UPDATE OF '
+        f'package_id, update_version, version_key, update_date ON package_updates '
+        f'BEGIN {_pick("old")} {_offer("new")} END')
+
+def drop_triggers(conn):
+    """Снимает триггеры (перед массовой загрузкой)."""
+    for suffix in ('ai', 'ad', 'au'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS package_updates_latest_{suffix}')
+
+def rebuild_latest(conn):
+    conn.exec_driver_sql('DELETE FROM package_latest')
+    conn.exec_driver_sql(f'INSERT INTO package_latest({COLUMNS}) {_live_sql()}')
+
+def init_latest(engine):
+    """Заполняет package_latest и ставит триггеры (если их ещё нет); возвращает режим."""
+    if engine.dialect.name != 'sqlite':
+        _modes[engine] = 'live'
+        return 'live'
+
+    with engine.begin() as conn:
+        # копия для аналитики могла быть снята до появления таблицы
+        PackageLatest.__table__.create(conn, checkfirst=True)
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='package_updates_latest_ai'").first()
+        if not exists:
+            rebuild_latest(conn)
+        create_triggers(conn)
+
+    _modes[engine] = 'table'
+    return 'table'
+
+def latest_mode(db):
+    return _modes.get(db.get_bind(), 'live')
+
+
+def check_latest(conn):
+    """Сравнивает package_latest с пересчётом; возвращает (лишние, недостающие) строки."""
+    stored = set(map(tuple, conn.exec_driver_sql(f'SELECT {COLUMNS} FROM package_latest')))
+    live = set(map(tuple, conn.exec_driver_sql(_live_sql())))
+    return sorted(stored - live), sorted(live - stored)
+
+
+def for_packages(db, package_ids):
+    """{package_id: PackageLatest-подобная строка} для страницы списка."""
+    package_ids = list(package_ids)
+    if not package_ids:
+        return {}
+    if latest_mode(db) == 'table':
+        rows = db.execute(select(PackageLatest).where(PackageLatest.package_id.in_(package_ids))).scalars()
+    else:
+        ranked = select(PackageUpdate.package_id, PackageUpdate.update_id, PackageUpdate.update_version,
+                        PackageUpdate.version_key, PackageUpdate.update_date,
+                        func.row_number().over(partition_by=PackageUpdate.package_id,
+                                               order_by=(PackageUpdate.version_key.desc(),
+                                                         PackageUpdate.update_date.desc(),
+                                                         PackageUpdate.update_id.desc())).label('rn'))\
+            .where(PackageUpdate.package_id.in_(package_ids)).subquery()
+        rows = db.execute(select(ranked).where(ranked.c.rn == 1)).all()
+    return {row.package_id: row for row in rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Текущие версии пакетов sisyphus DB')
+    parser.add_argument('db', nargs='?', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать package_latest целиком')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    init_latest(engine)
+    with engine.begin() as conn:
+        if args.rebuild:
+            rebuild_latest(conn)
+            print('package_latest пересчитана')
+        extra, missing = check_latest(conn)
+    if extra or missing:
+        print(f'[FAIL] package_latest: лишние {extra[:5]}, недостающие {missing[:5]}')
+        return 1
+    print('[ok] package_latest совпадает с package_updates')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# lookups.py
+#
+# Кэш справочников для выпадающих списков «пакет» и «мейнтейнер».
+#
+# Вместо db.query(Package).all() (полные ORM-объекты вместе с description)
+# в памяти процесса хранятся лёгкие кортежи (id, имя), отсортированные по
+# имени. Кэш сбрасывается после коммита сессии, в которой менялись Package
+# или Maintainer, а на случай записей из других процессов (импорт, sync,
+# другие воркеры) живёт не дольше LOOKUP_TTL секунд.
+
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Package, Maintainer
+
+PackageRef    = namedtuple('PackageRef', 'package_id name')
+MaintainerRef = namedtuple('MaintainerRef', 'maintainer_id nickname full_name')
+
+# Больше стольких записей в <select> не выводим — форма переходит на type-ahead
+INLINE_LIMIT = 1000
+LOOKUP_TTL   = 300
+
+KINDS = {
+    'packages':    (Package,    PackageRef,    (Package.package_id, Package.name)),
+    'maintainers': (Maintainer, MaintainerRef, (Maintainer.maintainer_id, Maintainer.nickname,
+                                                Maintainer.full_name)),
+}
+_KIND_BY_MODEL = {model: kind for kind, (model, *_) in KINDS.items()}
+
+
+class _Entry:
+    def __init__(self, items):
+        self.items   = items                              # отсортированы по имени
+        self.keys    = [item[1].lower() for item in items]
+        self.by_id   = {item[0]: item for item in items}
+        self.created = time.monotonic()
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _entry(db, kind):
+    key = (str(db.get_bind().url), kind)
+    entry = _cache.get(key)
+    if entry is None or time.monotonic() - entry.created > LOOKUP_TTL:
+        model, ref, columns = KINDS[kind]
+        items = [ref(*row) for row in db.query(*columns)]
+        items.sort(key=lambda item: item[1].lower())
+        entry = _Entry(items)
+        with _lock:
+            _cache[key] = entry
+    return entry
+
+def invalidate(*kinds):
+    kinds = kinds or tuple(KINDS)
+    with _lock:
+        for key in [key for key in _cache if key[1] in kinds]:
+            del _cache[key]
+
+
+def choices(db, kind):
+    """Список для <select> или None, если записей больше INLINE_LIMIT."""
+    items = _entry(db, kind).items
+    return items if len(items) <= INLINE_LIMIT else None
+
+def packages(db):
+    return choices(db, 'packages')
+
+def maintainers(db):
+    return choices(db, 'maintainers')
+
+def get(db, kind, id):
+    """Кортеж по id (для подписи выбранного значения в type-ahead)."""
+    try:
+        return _entry(db, kind).by_id.get(int(id))
+    except (TypeError, ValueError):
+        return None
+
+def exists(db, kind, id):
+    return get(db, kind, id) is not None
+
+def suggest(db, kind, q, limit=20):
+    """Сначала совпадения по префиксу (бинарный поиск), затем по подстроке."""
+    entry = _entry(db, kind)
+    q = q.strip().lower()
+    if not q:
+        return entry.items[:limit]
+    start = bisect.bisect_left(entry.keys, q)
+    found = []
+    for i in range(start, len(entry.keys)):
+        if len(found) >= limit or not entry.keys[i].startswith(q):
+            break
+        found.append(entry.items[i])
+    if len(found) < limit:
+        seen = {item[0] for item in found}
+        for key, item in zip(entry.keys, entry.items):
+            if q in key and item[0] not in seen:
+                found.append(item)
+                if len(found) >= limit:
+                    break
+    return found
+
+
+# --- сброс кэша по событиям сессии ---
+
+@event.listens_for(Session, 'after_flush')
+def _track_changes(session, flush_context):
+    touched = session.info.setdefault('lookups_touched', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        kind = _KIND_BY_MODEL.get(type(obj))
+        if kind:
+            touched.add(kind)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    touched = session.info.pop('lookups_touched', None)
+    if touched:
+        invalidate(*touched)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('lookups_touched', None)
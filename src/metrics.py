@@ -0,0 +1,198 @@
+# metrics.py
+#
+# Инструментирование запросов (включается METRICS = True / FLASK_METRICS=true).
+#
+# Хуки Flask и события engine'ов подключаются один раз, при импорте app,
+# и сами сверяются с app.config['METRICS'] — включить сбор можно и после
+# первого запроса (create_app), когда регистрировать хуки Flask уже нельзя.
+#
+# На каждый запрос считаются: общее время, число SQL-запросов и время в БД
+# (события engine before/after_cursor_execute), время рендера шаблонов
+# (сигналы before_render_template / template_rendered). Итоги запроса
+# уходят в заголовок Server-Timing (видно во вкладке Network браузера)
+# и в агрегаты по маршрутам:
+#   /debug/metrics — HTML-таблица по маршрутам и журнал медленных запросов;
+#   /metrics       — текстовый формат Prometheus.
+# Запросы к БД дольше SLOW_QUERY_MS пишутся в лог вместе с маршрутом.
+#
+# Накладные расходы — пара perf_counter() на SQL-запрос и одна блокировка
+# на HTTP-запрос, так что слой можно держать включённым постоянно.
+# Для потоковых ответов (/api/v1, /export, списки при STREAM_PAGES)
+# учитывается время до начала отдачи тела; рендер таких страниц идёт
+# уже после него и в время шаблонов не входит.
+
+import threading
+import time
+from collections import deque
+
+from flask import g, has_app_context, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# границы гистограммы длительности запросов, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RouteStats:
+    __slots__ = ('requests', 'errors', 'seconds', 'max_seconds', 'db_seconds',
+                 'statements', 'template_seconds', 'buckets')
+
+    def __init__(self):
+        self.requests = self.errors = self.statements = 0
+        self.seconds = self.max_seconds = self.db_seconds = self.template_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+
+class Metrics:
+    def __init__(self, slow_ms=200, slow_log_size=100, log=None, enabled=lambda: True):
+        self.log = log
+        self.enabled = enabled        # () -> bool: собирать ли сейчас
+        self._lock = threading.Lock()
+        self.reset(slow_ms, slow_log_size)
+
+    def reset(self, slow_ms=200, slow_log_size=100):
+        """Обнуляет агрегаты и журнал медленных запросов (create_app с новым config)."""
+        with self._lock:
+            self.slow_seconds = slow_ms / 1000
+            self.slow = deque(maxlen=slow_log_size)
+            self.slow_total = 0
+            self.routes = {}
+            self.started = time.time()
+
+    # --- события SQLAlchemy ---
+
+    def listen(self, engine):
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        event.listen(engine, 'handle_error', self.handle_error)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled():
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # отметки нет — запрос начался, когда сбор был выключен
+        starts = conn.info.get('query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if has_app_context():
+            g.metrics_db = g.get('metrics_db', 0.0) + elapsed
+            g.metrics_sql = g.get('metrics_sql', 0) + 1
+        if elapsed >= self.slow_seconds:
+            route = request.endpoint if has_request_context() else None
+            with self._lock:
+                self.slow_total += 1
+                self.slow.appendleft((time.time(), route, elapsed, statement))
+            if self.log:
+                self.log(f'медленный SQL ({elapsed * 1000:.0f} мс) в {route}: {statement}')
+
+    def handle_error(self, exception_context):
+        # запрос упал — after_cursor_execute не будет, снимаем его отметку
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start'):
+            conn.info['query_start'].pop()
+
+    # --- сигналы Flask ---
+
+    def before_render(self, sender, template, context, **extra):
+        if self.enabled():
+            g.metrics_tpl_start = time.perf_counter()
+
+    def after_render(self, sender, template, context, **extra):
+        started = g.pop('metrics_tpl_start', None)
+        if started is not None:
+            g.metrics_tpl = g.get('metrics_tpl', 0.0) + time.perf_counter() - started
+
+    def before_request(self):
+        if self.enabled():
+            g.metrics_start = time.perf_counter()
+
+    def after_request(self, response):
+        started = g.get('metrics_start')
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        db, sql, tpl = g.get('metrics_db', 0.0), g.get('metrics_sql', 0), g.get('metrics_tpl', 0.0)
+        response.headers.add('Server-Timing',
+                             f'app;dur={total * 1000:.1f}, '
+                             f'db;dur={db * 1000:.1f};desc="{sql} SQL", '
+                             f'tpl;dur={tpl * 1000:.1f}')
+
+        key = request.endpoint or 'unknown'
+        with self._lock:
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+            stats.requests += 1
+            stats.errors += response.status_code >= 500
+            stats.seconds += total
+            stats.max_seconds = max(stats.max_seconds, total)
+            stats.db_seconds += db
+            stats.statements += sql
+            stats.template_seconds += tpl
+            for i, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    stats.buckets[i] += 1
+                    break
+        return response
+
+    # --- выдача ---
+
+    def snapshot(self):
+        with self._lock:
+            routes = {key: {name: getattr(st, name) for name in RouteStats.__slots__}
+                      for key, st in self.routes.items()}
+            for st in routes.values():
+                st['buckets'] = list(st['buckets'])
+            return routes, list(self.slow), self.slow_total
+
+    def prometheus(self, prefix='sisyphus'):
+        routes, _, slow_total = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, values):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            lines.extend(f'{prefix}_{name}{labels} {value}' for labels, value in values)
+
+        def by_route(field):
+            return [(f'{{endpoint="{key}"}}', st[field]) for key, st in sorted(routes.items())]
+
+        metric('requests_total', 'counter', 'HTTP-запросы по маршрутам', by_route('requests'))
+        metric('request_errors_total', 'counter', 'ответы 5xx', by_route('errors'))
+        metric('db_statements_total', 'counter', 'SQL-запросы', by_route('statements'))
+        metric('db_seconds_total', 'counter', 'время в БД', by_route('db_seconds'))
+        metric('template_seconds_total', 'counter', 'время рендера шаблонов', by_route('template_seconds'))
+
+        histogram = []
+        for key, st in sorted(routes.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, st['buckets']):
+                cumulative += count
+                histogram.append((f'_bucket{{endpoint="{key}",le="{bound}"}}', cumulative))
+            histogram.append((f'_bucket{{endpoint="{key}",le="+Inf"}}', st['requests']))
+            histogram.append((f'_sum{{endpoint="{key}"}}', st['seconds']))
+            histogram.append((f'_count{{endpoint="{key}"}}', st['requests']))
+        metric('request_duration_seconds', 'histogram', 'длительность HTTP-запросов', histogram)
+
+        metric('slow_queries_total', 'counter', 'SQL-запросы дольше порога', [('', slow_total)])
+        return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app, engines=()):
+    """Подключает сбор метрик к app и engines; возвращает Metrics.
+
+    Собирает, только пока app.config['METRICS'] включён. Движки, созданные
+    позже, подключаются через Metrics.listen.
+    """
+    metrics = Metrics(app.config.get('SLOW_QUERY_MS', 200),
+                      app.config.get('SLOW_QUERY_LOG', 100),
+                      app.logger.warning,
+                      enabled=lambda: app.config.get('METRICS', False))
+    for engine in engines:
+        metrics.listen(engine)
+    before_render_template.connect(metrics.before_render, app)
+    template_rendered.connect(metrics.after_render, app)
+    app.before_request(metrics.before_request)
+    app.after_request(metrics.after_request)
+    return metrics
@@ -0,0 +1,263 @@
+# migrate.py
+#
+# Доводит схему существующего файла БД до models.py без пересоздания:
+# создаёт недостающие таблицы, колонки, индексы, FTS-индекс поиска
+# и сводки дашборда.
+#
+#   python migrate.py                   # sisyphus_pg.db
+#   python migrate.py path/to/other.db
+#   python migrate.py --explain         # проверить планы запросов списков
+#   python migrate.py --force           # сверить схему, даже если версия совпала
+#   python migrate.py --dedupe          # удалить дубли архитектур перед уникальным индексом
+#
+# Сверка схемы (create_all, колонки и индексы через inspect) идёт при каждом
+# старте приложения, поэтому её итог запоминается строкой в schema_version —
+# отпечатком таблиц, колонок и индексов моделей. Совпал — остаётся один
+# SELECT. Изменения данных, которых не видно по моделям (пересчёт колонок,
+# новые триггеры), отмечаются увеличением MIGRATION.
+
+import argparse
+import hashlib
+import re
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, create_engine, delete, insert, inspect, select, text, update
+from sqlalchemy.exc import DBAPIError
+from search import init_search
+from stats import init_stats
+from latest import init_latest
+from workload import init_workload
+from triage import init_triage
+from rpmver import version_key
+from models import (
+    Base,
+    Package, Maintainer, ACL,
+    PackageArchitecture, PackageUpdate,
+    PackageGroup, Report, PackageLatest, MaintainerWorkload,
+    ReportEvent, ReportAging, SchemaVersion
+)
+
+# увеличивается при миграциях данных, которых не видно по моделям
+MIGRATION = 1
+
+
+class DuplicateRows(RuntimeError):
+    """Уникальный индекс не создать: в таблице есть дубли, а удалять их не разрешено."""
+
+
+def _dedupe_architectures(conn, log, dedupe):
+    """Перед уникальным индексом (package_id, architecture) убирает дубли,
+    оставляя запись с минимальным arch_id, и пишет в лог каждую удалённую.
+    Без dedupe только сообщает о них — данные молча не удаляются."""
+    rows = conn.execute(text(
+        'SELECT arch_id, package_id, architecture FROM architectures WHERE arch_id NOT IN '
+        '(SELECT MIN(arch_id) FROM architectures GROUP BY package_id, architecture) '
+        'ORDER BY package_id, architecture, arch_id'
+    )).all()
+    if rows and not dedupe:
+        sample = ', '.join(f'{arch}@{package_id} (arch_id {arch_id})' for arch_id, package_id, arch in rows[:5])
+        raise DuplicateRows(
+            f'architectures: {len(rows)} повторных записей (package_id, architecture) мешают '
+            f'уникальному индексу: {sample}{" …" if len(rows) > 5 else ""}. '
+            f'python migrate.py --dedupe удалит их, оставив запись с минимальным arch_id')
+    for arch_id, package_id, arch in rows:
+        conn.execute(text('DELETE FROM architectures WHERE arch_id = :id'), {'id': arch_id})
+        log(f'architectures: удалён дубль arch_id={arch_id} (package_id={package_id}, {arch})')
+    return len(rows)
+
+def _add_missing_columns(conn, insp, log):
+    """ALTER TABLE ADD COLUMN для колонок, появившихся в models.py."""
+    for table in Base.metadata.sorted_tables:
+        existing = {col['name'] for col in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            if not col.nullable and col.server_default is None:
+                raise RuntimeError(f'{table.name}.{col.name}: NOT NULL колонку без '
+                                   f'server_default нельзя добавить к существующей таблице')
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(conn.dialect)}'
+            if col.server_default is not None:
+                ddl += f' DEFAULT {col.server_default.arg}'
+            conn.exec_driver_sql(ddl)
+            log(f'{table.name}: добавлена колонка {col.name}')
+
+def _backfill_version_keys(conn, log, chunk=10000):
+    """version_key для обновлений, загруженных до появления колонки."""
+    last, total = 0, 0
+    while True:
+        rows = conn.execute(select(PackageUpdate.update_id, PackageUpdate.update_version)
+                            .where(PackageUpdate.update_id > last, PackageUpdate.version_key.is_(None))
+                            .order_by(PackageUpdate.update_id).limit(chunk)).all()
+        if not rows:
+            break
+        conn.execute(update(PackageUpdate).where(PackageUpdate.update_id == bindparam('uid'))
+                                          .values(version_key=bindparam('key')),
+                     [{'uid': uid, 'key': version_key(ver)} for uid, ver in rows])
+        last, total = rows[-1][0], total + len(rows)
+    if total:
+        log(f'package_updates: заполнен version_key у {total} строк')
+
+def schema_fingerprint(metadata=Base.metadata):
+    """Хэш таблиц, колонок и индексов metadata вместе с MIGRATION."""
+    h = hashlib.sha1(f'migration {MIGRATION}'.encode())
+    for table in metadata.sorted_tables:
+        h.update(f'\n{table.name}'.encode())
+        for col in table.columns:
+            h.update(f' {col.name}:{col.type}:{col.nullable}'.encode())
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            h.update(f' {index.name}({",".join(col.name for col in index.columns)})'.encode())
+    return h.hexdigest()
+
+def schema_version(engine):
+    """Отпечаток, записанный последней миграцией; None — не записан или нет таблицы."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(SchemaVersion.version)
+                                .where(SchemaVersion.name == 'schema')).scalar()
+    except DBAPIError:
+        return None
+
+def _upgrade(engine, log, dedupe=False):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        _add_missing_columns(conn, insp, log)
+        _backfill_version_keys(conn, log)
+        created = 0
+        for table in Base.metadata.sorted_tables:
+            existing = {ix['name'] for ix in insp.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda ix: ix.name):
+                if index.name in existing:
+                    continue
+                if index.name == 'ux_architectures_package_arch':
+                    removed = _dedupe_architectures(conn, log, dedupe)
+                    if removed:
+                        log(f'architectures: удалено дублей {removed}')
+                index.create(conn)
+                created += 1
+                log(f'{table.name}: создан индекс {index.name}')
+        if created:
+            conn.execute(text('ANALYZE'))
+
+def migrate(engine, log=print, force=False, dedupe=False):
+    fingerprint = schema_fingerprint()
+    upgrade = force or schema_version(engine) != fingerprint
+    if upgrade:
+        _upgrade(engine, log, dedupe)
+    # режимы производных таблиц запоминаются по engine, поэтому init_*
+    # вызываются на каждом старте; при готовых триггерах это пара SELECT
+    log(f'полнотекстовый поиск: {init_search(engine)}')
+    log(f'сводки дашборда: {init_stats(engine)}')
+    log(f'текущие версии пакетов: {init_latest(engine)}')
+    log(f'нагрузка мейнтейнеров: {init_workload(engine)}')
+    log(f'история баг-репортов: {init_triage(engine)}')
+    # версия пишется последней: упала инициализация — сверка пойдёт заново
+    if upgrade:
+        with engine.begin() as conn:
+            conn.execute(delete(SchemaVersion).where(SchemaVersion.name == 'schema'))
+            conn.execute(insert(SchemaVersion).values(
+                name='schema', version=fingerprint,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None)))
+        log(f'schema_version: {fingerprint[:12]}')
+
+
+# Запросы списков и страницы пакета, которые должны идти по индексам
+PLAN_CHECKS = [
+    ('package_detail: ACL',
+     select(ACL).where(ACL.package_id == 1)),
+    ('package_detail: архитектуры',
+     select(PackageArchitecture).where(PackageArchitecture.package_id == 1)),
+    ('package_detail: группы',
+     select(PackageGroup).where(PackageGroup.package_id == 1)),
+    ('package_detail: changelog',
+     select(PackageUpdate).where(PackageUpdate.package_id == 1)
+                          .order_by(PackageUpdate.update_date.desc())),
+    ('package_detail: баг-репорты',
+     select(Report).where(Report.package_id == 1)),
+    ('/updates по дате',
+     select(PackageUpdate).order_by(PackageUpdate.update_date.desc(), PackageUpdate.update_id.desc()).limit(50)),
+    ('/updates по версии',
+     select(PackageUpdate).order_by(PackageUpdate.version_key, PackageUpdate.update_id).limit(50)),
+    ('/packages: текущие версии',
+     select(PackageLatest).where(PackageLatest.package_id.in_([1, 2, 3]))),
+    ('/updates по мейнтейнеру',
+     select(PackageUpdate).where(PackageUpdate.updater_id == 1).order_by(PackageUpdate.update_id).limit(50)),
+    ('/reports по статусу',
+     select(Report).where(Report.status == 'NEW', Report.resolution == '').order_by(Report.status, Report.id).limit(50)),
+    ('/reports по дате изменения',
+     select(Report).order_by(Report.last_changed, Report.id).limit(50)),
+    ('/reports по исполнителю',
+     select(Report).where(Report.assignee_id == 1).order_by(Report.id).limit(50)),
+    ('/groups по названию',
+     select(PackageGroup).order_by(PackageGroup.group_name, PackageGroup.group_id).limit(50)),
+    ('/architectures по архитектуре',
+     select(PackageArchitecture).order_by(PackageArchitecture.architecture, PackageArchitecture.arch_id).limit(50)),
+    ('/acl по мейнтейнеру',
+     select(ACL).where(ACL.maintainer_id == 1).order_by(ACL.acl_id).limit(50)),
+    ('/packages по имени',
+     select(Package).order_by(Package.name, Package.package_id).limit(50)),
+    ('/maintainers по никнейму',
+     select(Maintainer).order_by(Maintainer.nickname, Maintainer.maintainer_id).limit(50)),
+    ('/maintainers/workload по открытым баг-репортам',
+     select(MaintainerWorkload).order_by(MaintainerWorkload.open_reports.desc(),
+                                         MaintainerWorkload.maintainer_id.desc()).limit(50)),
+    ('/maintainers/<id>: последние обновления',
+     select(PackageUpdate).where(PackageUpdate.updater_id == 1)
+                          .order_by(PackageUpdate.update_date.desc()).limit(20)),
+    ('/reports без движения',
+     select(ReportAging.report_id).where(ReportAging.resolved_at.is_(None),
+                                         ReportAging.state_since < '2000-01-01')),
+    ('/reports: без движения по пакету',
+     select(ReportAging.report_id).where(ReportAging.package_id == 1, ReportAging.resolved_at.is_(None),
+                                         ReportAging.state_since < '2000-01-01')),
+    ('история баг-репорта',
+     select(ReportEvent).where(ReportEvent.report_id == 1).order_by(ReportEvent.event_id)),
+]
+
+# «SCAN t» без индекса — полный проход таблицы,
+# «USE TEMP B-TREE FOR ORDER BY» — сортировка всей выборки в памяти
+_BAD_PLAN = re.compile(r'^SCAN \w+$|USE TEMP B-TREE FOR ORDER BY')
+
+def query_plan(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)
+    return [row[3] for row in rows]
+
+def explain(engine, log=print):
+    """Печатает планы PLAN_CHECKS; возвращает число запросов без индекса."""
+    failed = 0
+    with engine.connect() as conn:
+        for title, stmt in PLAN_CHECKS:
+            plan = query_plan(conn, stmt)
+            ok = not any(_BAD_PLAN.search(line) for line in plan)
+            failed += not ok
+            log(f"[{'ok' if ok else 'FAIL'}] {title}: {'; '.join(plan)}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Миграция схемы sisyphus DB')
+    parser.add_argument('db', nargs='?', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--explain', action='store_true',
+                        help='после миграции проверить EXPLAIN QUERY PLAN основных запросов')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='удалить повторные архитектуры пакета перед уникальным индексом')
+    parser.add_argument('--force', action='store_true',
+                        help='сверить схему, даже если schema_version совпадает с моделями')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    try:
+        migrate(engine, force=args.force, dedupe=args.dedupe)
+    except DuplicateRows as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.explain and explain(engine):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,8 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, LargeBinary, ForeignKey, Index
+from sqlalchemy.orm import declarative_base, relationship, validates
+import rpmver
 
 Base = declarative_base()
 
@@ -10,12 +11,15 @@ class Package(Base):
     package_id  = Column(Integer, primary_key=True, autoincrement=True)
     name        = Column(String(150), nullable=False, unique=True)
     description = Column(Text, nullable=False)
+    # sha1 содержимого пакета для инкрементальной синхронизации (sync.py)
+    content_hash = Column(String(40))
 
     architectures = relationship('PackageArchitecture', back_populates='package', cascade='all, delete-orphan')
     updates       = relationship('PackageUpdate', back_populates='package', cascade='all, delete-orphan')
     acl_entries   = relationship('ACL', back_populates='package', cascade='all, delete-orphan')
     groups        = relationship('PackageGroup', back_populates='package', cascade='all, delete-orphan')
     reports       = relationship('Report', back_populates='package', cascade='all, delete-orphan')
+    archive       = relationship('UpdateArchive', cascade='all, delete-orphan')
 
 class Maintainer(Base):
     __tablename__ = 'maintainers'
@@ -28,6 +32,11 @@ class Maintainer(Base):
 
 class ACL(Base):
     __tablename__ = 'acl'
+    __table_args__ = (
+        Index('ix_acl_package_id', 'package_id'),
+        Index('ix_acl_maintainer_id', 'maintainer_id'),
+        Index('ix_acl_role', 'role'),
+    )
     acl_id        = Column(Integer, primary_key=True, autoincrement=True)
     package_id    = Column(Integer, ForeignKey('packages.package_id'), nullable=False)
     maintainer_id = Column(Integer, ForeignKey('maintainers.maintainer_id'), nullable=False)
@@ -38,6 +47,10 @@ class ACL(Base):
 
 class PackageArchitecture(Base):
     __tablename__   = 'architectures'
+    __table_args__  = (
+        Index('ux_architectures_package_arch', 'package_id', 'architecture', unique=True),
+        Index('ix_architectures_architecture', 'architecture'),
+    )
     arch_id         = Column(Integer, primary_key=True, autoincrement=True)
     package_id      = Column(Integer, ForeignKey('packages.package_id'), nullable=False)
     architecture    = Column(String(50), nullable=False)
@@ -46,18 +59,85 @@ class PackageArchitecture(Base):
 
 class PackageUpdate(Base):
     __tablename__   = 'package_updates'
+    __table_args__  = (
+        Index('ix_package_updates_package_date', 'package_id', 'update_date'),
+        Index('ix_package_updates_updater_id', 'updater_id'),
+        Index('ix_package_updates_updater_date', 'updater_id', 'update_date'),
+        Index('ix_package_updates_update_date', 'update_date'),
+        Index('ix_package_updates_version_key', 'version_key'),
+        Index('ix_package_updates_package_version', 'package_id', 'version_key'),
+    )
     update_id       = Column(Integer, primary_key=True, autoincrement=True)
     package_id      = Column(Integer, ForeignKey('packages.package_id'), nullable=False)
     updater_id      = Column(Integer, ForeignKey('maintainers.maintainer_id'), nullable=False)
     update_version  = Column(String(50), nullable=False)
     update_date     = Column(Date, nullable=False)
     changelog       = Column(Text, nullable=False)
+    # сортируемый ключ версии RPM (rpmver.version_key): ORDER BY по нему
+    # ставит 10.0 после 9.1; заполняется из update_version при вставке и ORM-изменении
+    version_key     = Column(String(200), default=lambda ctx: rpmver.version_key(
+                                 ctx.get_current_parameters()['update_version']))
 
     package = relationship('Package', back_populates='updates')
     updater = relationship('Maintainer', back_populates='updates')
 
+    @validates('update_version')
+    def _set_version_key(self, key, value):
+        # ORM-изменение версии пересчитывает и ключ (Core UPDATE задаёт его сам)
+        self.version_key = rpmver.version_key(value)
+        return value
+
+class UpdateArchive(Base):
+    # старые записи package_updates, сжатые пачками по пакету (archive.py)
+    __tablename__   = 'update_archive'
+    __table_args__  = (
+        Index('ix_update_archive_package_id', 'package_id', 'archive_id'),
+    )
+    archive_id      = Column(Integer, primary_key=True, autoincrement=True)
+    package_id      = Column(Integer, ForeignKey('packages.package_id'), nullable=False)
+    first_date      = Column(Date, nullable=False)
+    last_date       = Column(Date, nullable=False)
+    row_count       = Column(Integer, nullable=False)
+    data            = Column(LargeBinary, nullable=False)
+
+class PackageLatest(Base):
+    # старшее по версии обновление каждого пакета; поддерживается
+    # триггерами на package_updates (latest.py)
+    __tablename__   = 'package_latest'
+    package_id      = Column(Integer, ForeignKey('packages.package_id'), primary_key=True)
+    update_id       = Column(Integer, nullable=False)
+    update_version  = Column(String(50), nullable=False)
+    version_key     = Column(String(200), nullable=False)
+    update_date     = Column(Date, nullable=False)
+
+class MaintainerWorkload(Base):
+    # нагрузка мейнтейнера: строка на каждого, счётчики поддерживаются
+    # триггерами на maintainers, acl, reports и package_updates (workload.py)
+    __tablename__   = 'maintainer_workload'
+    __table_args__  = (
+        Index('ix_maintainer_workload_packages', 'packages', 'maintainer_id'),
+        Index('ix_maintainer_workload_acl', 'acl', 'maintainer_id'),
+        Index('ix_maintainer_workload_open_reports', 'open_reports', 'maintainer_id'),
+        Index('ix_maintainer_workload_reports', 'reports', 'maintainer_id'),
+        Index('ix_maintainer_workload_updates', 'updates', 'maintainer_id'),
+        Index('ix_maintainer_workload_last_update', 'last_update', 'maintainer_id'),
+    )
+    maintainer_id   = Column(Integer, ForeignKey('maintainers.maintainer_id'), primary_key=True)
+    packages        = Column(Integer, nullable=False, server_default='0')   # ACL с ролью owner
+    acl             = Column(Integer, nullable=False, server_default='0')
+    open_reports    = Column(Integer, nullable=False, server_default='0')   # resolution = ''
+    reports         = Column(Integer, nullable=False, server_default='0')
+    updates         = Column(Integer, nullable=False, server_default='0')
+    last_update     = Column(Date)
+
+    maintainer = relationship('Maintainer')
+
 class PackageGroup(Base):
     __tablename__ = 'package_groups'
+    __table_args__ = (
+        Index('ix_package_groups_name_package', 'group_name', 'package_id'),
+        Index('ix_package_groups_package_id', 'package_id'),
+    )
     group_id    = Column(Integer, primary_key=True, autoincrement=True)
     group_name  = Column(String(100), nullable=False)
     package_id  = Column(Integer, ForeignKey('packages.package_id'), nullable=False)
@@ -66,6 +146,14 @@ class PackageGroup(Base):
 
 class Report(Base):
     __tablename__   = 'reports'
+    __table_args__  = (
+        Index('ix_reports_package_id', 'package_id'),
+        Index('ix_reports_assignee_id', 'assignee_id'),
+        Index('ix_reports_status_resolution', 'status', 'resolution'),
+        Index('ix_reports_resolution', 'resolution'),
+        Index('ix_reports_last_changed', 'last_changed'),
+        Index('ix_reports_reporter', 'reporter'),
+    )
     id              = Column(Integer, primary_key=True, autoincrement=True)
     package_id      = Column(Integer, ForeignKey('packages.package_id'), nullable=False)
     status          = Column(String(20), nullable=False)
@@ -77,3 +165,81 @@ class Report(Base):
 
     package  = relationship('Package', back_populates='reports')
     assignee = relationship('Maintainer', back_populates='reports')
+
+class ReportEvent(Base):
+    # история баг-репортов, только дописывается: состояние после каждого
+    # изменения статуса, вердикта, исполнителя или пакета (триггеры, triage.py)
+    __tablename__   = 'report_events'
+    __table_args__  = (
+        Index('ix_report_events_report', 'report_id', 'event_id'),
+    )
+    event_id    = Column(Integer, primary_key=True, autoincrement=True)
+    report_id   = Column(Integer, nullable=False)       # без FK: история переживает репорт
+    kind        = Column(String(10), nullable=False)    # open | change | delete | seed
+    package_id  = Column(Integer, nullable=False)
+    assignee_id = Column(Integer, nullable=False)
+    status      = Column(String(20), nullable=False)
+    resolution  = Column(String(20), nullable=False)
+    changed_at  = Column(DateTime, nullable=False)
+
+class ReportAging(Base):
+    # текущее состояние каждого репорта по истории: с какого момента он в
+    # нынешнем статусе и когда решён (NULL — открыт)
+    __tablename__   = 'report_aging'
+    __table_args__  = (
+        Index('ix_report_aging_open', 'resolved_at', 'state_since'),
+        Index('ix_report_aging_package', 'package_id', 'resolved_at', 'state_since'),
+        Index('ix_report_aging_assignee', 'assignee_id', 'resolved_at', 'state_since'),
+    )
+    report_id   = Column(Integer, primary_key=True)
+    package_id  = Column(Integer, nullable=False)
+    assignee_id = Column(Integer, nullable=False)
+    status      = Column(String(20), nullable=False)
+    opened_at   = Column(DateTime)                      # NULL — открыт до начала истории
+    state_since = Column(DateTime, nullable=False)
+    resolved_at = Column(DateTime)
+
+class AgingMetric(Base):
+    # по пакету и по исполнителю: открытые, решённые и медиана дней до решения
+    __tablename__   = 'aging_metrics'
+    scope       = Column(String(10), primary_key=True)  # package | assignee
+    key_id      = Column(Integer, primary_key=True)
+    open        = Column(Integer, nullable=False)
+    resolved    = Column(Integer, nullable=False)
+    median_days = Column(Float)
+
+class SchemaVersion(Base):
+    # отпечаток схемы, до которой migrate.py довёл файл: совпал с моделями —
+    # create_all и сверка колонок/индексов при старте пропускаются
+    __tablename__ = 'schema_version'
+    name       = Column(String(50), primary_key=True)
+    version    = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, nullable=False)
+
+class ChangeVersion(Base):
+    # счётчики изменений для ETag (versions.py): ключ — имя таблицы,
+    # 'package:<id>' или служебные 'revision' / 'bulk'
+    __tablename__ = 'change_versions'
+    key        = Column(String(64), primary_key=True)
+    version    = Column(Integer, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+
+class Job(Base):
+    # фоновые задачи (jobs.py): очередь и история запусков
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status', 'status', 'job_id'),
+    )
+    job_id      = Column(Integer, primary_key=True, autoincrement=True)
+    kind        = Column(String(32), nullable=False)
+    params      = Column(Text)
+    status      = Column(String(16), nullable=False)
+    owner       = Column(String(255))       # 'хост:pid' процесса, выполняющего задачу
+    done        = Column(Integer, nullable=False, default=0)
+    total       = Column(Integer, nullable=False, default=0)
+    message     = Column(String(500))
+    error       = Column(Text)
+    result      = Column(Text)
+    created_at  = Column(DateTime, nullable=False)
+    started_at  = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,177 @@
+# pagination.py
+#
+# Keyset (cursor) пагинация для страниц списков.
+# Вместо OFFSET продолжаем выборку «после» последней показанной строки:
+# WHERE (sort_col, pk) > (v, k) ORDER BY sort_col, pk LIMIT n.
+# Первичный ключ служит тайбрейкером для неуникальных колонок сортировки.
+#
+# paginate(..., stream=True) не читает страницу целиком: page.items — генератор
+# по курсору БД (yield_per), а ссылки «вперёд/назад» заполняются по мере
+# чтения строк. Шаблон, выводящий pager после таблицы, может отдаваться
+# потоком (app.stream_page) — строки уходят клиенту, пока читаются следующие.
+
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+PER_PAGE_DEFAULT = 50
+PER_PAGE_MAX     = 500
+# строк, читаемых из курсора за раз при stream=True
+STREAM_CHUNK     = 100
+
+
+class Page:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, args=None):
+        self.items       = items
+        self.per_page    = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total       = total
+        # параметры, которые нужно сохранить в ссылках «вперёд/назад»
+        self.args        = args or {}
+
+
+def _to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _from_json(value, col):
+    if value is None:
+        return None
+    py_type = col.type.python_type
+    if py_type is date:
+        return date.fromisoformat(value[:10])
+    if py_type is datetime:
+        return datetime.fromisoformat(value)
+    return py_type(value)
+
+def encode_cursor(value, pk, direction):
+    raw = json.dumps([_to_json(value), pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort_col, pk_col):
+    """Возвращает (value, pk, direction) или None для битого курсора."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk, direction = json.loads(raw)
+        return _from_json(value, sort_col), int(pk), direction
+    except (ValueError, TypeError):
+        return None
+
+
+def _seek(sort_col, pk_col, value, pk, ascending):
+    """Условие «строка идёт после (value, pk)» в заданном порядке.
+
+    В SQLite NULL меньше любого значения, поэтому для nullable-колонок
+    (Report.last_changed) NULL'ы идут первыми при asc и последними при desc.
+    """
+    if sort_col.key == pk_col.key:
+        return pk_col > pk if ascending else pk_col < pk
+
+    nullable = sort_col.expression.nullable
+    if ascending:
+        if value is None:
+            return or_(and_(sort_col.is_(None), pk_col > pk), sort_col.isnot(None))
+        return or_(sort_col > value, and_(sort_col == value, pk_col > pk))
+    if value is None:
+        return and_(sort_col.is_(None), pk_col < pk)
+    cond = or_(sort_col < value, and_(sort_col == value, pk_col < pk))
+    return or_(cond, sort_col.is_(None)) if nullable else cond
+
+
+def _order(sort_col, pk_col, ascending):
+    if sort_col.key == pk_col.key:
+        return [pk_col.asc() if ascending else pk_col.desc()]
+    if ascending:
+        return [sort_col.asc(), pk_col.asc()]
+    return [sort_col.desc(), pk_col.desc()]
+
+
+def _streamed(page, q, per_page, chunk, make_cursor, with_prev):
+    result = q.session.execute(q.statement.execution_options(yield_per=chunk)).scalars()
+    try:
+        last = None
+        for n, row in enumerate(result):
+            if n == per_page:
+                # лишняя строка — следующая страница есть
+                page.next_cursor = make_cursor(last, 'next')
+                break
+            if n == 0 and with_prev:
+                page.prev_cursor = make_cursor(row, 'prev')
+            last = row
+            yield row
+    finally:
+        result.close()
+
+
+def keyset_select(stmt, sort_col, pk_col, sort_dir, cursor=None):
+    """Core-выборка stmt в порядке (sort_col, pk) с продолжением после cursor.
+
+    Для API: курсор — тот же, что в ссылках «вперёд» HTML-списков
+    (encode_cursor(..., 'next')), страница «назад» не нужна. Битый курсор —
+    ValueError.
+    """
+    ascending = sort_dir != 'desc'
+    if cursor:
+        decoded = decode_cursor(cursor, sort_col, pk_col)
+        if decoded is None:
+            raise ValueError(f'битый курсор «{cursor}»')
+        stmt = stmt.where(_seek(sort_col, pk_col, decoded[0], decoded[1], ascending))
+    return stmt.order_by(None).order_by(*_order(sort_col, pk_col, ascending))
+
+
+def paginate(q, sort_col, pk_col, sort_dir, args, count_default=True, stream=False, chunk=STREAM_CHUNK):
+    """Одна страница запроса q.
+
+    args — request.args: cursor, per_page и count (0/1 — считать ли COUNT(*),
+    на больших таблицах с contains()-фильтрами это отдельный дорогой запрос).
+    stream — отдать строки генератором (см. начало модуля); страницы «назад»
+    читаются в обратном порядке и всё равно собираются в список.
+    """
+    try:
+        per_page = int(args.get('per_page', PER_PAGE_DEFAULT))
+    except ValueError:
+        per_page = PER_PAGE_DEFAULT
+    per_page = max(1, min(per_page, PER_PAGE_MAX))
+
+    with_count = args.get('count', '1' if count_default else '0') == '1'
+    total = q.order_by(None).count() if with_count else None
+
+    cursor = decode_cursor(args['cursor'], sort_col, pk_col) if args.get('cursor') else None
+    backwards = cursor is not None and cursor[2] == 'prev'
+    ascending = (sort_dir != 'desc') != backwards
+
+    if cursor:
+        q = q.filter(_seek(sort_col, pk_col, cursor[0], cursor[1], ascending))
+    q = q.order_by(None).order_by(*_order(sort_col, pk_col, ascending)).limit(per_page + 1)
+
+    def _cursor(row, direction):
+        return encode_cursor(getattr(row, sort_col.key), getattr(row, pk_col.key), direction)
+
+    page_args = {'per_page': per_page}
+    if with_count != count_default:
+        page_args['count'] = '1' if with_count else '0'
+
+    if stream and not backwards:
+        page = Page(None, per_page, total=total, args=page_args)
+        page.items = _streamed(page, q, per_page, chunk, _cursor, cursor is not None)
+        return page
+
+    rows = q.all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = _cursor(rows[-1], 'next')
+        if cursor and (has_more or not backwards):
+            prev_cursor = _cursor(rows[0], 'prev')
+
+    return Page(rows, per_page, next_cursor, prev_cursor, total, page_args)
@@ -0,0 +1,206 @@
+# queries.py
+#
+# Общий слой построения запросов для списков.
+# Каждая модель объявляет связи, которые читает её шаблон, и они
+# подгружаются тем же SELECT'ом (JOIN), а не по одному запросу на строку.
+# Фильтры и сортировка по параметрам запроса тоже описаны здесь — их
+# разделяют HTML-списки и JSON API (/api/v1).
+
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload
+import search
+import triage
+from models import (
+    Package, Maintainer, ACL,
+    PackageArchitecture, PackageUpdate,
+    PackageGroup, Report
+)
+
+# Какие связи и какие их колонки нужны шаблонам списков:
+# updates.html -> u.package.name, u.updater.nickname и т.д.
+LIST_RELATIONS = {
+    PackageUpdate:       [(PackageUpdate.package, Package.name),
+                          (PackageUpdate.updater, Maintainer.nickname)],
+    ACL:                 [(ACL.package, Package.name),
+                          (ACL.maintainer, Maintainer.nickname)],
+    Report:              [(Report.package, Package.name),
+                          (Report.assignee, Maintainer.nickname)],
+    PackageGroup:        [(PackageGroup.package, Package.name)],
+    PackageArchitecture: [(PackageArchitecture.package, Package.name)],
+}
+
+# Фильтры списков: параметр запроса -> (колонка, способ сравнения)
+#   'id'     — целое число, точное равенство (нечисловое значение игнорируется)
+#   'eq'     — точное равенство (значения из фиксированных списков)
+#   'like'   — подстрока
+#   'search' — подстрока через FTS-индекс (search.contains)
+#   'date'   — дата в ISO-формате
+#   'stale'  — открыт и не менял статус дольше N дней (triage.stale, по индексу)
+LIST_FILTERS = {
+    Maintainer:          [('maintainer_id',  Maintainer.maintainer_id,       'id'),
+                          ('nickname',       Maintainer.nickname,            'like'),
+                          ('full_name',      Maintainer.full_name,           'like')],
+    Package:             [('package_id',     Package.package_id,             'id'),
+                          ('name',           Package.name,                   'search'),
+                          ('description',    Package.description,            'search')],
+    PackageArchitecture: [('arch_id',        PackageArchitecture.arch_id,    'id'),
+                          ('package_id',     PackageArchitecture.package_id, 'id'),
+                          ('architecture',   PackageArchitecture.architecture, 'like')],
+    PackageGroup:        [('group_id',       PackageGroup.group_id,          'id'),
+                          ('package_id',     PackageGroup.package_id,        'id'),
+                          ('group_name',     PackageGroup.group_name,        'like')],
+    PackageUpdate:       [('update_id',      PackageUpdate.update_id,        'id'),
+                          ('package_id',     PackageUpdate.package_id,       'id'),
+                          ('updater_id',     PackageUpdate.updater_id,       'id'),
+                          ('update_version', PackageUpdate.update_version,   'search'),
+                          ('update_date',    PackageUpdate.update_date,      'date')],
+    # статус и вердикт выбираются из фиксированных списков — точное
+    # сравнение идёт по индексу (status, resolution), в отличие от LIKE
+    Report:              [('report_id',      Report.id,                      'id'),
+                          ('package_id',     Report.package_id,              'id'),
+                          ('status',         Report.status,                  'eq'),
+                          ('resolution',     Report.resolution,              'eq'),
+                          ('assignee_id',    Report.assignee_id,             'id'),
+                          ('reporter',       Report.reporter,                'search'),
+                          ('stale',          Report.id,                      'stale')],
+    ACL:                 [('acl_id',         ACL.acl_id,                     'id'),
+                          ('package_id',     ACL.package_id,                 'id'),
+                          ('maintainer_id',  ACL.maintainer_id,              'id'),
+                          ('role',           ACL.role,                       'like')],
+}
+
+# Допустимые колонки сортировки; первая — первичный ключ (по умолчанию и тайбрейкер)
+LIST_SORTS = {
+    Maintainer:          ['maintainer_id', 'nickname', 'full_name'],
+    Package:             ['package_id', 'name', 'description'],
+    PackageArchitecture: ['arch_id', 'package_id', 'architecture'],
+    PackageGroup:        ['group_id', 'package_id', 'group_name'],
+    PackageUpdate:       ['update_id', 'package_id', 'updater_id', 'update_version', 'update_date'],
+    Report:              ['id', 'package_id', 'status', 'resolution', 'assignee_id', 'reporter', 'last_changed'],
+    ACL:                 ['acl_id', 'package_id', 'maintainer_id', 'role'],
+}
+
+# параметр sort_by, за которым стоит другая колонка: версии сортируются
+# по ключу RPM (rpmver.version_key), а не по строке
+SORT_COLUMNS = {
+    (PackageUpdate, 'update_version'): PackageUpdate.version_key,
+}
+
+_SEARCH_KIND = {model: kind for kind, (model, *_) in search.MODELS.items()}
+
+# Сколько SQL-запросов допускает каждая страница списка:
+# версии для ETag (versions.current) + COUNT(*) для пагинации + основной
+# запрос + выпадающие списки пакетов/мейнтейнеров (последние берутся из
+# кэша lookups, так что обычно запросов меньше — бюджет остаётся верхней
+# границей). Число не должно зависеть от количества строк в таблице.
+VIEW_STATEMENT_BUDGET = {
+    # + размер или пачка архива при фильтре по пакету (archive.py)
+    'list_updates':       6,
+    'list_acl':           5,
+    # + метрики и число «без движения» при фильтре по пакету или исполнителю
+    'list_reports':       7,
+    'list_groups':        4,
+    'list_architectures': 4,
+    # версии + пакет с ACL/группами/архитектурами + обновления + баг-репорты
+    # (+ размер архива обновлений, если живые строки кончились на первой странице)
+    'package_detail':     5,
+    'package_updates':    3,
+    'package_reports':    2,
+    'list_workload':      3,
+    # версии + мейнтейнер + его нагрузка + открытые по статусам + ACL,
+    # последние обновления и открытые баг-репорты
+    'maintainer_detail':  7,
+}
+
+
+def list_query(db, model):
+    """Запрос списка model с заранее подгруженными связями.
+
+    Все связи many-to-one с NOT NULL внешним ключом, поэтому
+    используем INNER JOIN и берём у связанной таблицы только нужную колонку
+    (без Package.description и прочего текста).
+    """
+    opts = [
+        joinedload(rel, innerjoin=True).load_only(col)
+        for rel, col in LIST_RELATIONS.get(model, [])
+    ]
+    return db.query(model).options(*opts)
+
+
+def list_filters(db, model, args):
+    """Условия WHERE по параметрам запроса и введённые значения (для формы фильтра)."""
+    conditions, values = [], {}
+    for param, column, how in LIST_FILTERS[model]:
+        value = args.get(param, '').strip()
+        values[param] = value
+        if not value:
+            continue
+        if how == 'id':
+            try: conditions.append(column == int(value))
+            except ValueError: pass
+        elif how == 'date':
+            try: conditions.append(column == date.fromisoformat(value))
+            except ValueError: pass
+        elif how == 'eq':
+            conditions.append(column == value)
+        elif how == 'stale':
+            try: conditions.append(triage.stale(db, int(value)))
+            except ValueError: pass
+        elif how == 'search':
+            conditions.append(search.contains(db, _SEARCH_KIND[model], column, value))
+        else:
+            conditions.append(column.contains(value))
+    return conditions, values
+
+def list_sort(model, args):
+    """(колонка сортировки, направление); неизвестная колонка — первичный ключ."""
+    allowed = LIST_SORTS[model]
+    sort_by = args.get('sort_by', allowed[0])
+    if sort_by not in allowed:
+        sort_by = allowed[0]
+    return sort_by, args.get('sort_dir', 'asc')
+
+
+def sort_column(model, name):
+    return SORT_COLUMNS.get((model, name)) or getattr(model, name)
+
+
+def row_select(model, labels=True):
+    """Core SELECT колонок model и подписей связей (package_name, updater_nickname…).
+
+    Строки — кортежи, без ORM-объектов: для API и выгрузок.
+    """
+    stmt = select(*model.__table__.columns)
+    for rel, col in LIST_RELATIONS.get(model, []) if labels else []:
+        stmt = stmt.add_columns(col.label(f'{rel.key}_{col.key}')).join(rel)
+    return stmt
+
+def stream_rows(db, stmt, chunk=1000):
+    """Генератор dict'ов по строкам stmt; в памяти не больше chunk строк."""
+    result = db.execute(stmt.execution_options(yield_per=chunk))
+    keys = list(result.keys())
+    for row in result:
+        yield dict(zip(keys, row))
+
+
+@contextmanager
+def count_statements(engine):
+    """Считает SQL-запросы, выполненные через engine внутри блока.
+
+        with count_statements(engine) as c:
+            client.get('/updates')
+        assert c['count'] <= 3
+    """
+    counter = {'count': 0}
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _on_execute)
@@ -0,0 +1,169 @@
+# replicas.py
+#
+# Реплики для чтения: страницы, которые только читают (get_read_db в
+# app.py), на GET обслуживает пул engine'ов-реплик, а записи и всё
+# остальное идут в основную БД — чтение зеркал не спорит с импортом за
+# основной файл.
+#
+# Реплика — либо SQLite-копия основной БД (REPLICA_FILES), которую процесс
+# сам обновляет через backup API (db.refresh_snapshot), либо готовая
+# реплика по URL (REPLICA_URLS): её наполняет кто-то другой, например
+# python replicas.py по крону, и процесс только сверяет её свежесть.
+#
+# Свежесть меряется глобальной ревизией change_versions (versions.py) —
+# её увеличивает любая запись, и через ORM, и массовая. Раз в
+# REPLICA_REFRESH секунд фоновый поток читает ревизию основной, копирует
+# заново те копии, у которых она другая (совпала — копировать нечего), и
+# запоминает для каждой реплики её ревизию и момент, на который в ней
+# точно было всё записанное раньше. Копия — это чтение всего файла
+# основной, поэтому одна и та же копия переснимается не чаще раза в
+# REPLICA_COPY_INTERVAL секунд, сколько бы записей ни шло. Реплика, не
+# догонявшая основную дольше REPLICA_MAX_LAG секунд, не выбирается —
+# чтение идёт с основной; MAX_LAG поэтому не меньше COPY_INTERVAL.
+#
+# Чтение своих записей: после запроса, закоммитившего запись (POST формы
+# или GET-удаление), app.py кладёт в сессию Flask записанную им ревизию,
+# и следующий GET (редирект на список или карточку) берёт только реплику
+# с ревизией не меньше, иначе — основную.
+#
+#   python replicas.py copy1.db copy2.db                   # обновить копии sisyphus_pg.db
+#   python replicas.py --from sqlite:///main.db copy1.db
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+import traceback
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker
+from db import make_engine, refresh_snapshot
+import versions
+
+
+def _revision(engine):
+    # у пустой копии change_versions ещё нет
+    try:
+        with engine.connect() as conn:
+            return versions.revision(conn)
+    except DBAPIError:
+        return None
+
+
+class Replica:
+    def __init__(self, engine, copy):
+        self.engine = engine
+        self.copy = copy              # SQLite-копия, которую обновляет этот процесс
+        self.session = sessionmaker(bind=engine)
+        self.revision = None          # ревизия при последней проверке
+        self.synced = None            # time.monotonic(), на который реплика догоняла основную
+        self.copied = None            # time.monotonic() последнего копирования
+
+    @property
+    def name(self):
+        return self.engine.url.database if self.copy else self.engine.url.render_as_string()
+
+
+class ReplicaPool:
+    def __init__(self, primary, replicas, max_lag=60, prepare=None, log=None, copy_interval=30):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.copy_interval = copy_interval
+        self.prepare = prepare        # init_* для engine реплики после первой проверки
+        self.log = log
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def refresh(self):
+        """Догоняет копии и сверяет ревизии реплик с основной; возвращает [(реплика, скопирована)]."""
+        with self._lock:
+            started = time.monotonic()
+            target = _revision(self.primary)
+            if target is None:
+                if self.log:
+                    self.log('реплики не обновлены: основная БД недоступна')
+                return []
+            done = []
+            for replica in self.replicas:
+                try:
+                    copied = (replica.copy and _revision(replica.engine) != target and
+                              (replica.copied is None or started - replica.copied >= self.copy_interval))
+                    if copied:
+                        refresh_snapshot(self.primary, replica.engine)
+                        replica.copied = started
+                    if replica.revision is None and self.prepare:
+                        self.prepare(replica.engine)
+                    replica.revision = _revision(replica.engine)
+                except Exception:
+                    if self.log:
+                        self.log(f'реплика {replica.name} не обновлена:\n{traceback.format_exc()}')
+                    continue
+                # всё, что закоммичено до started, в реплике уже есть
+                if replica.revision is not None and replica.revision >= target:
+                    replica.synced = started
+                done.append((replica, copied))
+            return done
+
+    def start(self, interval):
+        """Обновляет реплики раз в interval секунд в фоновом потоке, первый раз — сразу."""
+        def loop():
+            while True:
+                self.refresh()
+                if self._stop.wait(interval):
+                    return
+        threading.Thread(target=loop, name='replicas', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def pick(self, min_revision=0):
+        """Свежая реплика с ревизией не ниже min_revision (по кругу) или None — читать с основной."""
+        now = time.monotonic()
+        fresh = [r for r in self.replicas
+                 if r.synced is not None and now - r.synced <= self.max_lag and r.revision >= min_revision]
+        if not fresh:
+            return None
+        return fresh[next(self._turn) % len(fresh)]
+
+    def status(self):
+        """[{реплика, ревизия, отставание в секундах}] — для CLI и отладки."""
+        now = time.monotonic()
+        return [{'replica': r.name, 'revision': r.revision,
+                 'lag_s': round(now - r.synced, 2) if r.synced is not None else None}
+                for r in self.replicas]
+
+
+def make_pool(primary, config, prepare=None, log=None):
+    """ReplicaPool по REPLICA_FILES и REPLICA_URLS из config (app.config)."""
+    replicas = [Replica(make_engine(f'sqlite:///{path}', config), copy=True)
+                for path in config.get('REPLICA_FILES', [])]
+    replicas += [Replica(make_engine(url, config), copy=False)
+                 for url in config.get('REPLICA_URLS', [])]
+    return ReplicaPool(primary, replicas, config.get('REPLICA_MAX_LAG', 60), prepare, log,
+                       config.get('REPLICA_COPY_INTERVAL', 30))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Обновить SQLite-копии основной БД для чтения')
+    parser.add_argument('copies', nargs='+', help='файлы копий')
+    parser.add_argument('--from', dest='src', default='sqlite:///sisyphus_pg.db', help='URL основной БД')
+    args = parser.parse_args(argv)
+
+    pool = make_pool(make_engine(args.src, {}), {'REPLICA_FILES': args.copies},
+                     log=lambda message: print(message, file=sys.stderr))
+    started = time.perf_counter()
+    done = pool.refresh()
+    for replica, copied in done:
+        print(f'{replica.name}: ревизия {replica.revision}, {"скопирована" if copied else "уже актуальна"}')
+    print(f'{time.perf_counter() - started:.2f} с')
+    return 0 if len(done) == len(pool.replicas) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# rpmver.py
+#
+# Сравнение версий как в RPM (rpmvercmp) и сортируемый ключ версии.
+#
+# Строка версии — [epoch:]version[-release]. Части сравниваются по
+# сегментам: подряд идущие цифры или буквы, прочие символы — разделители.
+# Числа сравниваются как числа (10 > 9), буквенный сегмент младше
+# числового, '~' младше всего (даже конца строки: 1.0~rc1 < 1.0),
+# '^' старше конца строки, но младше любого сегмента (1.0 < 1.0^git1 < 1.0.1).
+#
+# version_key() кодирует то же правило в строку, которую можно сравнивать
+# обычным ORDER BY: package_updates.version_key заполняется значением
+# по умолчанию колонки при любой вставке — ORM, importer, sync.
+
+import re
+
+_SEGMENT = re.compile(r'(\d+|[a-zA-Z]+|~|\^)')
+
+# коды в ключе: '~' < конец < '^' < буквы < числа
+_TILDE, _END, _CARET, _ALPHA, _NUM = '0', '1', '2', '3', '4'
+
+
+def parse_evr(value):
+    """'2:1.0-alt1' -> (2, '1.0', 'alt1'); без эпохи — 0, без релиза — ''."""
+    value = (value or '').strip()
+    epoch, sep, rest = value.partition(':')
+    if sep and epoch.isdigit():
+        value = rest
+        epoch = int(epoch)
+    else:
+        epoch = 0
+    version, _, release = value.rpartition('-') if '-' in value else (value, '', '')
+    return epoch, version, release
+
+
+def _segments(value):
+    return _SEGMENT.findall(value)
+
+def rpmvercmp(a, b):
+    """-1, 0 или 1 — как rpmvercmp() из librpm для одной части (version или release)."""
+    if a == b:
+        return 0
+    one, two = _segments(a), _segments(b)
+    for x, y in zip(one, two):
+        if x == y:
+            continue
+        if x == '~' or y == '~':
+            return -1 if x == '~' else 1
+        if x == '^' or y == '^':
+            return -1 if x == '^' else 1
+        if x.isdigit() != y.isdigit():
+            return 1 if x.isdigit() else -1
+        if x.isdigit():
+            x, y = int(x), int(y)
+        if x != y:
+            return 1 if x > y else -1
+    # общий префикс совпал — решает остаток более длинной строки
+    rest = one[len(two):] or two[len(one):]
+    if not rest:
+        return 0
+    sign = 1 if len(one) > len(two) else -1
+    return -sign if rest[0] == '~' else sign
+
+def evr_compare(a, b):
+    """Сравнение полных строк версий [epoch:]version[-release]."""
+    (ea, va, ra), (eb, vb, rb) = parse_evr(a), parse_evr(b)
+    if ea != eb:
+        return 1 if ea > eb else -1
+    return rpmvercmp(va, vb) or rpmvercmp(ra, rb)
+
+
+def _part_key(value):
+    out = []
+    for seg in _segments(value):
+        if seg == '~':
+            out.append(_TILDE)
+        elif seg == '^':
+            out.append(_CARET)
+        elif seg.isdigit():
+            digits = seg.lstrip('0')
+            out.append(f'{_NUM}{len(digits):02d}{digits}')
+        else:
+            out.append(_ALPHA + seg)
+    out.append(_END)
+    return ''.join(out)
+
+def version_key(value):
+    """Строка, порядок которой совпадает с evr_compare():
+    version_key(a) < version_key(b)  <=>  evr_compare(a, b) < 0."""
+    epoch, version, release = parse_evr(value)
+    return f'{epoch:010d}{_part_key(version)}{_part_key(release)}'
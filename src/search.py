@@ -0,0 +1,192 @@
+# search.py
+#
+# Полнотекстовый поиск по пакетам, changelog'ам и баг-репортам на SQLite FTS5.
+#
+# Индекс search_index(title, body) один на все три таблицы; тип и id исходной
+# строки закодированы в rowid (ref_id * 4 + kind), поэтому триггеры удаляют и
+# обновляют записи по rowid без сканирования индекса. Триггеры работают и для
+# ORM, и для массовых Core-вставок.
+#
+# Если SQLite собран с tokenize='trigram' (3.34+), MATCH по фразе эквивалентен
+# подстроке LIKE '%…%' — им же заменяются contains()-фильтры списков.
+# Без FTS5 (или не на SQLite) всё откатывается на прежний LIKE.
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import Package, PackageUpdate, Report
+
+# kind -> (код в rowid, таблица, pk, колонка title, колонка body)
+SOURCES = {
+    'package': (1, 'packages',        'package_id', 'name',           'description'),
+    'update':  (2, 'package_updates', 'update_id',  'update_version', 'changelog'),
+    'report':  (3, 'reports',         'id',         'reporter',       'summary'),
+}
+KIND_BY_CODE = {code: kind for kind, (code, *_) in SOURCES.items()}
+
+# Модель и колонки для LIKE-фолбэка
+MODELS = {
+    'package': (Package,       Package.package_id,      Package.name,                 Package.description),
+    'update':  (PackageUpdate, PackageUpdate.update_id, PackageUpdate.update_version, PackageUpdate.changelog),
+    'report':  (Report,        Report.id,               Report.reporter,              Report.summary),
+}
+
+# режим поиска по engine: 'trigram' | 'fts' | 'like'
+_modes = {}
+
+# короче триграммы FTS5 trigram ничего не найдёт
+TRIGRAM_MIN = 3
+
+
+def create_triggers(conn):
+    for kind, (code, table, pk, title, body) in SOURCES.items():
+        rowid_new = f'new.{pk} * 4 + {code}'
+        rowid_old = f'old.{pk} * 4 + {code}'
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO search_index(rowid, title, body) VALUES ({rowid_new}, new.{title}, new.{body}); END')
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN '
+            f'DELETE FROM search_index WHERE rowid = {rowid_old}; END')
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE OF {title}, {body} ON {table} BEGIN '
+            f'UPDATE search_index SET title = new.{title}, body = new.{body} WHERE rowid = {rowid_old}; END')
+
+def drop_triggers(conn):
+    """Снимает триггеры синхронизации (перед массовой загрузкой)."""
+    for kind, (code, table, *_) in SOURCES.items():
+        for suffix in ('ai', 'ad', 'au'):
+            conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS search_{table}_{suffix}')
+
+def rebuild_search(conn):
+    """Полностью перестраивает search_index по исходным таблицам."""
+    conn.exec_driver_sql('DELETE FROM search_index')
+    for kind, (code, table, pk, title, body) in SOURCES.items():
+        conn.exec_driver_sql(
+            f'INSERT INTO search_index(rowid, title, body) '
+            f'SELECT {pk} * 4 + {code}, {title}, {body} FROM {table}')
+    conn.exec_driver_sql("INSERT INTO search_index(search_index) VALUES ('optimize')")
+
+def init_search(engine):
+    """Создаёт FTS-индекс и триггеры (если их ещё нет) и запоминает режим."""
+    if engine.dialect.name != 'sqlite':
+        _modes[engine] = 'like'
+        return 'like'
+
+    with engine.begin() as conn:
+        row = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name='search_index'").first()
+        if row:
+            mode = 'trigram' if 'trigram' in row[0] else 'fts'
+        else:
+            mode = 'like'
+            for tokenize, candidate in (('trigram', 'trigram'), ('unicode61', 'fts')):
+                try:
+                    conn.exec_driver_sql(
+                        f"CREATE VIRTUAL TABLE search_index USING fts5(title, body, tokenize='{tokenize}')")
+                except OperationalError:
+                    continue
+                mode = candidate
+                break
+            if mode != 'like':
+                rebuild_search(conn)
+        if mode != 'like':
+            create_triggers(conn)
+
+    _modes[engine] = mode
+    return mode
+
+def search_mode(db):
+    return _modes.get(db.get_bind(), 'like')
+
+
+def _phrase(q):
+    return '"' + q.replace('"', '""') + '"'
+
+def contains(db, kind, column, value):
+    """Замена column.contains(value) для колонок title/body из SOURCES.
+
+    При trigram-индексе превращается в rowid-поиск по FTS, иначе — обычный LIKE.
+    """
+    code, table, pk, title, body = SOURCES[kind]
+    if search_mode(db) != 'trigram' or len(value) < TRIGRAM_MIN:
+        return column.contains(value)
+    field = 'title' if column.key == title else 'body'
+    pk_col = MODELS[kind][1]
+    match = text(
+        f'SELECT rowid / 4 FROM search_index '
+        f'WHERE search_index MATCH :fts_q AND rowid % 4 = {code}'
+    ).bindparams(fts_q=f'{field} : {_phrase(value)}')
+    return pk_col.in_(match)
+
+
+def _highlight(snippet):
+    # \x02 / \x03 — маркеры совпадения из snippet(), остальное экранируем
+    return Markup(str(escape(snippet)).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+def search(db, q, kinds=None, limit=50):
+    """Ранжированный поиск. Возвращает список dict(kind, id, rank, snippet)."""
+    q = q.strip()
+    kinds = [k for k in (kinds or SOURCES) if k in SOURCES]
+    if not q or not kinds:
+        return []
+
+    mode = search_mode(db)
+    if mode == 'like' or (mode == 'trigram' and len(q) < TRIGRAM_MIN):
+        return _search_like(db, q, kinds, limit)
+
+    codes = ', '.join(str(SOURCES[k][0]) for k in kinds)
+    if mode == 'trigram':
+        fts_q = _phrase(q)
+    else:
+        # unicode61: каждое слово как префикс
+        fts_q = ' '.join(_phrase(word) + '*' for word in q.split())
+    rows = db.execute(text(
+        f"SELECT rowid, bm25(search_index, 10.0, 1.0) AS rank, "
+        f"snippet(search_index, 1, char(2), char(3), '…', 16) AS snip "
+        f"FROM search_index WHERE search_index MATCH :q AND rowid % 4 IN ({codes}) "
+        f"ORDER BY rank LIMIT :limit"
+    ), {'q': fts_q, 'limit': limit})
+    return [
+        {'kind': KIND_BY_CODE[rowid % 4], 'id': rowid // 4, 'rank': rank, 'snippet': _highlight(snip)}
+        for rowid, rank, snip in rows
+    ]
+
+def _search_like(db, q, kinds, limit):
+    results = []
+    for kind in kinds:
+        model, pk, title, body = MODELS[kind]
+        rows = db.query(pk, body).filter(title.contains(q) | body.contains(q)).limit(limit)
+        for ref_id, snip in rows:
+            results.append({'kind': kind, 'id': ref_id, 'rank': None, 'snippet': snip[:200]})
+    return results[:limit]
+
+
+def resolve(db, results):
+    """Добавляет к результатам поиска подписи (имя пакета, версия, статус)."""
+    ids = {kind: [r['id'] for r in results if r['kind'] == kind] for kind in SOURCES}
+    labels = {}
+    if ids['package']:
+        for pid, name in db.query(Package.package_id, Package.name)\
+                           .filter(Package.package_id.in_(ids['package'])):
+            labels['package', pid] = (pid, name)
+    if ids['update']:
+        for uid, pid, name, ver in db.query(PackageUpdate.update_id, Package.package_id,
+                                            Package.name, PackageUpdate.update_version)\
+                                     .join(PackageUpdate.package)\
+                                     .filter(PackageUpdate.update_id.in_(ids['update'])):
+            labels['update', uid] = (pid, f'{name} {ver}')
+    if ids['report']:
+        for rid, pid, name, status in db.query(Report.id, Package.package_id,
+                                               Package.name, Report.status)\
+                                        .join(Report.package)\
+                                        .filter(Report.id.in_(ids['report'])):
+            labels['report', rid] = (pid, f'#{rid} {name} [{status}]')
+
+    resolved = []
+    for r in results:
+        if (r['kind'], r['id']) not in labels:
+            continue
+        r['package_id'], r['label'] = labels[r['kind'], r['id']]
+        resolved.append(r)
+    return resolved
@@ -0,0 +1,189 @@
+# stats.py
+#
+# Сводные таблицы для дашборда на главной странице.
+#
+#   python stats.py                 # сверить сводки с живыми агрегатами
+#   python stats.py --rebuild       # пересчитать сводки целиком
+#
+# Считать GROUP BY по package_updates и reports на каждый заход дорого,
+# поэтому счётчики лежат в отдельных таблицах stats_*, а поддерживают их
+# SQLite-триггеры на INSERT/DELETE/UPDATE исходных таблиц — так же, как
+# search_index, они срабатывают и для ORM, и для массовых Core-вставок
+# importer/sync. Не на SQLite сводки не создаются и дашборд считается
+# прямыми агрегатами.
+
+import argparse
+import sys
+
+from sqlalchemy import create_engine, text
+from models import Maintainer
+
+# имя -> (исходная таблица, ключевые колонки сводки, выражения ключа
+#         по строке исходной таблицы, колонки исходной таблицы для UPDATE OF)
+SUMMARIES = {
+    'stats_architectures': ('architectures',   ('architecture',),
+                            ('{row}.architecture',),
+                            ('architecture',)),
+    'stats_groups':        ('package_groups',  ('group_name',),
+                            ('{row}.group_name',),
+                            ('group_name',)),
+    'stats_reports':       ('reports',         ('status', 'resolution', 'assignee_id'),
+                            ('{row}.status', '{row}.resolution', '{row}.assignee_id'),
+                            ('status', 'resolution', 'assignee_id')),
+    'stats_updates_month': ('package_updates', ('month',),
+                            ("substr(CAST({row}.update_date AS TEXT), 1, 7)",),
+                            ('update_date',)),
+    'stats_updaters':      ('package_updates', ('updater_id',),
+                            ('{row}.updater_id',),
+                            ('updater_id',)),
+}
+
+# режим по engine: 'summary' | 'live'
+_modes = {}
+
+
+def _key(name, row):
+    return [expr.format(row=row) for expr in SUMMARIES[name][2]]
+
+def _live_sql(name):
+    table, keys, exprs, _ = SUMMARIES[name]
+    cols = ', '.join(f'{expr.format(row=table)} AS {key}' for key, expr in zip(keys, exprs))
+    return f'SELECT {cols}, COUNT(*) AS n FROM {table} GROUP BY {", ".join(keys)}'
+
+
+def create_tables(conn):
+    for name, (table, keys, *_) in SUMMARIES.items():
+        cols = ', '.join(f'{key} NOT NULL' for key in keys)
+        conn.exec_driver_sql(
+            f'CREATE TABLE IF NOT EXISTS {name} ({cols}, n INTEGER NOT NULL, '
+            f'PRIMARY KEY ({", ".join(keys)})) WITHOUT ROWID')
+    # открытые баг-репорты одного мейнтейнера (workload.open_by_status)
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_stats_reports_assignee ON stats_reports(assignee_id)')
+
+def _bump(name, row, delta):
+    keys = SUMMARIES[name][1]
+    values = _key(name, row)
+    if delta > 0:
+        return (f'INSERT INTO {name}({", ".join(keys)}, n) VALUES ({", ".join(values)}, 1) '
+                f'ON CONFLICT({", ".join(keys)}) DO UPDATE SET n = n + 1;')
+    where = ' AND '.join(f'{k} = {v}' for k, v in zip(keys, values))
+    return (f'UPDATE {name} SET n = n - 1 WHERE {where}; '
+            f'DELETE FROM {name} WHERE {where} AND n <= 0;')
+
+def create_triggers(conn):
+    # на одну исходную таблицу может приходиться несколько сводок
+    by_table = {}
+    for name, (table, *_) in SUMMARIES.items():
+        by_table.setdefault(table, []).append(name)
+    for table, names in by_table.items():
+        ai = ' '.join(_bump(name, 'new', +1) for name in names)
+        ad = ' '.join(_bump(name, 'old', -1) for name in names)
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_stats_ai AFTER INSERT ON {table} BEGIN {ai} END')
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_stats_ad AFTER DELETE ON {table} BEGIN {ad} END')
+        for name in names:
+            cols = ', '.join(SUMMARIES[name][3])
+            conn.exec_driver_sql(
+                f'CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {cols} ON {table} BEGIN '
+                f'{_bump(name, "old", -1)} {_bump(name, "new", +1)} END')
+
+def drop_triggers(conn):
+    """Снимает триггеры сводок (перед массовой загрузкой)."""
+    for name, (table, *_) in SUMMARIES.items():
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {table}_stats_ai')
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {table}_stats_ad')
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}_au')
+
+def rebuild_stats(conn):
+    """Полностью пересчитывает сводки по исходным таблицам."""
+    for name in SUMMARIES:
+        conn.exec_driver_sql(f'DELETE FROM {name}')
+        conn.exec_driver_sql(f'INSERT INTO {name} {_live_sql(name)}')
+
+def init_stats(engine):
+    """Создаёт сводки и триггеры (если их ещё нет) и запоминает режим."""
+    if engine.dialect.name != 'sqlite':
+        _modes[engine] = 'live'
+        return 'live'
+
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='stats_reports'").first()
+        create_tables(conn)
+        if not exists:
+            rebuild_stats(conn)
+        create_triggers(conn)
+
+    _modes[engine] = 'summary'
+    return 'summary'
+
+def stats_mode(db):
+    return _modes.get(db.get_bind(), 'live')
+
+
+def check_stats(conn):
+    """Сравнивает сводки с живыми агрегатами; возвращает {сводка: (лишние, недостающие)}."""
+    mismatches = {}
+    for name, (table, keys, *_) in SUMMARIES.items():
+        stored = set(map(tuple, conn.exec_driver_sql(f'SELECT {", ".join(keys)}, n FROM {name}')))
+        live = set(map(tuple, conn.exec_driver_sql(_live_sql(name))))
+        if stored != live:
+            mismatches[name] = (sorted(stored - live), sorted(live - stored))
+    return mismatches
+
+
+def _rows(db, name, order, limit=None, where=''):
+    source = name if stats_mode(db) == 'summary' else f'({_live_sql(name)}) AS live'
+    sql = f'SELECT * FROM {source} {where} ORDER BY {order}'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    return db.execute(text(sql)).all()
+
+def dashboard(db, top=10):
+    """Данные для главной страницы."""
+    by_status, by_assignee = {}, {}
+    for status, resolution, assignee_id, n in _rows(db, 'stats_reports', 'status',
+                                                    where="WHERE resolution = ''"):
+        by_status[status] = by_status.get(status, 0) + n
+        by_assignee[assignee_id] = by_assignee.get(assignee_id, 0) + n
+    updaters = _rows(db, 'stats_updaters', 'n DESC, updater_id', top)
+    assignees = sorted(by_assignee.items(), key=lambda kv: -kv[1])[:top]
+
+    ids = {uid for uid, _ in updaters} | {aid for aid, _ in assignees}
+    names = dict(db.query(Maintainer.maintainer_id, Maintainer.nickname)
+                   .filter(Maintainer.maintainer_id.in_(ids))) if ids else {}
+    return {
+        'architectures':    _rows(db, 'stats_architectures', 'n DESC, architecture'),
+        'groups':           _rows(db, 'stats_groups', 'n DESC, group_name', top),
+        'months':           _rows(db, 'stats_updates_month', 'month DESC', 12),
+        'updaters':         [(uid, names.get(uid, uid), n) for uid, n in updaters],
+        'open_by_status':   sorted(by_status.items(), key=lambda kv: -kv[1]),
+        'open_by_assignee': [(aid, names.get(aid, aid), n) for aid, n in assignees],
+        'open_total':       sum(by_status.values()),
+        'mode':             stats_mode(db),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сводные таблицы дашборда sisyphus DB')
+    parser.add_argument('db', nargs='?', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать сводки целиком')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    init_stats(engine)
+    with engine.begin() as conn:
+        if args.rebuild:
+            rebuild_stats(conn)
+            print('сводки пересчитаны')
+        mismatches = check_stats(conn)
+    for name, (extra, missing) in mismatches.items():
+        print(f'[FAIL] {name}: лишние {extra[:5]}, недостающие {missing[:5]}')
+    if not mismatches:
+        print('[ok] сводки совпадают с агрегатами')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
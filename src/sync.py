@@ -0,0 +1,230 @@
+# sync.py
+#
+# Инкрементальная синхронизация БД с новым снимком репозитория.
+#
+#   python sync.py pkglist.classic.xz pkglist.noarch.xz
+#   python sync.py --dry-run --db sisyphus_pg.db dump.jsonl
+#
+# Для каждого пакета снимка считается хэш содержимого (importer.content_hash)
+# и сравнивается с packages.content_hash. Записываются только отличия:
+#   * пакеты, пропавшие из снимка, удаляются вместе со всеми дочерними
+#     строками (как cascade='all, delete-orphan' у Package, но set-based SQL);
+#   * у изменившихся пакетов обновляется описание, а ACL, группы,
+#     архитектуры и changelog заменяются целиком (баг-репорты не трогаются);
+#   * новые пакеты вставляются как при импорте.
+# Вход читается дважды: первый проход считает хэши (в памяти только хэш и
+# архитектуры на пакет), второй собирает полные записи лишь для изменившихся.
+
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import bindparam, create_engine, delete, select, update
+from models import (
+    Base,
+    Package, Maintainer, ACL,
+    PackageArchitecture, PackageUpdate,
+    PackageGroup, Report, UpdateArchive
+)
+from importer import Importer, read_records, core_hash, content_hash
+import archive
+import versions
+
+# SQLite ограничивает число параметров в запросе
+CHUNK = 500
+
+# всё, что каскадно удаляется вместе с пакетом
+CHILD_MODELS = [ACL, PackageArchitecture, PackageGroup, PackageUpdate, UpdateArchive, Report]
+# что заменяется целиком при изменении пакета (changelog — вместе с архивом)
+REPLACED_MODELS = [ACL, PackageArchitecture, PackageGroup, PackageUpdate, UpdateArchive]
+
+
+def _chunks(items, size=CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def db_records(conn, pids):
+    """Собирает записи пакетов pids из БД в формате importer'а."""
+    recs = {
+        pid: {'description': desc, 'groups': [], 'acl': [], 'updates': [], 'architectures': []}
+        for pid, desc in conn.execute(select(Package.package_id, Package.description)
+                                      .where(Package.package_id.in_(pids)))
+    }
+    for pid, name in conn.execute(select(PackageGroup.package_id, PackageGroup.group_name)
+                                  .where(PackageGroup.package_id.in_(pids))):
+        recs[pid]['groups'].append(name)
+    for pid, arch in conn.execute(select(PackageArchitecture.package_id, PackageArchitecture.architecture)
+                                  .where(PackageArchitecture.package_id.in_(pids))):
+        recs[pid]['architectures'].append(arch)
+    for pid, nick, role in conn.execute(
+            select(ACL.package_id, Maintainer.nickname, ACL.role)
+            .join(Maintainer, ACL.maintainer_id == Maintainer.maintainer_id)
+            .where(ACL.package_id.in_(pids))):
+        recs[pid]['acl'].append({'nickname': nick, 'role': role})
+    for pid, nick, ver, day, log in conn.execute(
+            select(PackageUpdate.package_id, Maintainer.nickname, PackageUpdate.update_version,
+                   PackageUpdate.update_date, PackageUpdate.changelog)
+            .join(Maintainer, PackageUpdate.updater_id == Maintainer.maintainer_id)
+            .where(PackageUpdate.package_id.in_(pids))):
+        recs[pid]['updates'].append({'nickname': nick, 'version': ver, 'date': day, 'changelog': log})
+    # архивные обновления — тоже часть changelog'а пакета
+    archived = [row for pid, data in conn.execute(
+                    select(UpdateArchive.package_id, UpdateArchive.data)
+                    .where(UpdateArchive.package_id.in_(pids)))
+                for row in archive.unpack(data, pid)]
+    nicks = {}
+    for chunk in _chunks({row['updater_id'] for row in archived}):
+        nicks.update(conn.execute(select(Maintainer.maintainer_id, Maintainer.nickname)
+                                  .where(Maintainer.maintainer_id.in_(chunk))).all())
+    for row in archived:
+        recs[row['package_id']]['updates'].append({
+            'nickname': nicks.get(row['updater_id'], ''), 'version': row['update_version'],
+            'date': row['update_date'], 'changelog': row['changelog']})
+    return recs
+
+
+def scan_snapshot(paths):
+    """Проход 1: имя -> (core_hash первой записи, множество архитектур)."""
+    snapshot = {}
+    for path in paths:
+        for rec in read_records(path):
+            name = (rec.get('name') or '').strip()
+            if not name:
+                continue
+            archs = set(a for a in rec.get('architectures') or [] if a)
+            if name in snapshot:
+                snapshot[name][1].update(archs)
+            else:
+                snapshot[name] = (core_hash(rec), archs)
+    return {name: content_hash(None, archs, core) for name, (core, archs) in snapshot.items()}
+
+def collect_records(paths, names):
+    """Проход 2: полные записи только для пакетов из names (архитектуры объединяются)."""
+    records = {}
+    for path in paths:
+        for rec in read_records(path):
+            name = (rec.get('name') or '').strip()
+            if name not in names:
+                continue
+            if name in records:
+                records[name]['architectures'] = sorted(
+                    set(records[name]['architectures']) | set(rec.get('architectures') or []))
+            else:
+                rec['name'] = name
+                rec['architectures'] = list(rec.get('architectures') or [])
+                records[name] = rec
+    return records
+
+
+def backfill_hashes(engine, pids):
+    """Хэши для пакетов, у которых их ещё нет (загружены формами или до sync)."""
+    with engine.begin() as conn:
+        for chunk in _chunks(pids):
+            values = [{'pid': pid, 'h': content_hash(rec)}
+                      for pid, rec in db_records(conn, chunk).items()]
+            conn.execute(update(Package).where(Package.package_id == bindparam('pid'))
+                                        .values(content_hash=bindparam('h')), values)
+
+
+def _delete_packages(conn, pids, models):
+    for chunk in _chunks(pids):
+        for model in models:
+            conn.execute(delete(model).where(model.package_id.in_(chunk)))
+
+
+def run_sync(engine, paths, dry_run=False, log=print):
+    Base.metadata.create_all(engine)
+    phases = {}
+    stats = {}
+
+    @contextmanager
+    def phase(name):
+        started = time.perf_counter()
+        yield
+        phases[name] = round(time.perf_counter() - started, 3)
+        log(f'{name}: {phases[name]:.3f} с')
+
+    with phase('hash'):
+        incoming = scan_snapshot(paths)
+
+    with phase('load'):
+        with engine.connect() as conn:
+            current = {name: (pid, h) for name, pid, h in conn.execute(
+                select(Package.name, Package.package_id, Package.content_hash))}
+        missing = [pid for pid, h in current.values() if h is None]
+        if missing:
+            backfill_hashes(engine, missing)
+            with engine.connect() as conn:
+                current = {name: (pid, h) for name, pid, h in conn.execute(
+                    select(Package.name, Package.package_id, Package.content_hash))}
+        stats['backfilled'] = len(missing)
+
+    with phase('diff'):
+        to_insert = [name for name in incoming if name not in current]
+        to_update = [name for name, h in incoming.items()
+                     if name in current and current[name][1] != h]
+        to_delete = [pid for name, (pid, _) in current.items() if name not in incoming]
+        stats.update(inserted=len(to_insert), updated=len(to_update), deleted=len(to_delete),
+                     unchanged=len(incoming) - len(to_insert) - len(to_update))
+
+    if dry_run or not (to_insert or to_update or to_delete):
+        stats['phases'] = phases
+        return stats
+
+    with phase('fetch'):
+        records = collect_records(paths, set(to_insert) | set(to_update))
+
+    importer = Importer(engine, load_archs=False)
+    with engine.begin() as conn:
+        with phase('delete'):
+            _delete_packages(conn, to_delete, CHILD_MODELS + [Package])
+
+        with phase('update'):
+            changed = [current[name][0] for name in to_update]
+            _delete_packages(conn, changed, REPLACED_MODELS)
+            rows = importer.new_rows()
+            values = []
+            for name in to_update:
+                pid, rec = current[name][0], records[name]
+                values.append({'pid': pid, 'd': rec.get('description') or '', 'h': incoming[name]})
+                for arch in sorted(set(a for a in rec['architectures'] if a)):
+                    rows[PackageArchitecture].append({'package_id': pid, 'architecture': arch})
+                importer.child_rows(pid, rec, rows)
+            if values:
+                conn.execute(update(Package).where(Package.package_id == bindparam('pid'))
+                                            .values(description=bindparam('d'),
+                                                    content_hash=bindparam('h')), values)
+            importer.write(conn, rows)
+
+        with phase('insert'):
+            rows = importer.new_rows()
+            for name in to_insert:
+                importer.new_package(records[name], rows)
+            importer.write(conn, rows)
+        versions.bump_bulk(conn)
+
+    stats['maintainers'] = importer.stats['maintainers']
+    stats['phases'] = phases
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Инкрементальная синхронизация sisyphus DB со снимком')
+    parser.add_argument('files', nargs='+', help='pkglist/srclist (.xz/.bz2/.gz) или .json/.jsonl')
+    parser.add_argument('--db', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--dry-run', action='store_true', help='только посчитать отличия')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    stats = run_sync(engine, args.files, args.dry_run)
+    phases = stats.pop('phases')
+    print(', '.join(f'{k}: {v}' for k, v in stats.items()))
+    print('итого: %.3f с' % sum(phases.values()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# triage.py
+#
+# История баг-репортов и метрики «старения» для разбора.
+#
+#   python triage.py                 # сверить report_aging и aging_metrics с историей
+#   python triage.py --rebuild       # пересчитать их по истории целиком
+#   python triage.py --states        # медиана дней в каждом статусе (по всей истории)
+#
+# edit_report перезаписывает статус и вердикт на месте, поэтому каждое
+# изменение статуса, вердикта, исполнителя или пакета (и вставка, и удаление)
+# SQLite-триггер дописывает строкой в report_events. Из неё ведутся:
+#   * report_aging — строка на репорт: с какого момента он в нынешнем
+#     статусе (state_since) и когда решён; фильтр /reports «без движения
+#     дольше N дней» идёт по индексу (resolved_at, state_since);
+#   * aging_metrics — по пакету и по исполнителю: открытые, решённые и
+#     медиана дней от открытия до решения.
+# Время события — момент записи (UTC), у нового репорта — его last_changed.
+# Репорты, заведённые до появления истории, получают событие 'seed' по
+# last_changed: время их открытия неизвестно и в медиану они не входят.
+# Не на SQLite история не ведётся: «без движения» считается по last_changed
+# открытых репортов, метрик нет.
+
+import argparse
+import statistics
+import sys
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import create_engine, func, select
+from models import AgingMetric, ReportAging, ReportEvent, Report
+
+EVENT_COLUMNS = 'report_id, kind, package_id, assignee_id, status, resolution, changed_at'
+AGING_COLUMNS = 'report_id, package_id, assignee_id, status, opened_at, state_since, resolved_at'
+# область метрик -> колонка report_aging
+SCOPES = {'package': 'package_id', 'assignee': 'assignee_id'}
+
+# режим по engine: 'table' | 'live'
+_modes = {}
+
+
+def _event(row, kind, at):
+    return (f'INSERT INTO report_events({EVENT_COLUMNS}) VALUES ({row}.id, \'{kind}\', '
+            f'{row}.package_id, {row}.assignee_id, {row}.status, {row}.resolution, {at});')
+
+# report_events -> report_aging: то же, что rebuild_aging, по одному событию
+_AGING = {
+    'open': (f'INSERT INTO report_aging({AGING_COLUMNS}) VALUES (new.report_id, new.package_id, '
+             f'new.assignee_id, new.status, new.changed_at, new.changed_at, '
+             f"CASE WHEN new.resolution <> '' THEN new.changed_at END);"),
+    'change': ('UPDATE report_aging SET package_id = new.package_id, assignee_id = new.assignee_id, '
+               'status = new.status, '
+               "state_since = CASE WHEN status <> new.status OR (resolved_at IS NULL) <> (new.resolution = '') "
+               'THEN new.changed_at ELSE state_since END, '
+               "resolved_at = CASE WHEN new.resolution = '' THEN NULL ELSE COALESCE(resolved_at, new.changed_at) END "
+               'WHERE report_id = new.report_id;'),
+    'delete': 'DELETE FROM report_aging WHERE report_id = new.report_id;',
+}
+
+def _count(scope, row, sign):
+    key = f'{row}.{SCOPES[scope]}'
+    return (f'INSERT INTO aging_metrics(scope, key_id, open, resolved) '
+            f"VALUES ('{scope}', {key}, {sign}({row}.resolved_at IS NULL), {sign}({row}.resolved_at IS NOT NULL)) "
+            f'ON CONFLICT(scope, key_id) DO UPDATE SET open = open + excluded.open, '
+            f'resolved = resolved + excluded.resolved;')
+
+def _median_sql(col, key):
+    # медиана без оконных функций: середина отсортированного списка (LIMIT/OFFSET)
+    durations = f'FROM report_aging WHERE {col} = {key} AND resolved_at IS NOT NULL AND opened_at IS NOT NULL'
+    n = f'(SELECT COUNT(*) {durations})'
+    return (f'(SELECT ROUND(AVG(d), 3) FROM (SELECT julianday(resolved_at) - julianday(opened_at) AS d '
+            f'{durations} ORDER BY d LIMIT 2 - {n} % 2 OFFSET ({n} - 1) / 2))')
+
+def _median(scope, row, when):
+    key = f'{row}.{SCOPES[scope]}'
+    return (f'UPDATE aging_metrics SET median_days = {_median_sql(SCOPES[scope], key)} '
+            f"WHERE scope = '{scope}' AND key_id = {key} AND {when};")
+
+def _prune(scope, row):
+    return (f"DELETE FROM aging_metrics WHERE scope = '{scope}' AND key_id = {row}.{SCOPES[scope]} "
+            f'AND open = 0 AND resolved = 0;')
+
+def _metrics(row, sign, when):
+    # медиана пересчитывается только если менялся набор решённых репортов
+    return ' '.join(_count(scope, row, sign) + _median(scope, row, when) + (_prune(scope, row) if sign == '-' else '')
+                    for scope in SCOPES)
+
+def create_triggers(conn):
+    # история: на репортах
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS reports_events_ai AFTER INSERT ON reports '
+        f"BEGIN {_event('new', 'open', 'COALESCE(datetime(new.last_changed), datetime(CURRENT_TIMESTAMP))')} END")
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS reports_events_au '
+        'AFTER UPDATE OF status, resolution, assignee_id, package_id ON reports '
+        'WHEN old.status IS NOT new.status OR old.resolution IS NOT new.resolution '
+        'OR old.assignee_id IS NOT new.assignee_id OR old.package_id IS NOT new.package_id '
+        f"BEGIN {_event('new', 'change', 'datetime(CURRENT_TIMESTAMP)')} END")
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS reports_events_ad AFTER DELETE ON reports '
+        f"BEGIN {_event('old', 'delete', 'datetime(CURRENT_TIMESTAMP)')} END")
+    # производные: report_aging по событиям, aging_metrics по report_aging
+    for kind, sql in _AGING.items():
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS report_events_aging_{kind} AFTER INSERT ON report_events '
+            f"WHEN new.kind = '{kind}' BEGIN {sql} END")
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS report_aging_metrics_ai AFTER INSERT ON report_aging '
+        f"BEGIN {_metrics('new', '+', 'new.resolved_at IS NOT NULL')} END")
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS report_aging_metrics_ad AFTER DELETE ON report_aging '
+        f"BEGIN {_metrics('old', '-', 'old.resolved_at IS NOT NULL')} END")
+    resolved = 'COALESCE(old.resolved_at, new.resolved_at) IS NOT NULL'
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS report_aging_metrics_au '
+        'AFTER UPDATE OF package_id, assignee_id, resolved_at ON report_aging '
+        f"BEGIN {_metrics('old', '-', resolved)} {_metrics('new', '+', resolved)} END")
+
+def drop_triggers(conn):
+    """Снимает триггеры производных таблиц; история (reports_events_*) пишется всегда."""
+    for kind in _AGING:
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS report_events_aging_{kind}')
+    for suffix in ('ai', 'ad', 'au'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS report_aging_metrics_{suffix}')
+
+
+def _aging_sql():
+    # отрезок истории репорта — от последнего open/seed (id после удаления
+    # может достаться новому репорту); «отметки» — события, где сменился
+    # статус или открытость (state_since), и где репорт стал решённым
+    return (
+        "WITH s AS (SELECT *, MAX(CASE WHEN kind IN ('open', 'seed') THEN event_id END) "
+        "OVER (PARTITION BY report_id ORDER BY event_id) AS seg FROM report_events), "
+        "e AS (SELECT *, LAG(status) OVER w AS prev_status, LAG(resolution = '') OVER w AS prev_open, "
+        "ROW_NUMBER() OVER (PARTITION BY report_id ORDER BY event_id DESC) AS rn "
+        "FROM s WINDOW w AS (PARTITION BY seg ORDER BY event_id)), "
+        "m AS (SELECT seg, MAX(CASE WHEN kind = 'open' THEN event_id END) AS open_id, "
+        "MAX(CASE WHEN prev_status IS NULL OR prev_status <> status OR prev_open <> (resolution = '') "
+        "THEN event_id END) AS state_id, "
+        "MAX(CASE WHEN resolution <> '' AND (prev_open IS NULL OR prev_open) THEN event_id END) AS resolve_id "
+        "FROM e GROUP BY seg) "
+        "SELECT e.report_id, e.package_id, e.assignee_id, e.status, o.changed_at, st.changed_at, "
+        "CASE WHEN e.resolution <> '' THEN r.changed_at END "
+        "FROM e JOIN m ON m.seg = e.seg "
+        "LEFT JOIN report_events o ON o.event_id = m.open_id "
+        "JOIN report_events st ON st.event_id = m.state_id "
+        "LEFT JOIN report_events r ON r.event_id = m.resolve_id "
+        "WHERE e.rn = 1 AND e.kind <> 'delete'")
+
+def _metrics_sql(scope):
+    col = SCOPES[scope]
+    return (
+        f"WITH d AS (SELECT {col} AS k, julianday(resolved_at) - julianday(opened_at) AS d, "
+        f"ROW_NUMBER() OVER (PARTITION BY {col} ORDER BY julianday(resolved_at) - julianday(opened_at)) AS rn, "
+        f"COUNT(*) OVER (PARTITION BY {col}) AS n FROM report_aging "
+        f"WHERE resolved_at IS NOT NULL AND opened_at IS NOT NULL), "
+        f"med AS (SELECT k, ROUND(AVG(d), 3) AS median FROM d WHERE rn IN ((n + 1) / 2, (n + 2) / 2) GROUP BY k) "
+        f"SELECT '{scope}', a.{col}, SUM(a.resolved_at IS NULL), SUM(a.resolved_at IS NOT NULL), med.median "
+        f"FROM report_aging a LEFT JOIN med ON med.k = a.{col} GROUP BY a.{col}")
+
+def seed_events(conn):
+    """Событие 'seed' для репортов без истории (заведённых до её появления)."""
+    conn.exec_driver_sql(
+        f"INSERT INTO report_events({EVENT_COLUMNS}) "
+        f"SELECT id, 'seed', package_id, assignee_id, status, resolution, "
+        f"COALESCE(datetime(last_changed), datetime(CURRENT_TIMESTAMP)) FROM reports "
+        f"WHERE NOT EXISTS (SELECT 1 FROM report_aging WHERE report_aging.report_id = reports.id)")
+
+def rebuild_aging(conn):
+    """report_aging и aging_metrics заново по report_events (триггеры производных снимаются на время)."""
+    drop_triggers(conn)
+    conn.exec_driver_sql('DELETE FROM report_aging')
+    conn.exec_driver_sql(f'INSERT INTO report_aging({AGING_COLUMNS}) {_aging_sql()}')
+    conn.exec_driver_sql('DELETE FROM aging_metrics')
+    for scope in SCOPES:
+        conn.exec_driver_sql(f'INSERT INTO aging_metrics(scope, key_id, open, resolved, median_days) '
+                             f'{_metrics_sql(scope)}')
+    create_triggers(conn)
+
+def init_triage(engine):
+    """Заводит историю (seed) и производные таблицы, ставит триггеры; возвращает режим."""
+    if engine.dialect.name != 'sqlite':
+        _modes[engine] = 'live'
+        return 'live'
+
+    with engine.begin() as conn:
+        # копия для аналитики могла быть снята до появления таблиц
+        for model in (ReportEvent, ReportAging, AgingMetric):
+            model.__table__.create(conn, checkfirst=True)
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='reports_events_ai'").first()
+        if not exists:
+            seed_events(conn)
+            rebuild_aging(conn)
+        create_triggers(conn)
+
+    _modes[engine] = 'table'
+    return 'table'
+
+def triage_mode(db):
+    return _modes.get(db.get_bind(), 'live')
+
+
+def check_triage(conn):
+    """Сравнивает report_aging с историей и с reports, aging_metrics — с report_aging.
+
+    Возвращает (лишние, недостающие) строки; первым элементом строки — имя проверки.
+    """
+    pairs = [
+        ('report_aging', f'SELECT {AGING_COLUMNS} FROM report_aging', _aging_sql()),
+        ('reports', "SELECT report_id, package_id, assignee_id, status, resolved_at IS NULL FROM report_aging",
+                    "SELECT id, package_id, assignee_id, status, resolution = '' FROM reports"),
+    ] + [('aging_metrics', f"SELECT scope, key_id, open, resolved, median_days FROM aging_metrics "
+                           f"WHERE scope = '{scope}'", _metrics_sql(scope)) for scope in SCOPES]
+    extra, missing = [], []
+    for name, stored_sql, live_sql in pairs:
+        stored = {(name, *row) for row in conn.exec_driver_sql(stored_sql)}
+        live = {(name, *row) for row in conn.exec_driver_sql(live_sql)}
+        extra += stored - live
+        missing += live - stored
+    return sorted(extra, key=str), sorted(missing, key=str)
+
+
+def time_in_state(conn):
+    """[(статус, число интервалов, медиана дней)] по завершённым интервалам истории.
+
+    Сканирует всю report_events — для отчётов и CLI, не для страниц.
+    """
+    rows = conn.exec_driver_sql(
+        "WITH e AS (SELECT report_id, event_id, kind, status, changed_at, "
+        "LAG(status) OVER (PARTITION BY report_id ORDER BY event_id) AS prev_status FROM report_events), "
+        "s AS (SELECT report_id, kind, status, changed_at, "
+        "LEAD(changed_at) OVER (PARTITION BY report_id ORDER BY event_id) AS left_at, "
+        "LEAD(kind) OVER (PARTITION BY report_id ORDER BY event_id) AS next_kind FROM e "
+        "WHERE prev_status IS NULL OR prev_status <> status OR kind IN ('open', 'seed', 'delete')) "
+        "SELECT status, julianday(left_at) - julianday(changed_at) FROM s "
+        "WHERE kind <> 'seed' AND kind <> 'delete' AND left_at IS NOT NULL "
+        "AND next_kind NOT IN ('open', 'seed', 'delete')")
+    durations = {}
+    for status, days in rows:
+        durations.setdefault(status, []).append(days)
+    return [(status, len(days), round(statistics.median(days), 1))
+            for status, days in sorted(durations.items())]
+
+
+# --- чтение ---
+
+def today():
+    """Дата UTC, от которой считается «без движения»; входит в ETag /reports."""
+    return datetime.now(timezone.utc).date()
+
+def _cutoff(days):
+    # границу считаем от полуночи UTC: в течение дня она не меняется, и
+    # страница кэшируется по ETag с today() до следующей записи или полуночи
+    return datetime.combine(today() - timedelta(days=days), time())
+
+def stale(db, days):
+    """Условие для Report: открыт и не менял статус дольше days дней."""
+    cutoff = _cutoff(days)
+    if triage_mode(db) == 'table':
+        return Report.id.in_(select(ReportAging.report_id)
+                             .where(ReportAging.resolved_at.is_(None), ReportAging.state_since < cutoff))
+    return (Report.resolution == '') & (Report.last_changed < cutoff.date())
+
+def metrics(db, scope, key_id, days):
+    """{'open', 'resolved', 'median_days', 'stale'} по пакету или исполнителю; None — нет данных."""
+    if triage_mode(db) != 'table':
+        return None
+    row = db.get(AgingMetric, (scope, key_id))
+    if row is None:
+        return None
+    col = getattr(ReportAging, SCOPES[scope])
+    stale_count = db.execute(select(func.count()).select_from(ReportAging).where(
+        col == key_id, ReportAging.resolved_at.is_(None), ReportAging.state_since < _cutoff(days))).scalar()
+    return {'open': row.open, 'resolved': row.resolved, 'median_days': row.median_days, 'stale': stale_count}
+
+def history(db, report_id):
+    return db.query(ReportEvent).filter(ReportEvent.report_id == report_id)\
+                                .order_by(ReportEvent.event_id).all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='История и метрики баг-репортов sisyphus DB')
+    parser.add_argument('db', nargs='?', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать report_aging и aging_metrics')
+    parser.add_argument('--states', action='store_true', help='медиана дней в каждом статусе')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    init_triage(engine)
+    with engine.begin() as conn:
+        if args.rebuild:
+            rebuild_aging(conn)
+            print('report_aging и aging_metrics пересчитаны')
+        if args.states:
+            for status, n, days in time_in_state(conn):
+                print(f'{status:<12} {n:>7} интервалов, медиана {days} дн.')
+        extra, missing = check_triage(conn)
+    if extra or missing:
+        print(f'[FAIL] история баг-репортов: лишние {extra[:5]}, недостающие {missing[:5]}')
+        return 1
+    print('[ok] report_aging и aging_metrics совпадают с историей')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
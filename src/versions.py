@@ -0,0 +1,173 @@
+# versions.py
+#
+# Счётчики изменений для HTTP-кэширования (ETag / 304 Not Modified).
+#
+# В change_versions на каждую таблицу и на каждый пакет хранится номер
+# ревизии, в которой они последний раз менялись ('acl', 'package:42').
+# Ревизия — глобальный счётчик (ключ 'revision'), увеличивается на каждый
+# flush с изменениями; запись идёт в той же транзакции, поэтому откат
+# откатывает и счётчики. Массовые Core-записи (importer, sync) мимо сессии
+# ORM не проходят и вызывают bump_bulk() — ключ 'bulk' входит в любой ETag.
+#
+# Тот же flush сбрасывает packages.content_hash у пакетов, чьё содержимое
+# (описание, ACL, группы, архитектуры, changelog) поменялось мимо sync.py:
+# sync пересчитает хэш по БД, а не сочтёт пакет неизменным. Core-записи
+# вызывают forget_hashes() сами.
+#
+# Страница с ETag, совпавшим с If-None-Match, отдаётся как 304 после одного
+# SELECT по change_versions, без запросов к ORM; отрендеренный HTML
+# кэшируется в памяти процесса по тому же ETag (RenderCache).
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+from models import Package, Maintainer, ACL, PackageArchitecture, PackageGroup, PackageUpdate, ChangeVersion
+
+CHUNK = 500
+
+
+def package_key(package_id):
+    return f'package:{package_id}'
+
+
+def bump(conn, keys):
+    """Переводит ключи keys на новую ревизию; возвращает её номер.
+
+    Номер остаётся в conn.info['revision'] до конца транзакции: по событию
+    commit engine'а app.py запоминает, что запрос что-то записал.
+    """
+    keys = sorted(set(keys))
+    # UTC без tzinfo — так Last-Modified и ждёт werkzeug
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    res = conn.execute(update(ChangeVersion).where(ChangeVersion.key == 'revision')
+                                            .values(version=ChangeVersion.version + 1, changed_at=now))
+    if res.rowcount:
+        revision = conn.execute(select(ChangeVersion.version)
+                                .where(ChangeVersion.key == 'revision')).scalar_one()
+    else:
+        revision = 1
+        conn.execute(insert(ChangeVersion).values(key='revision', version=revision, changed_at=now))
+    for i in range(0, len(keys), CHUNK):
+        chunk = keys[i:i + CHUNK]
+        conn.execute(delete(ChangeVersion).where(ChangeVersion.key.in_(chunk)))
+        conn.execute(insert(ChangeVersion),
+                     [{'key': key, 'version': revision, 'changed_at': now} for key in chunk])
+    conn.info['revision'] = revision
+    return revision
+
+def forget_hashes(conn, package_ids):
+    """Сбрасывает packages.content_hash у package_ids (см. sync.backfill_hashes)."""
+    ids = sorted(set(package_ids) - {None})
+    for i in range(0, len(ids), CHUNK):
+        conn.execute(update(Package).where(Package.package_id.in_(ids[i:i + CHUNK]))
+                                    .values(content_hash=None))
+
+def bump_bulk(conn):
+    """После массовой загрузки в обход сессии: устаревают все ETag."""
+    return bump(conn, ['bulk'])
+
+
+def current(db, keys):
+    """{ключ: (версия, время изменения)} для keys и 'bulk'; отсутствующие — (0, None)."""
+    keys = sorted(set(keys) | {'bulk'})
+    found = {key: (version, changed) for key, version, changed in db.execute(
+        select(ChangeVersion.key, ChangeVersion.version, ChangeVersion.changed_at)
+        .where(ChangeVersion.key.in_(keys)))}
+    return {key: found.get(key, (0, None)) for key in keys}
+
+def revision(db):
+    """Текущая глобальная ревизия (0, пока записей не было); db — сессия или соединение."""
+    return db.execute(select(ChangeVersion.version)
+                      .where(ChangeVersion.key == 'revision')).scalar() or 0
+
+def etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+def last_modified(versions):
+    changed = [at for _, at in versions.values() if at is not None]
+    return max(changed) if changed else None
+
+
+class RenderCache:
+    """LRU отрендеренных страниц: ETag -> HTML."""
+
+    def __init__(self, size=256):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+# --- счётчики по событиям сессии ---
+
+def _changed_keys(session):
+    keys = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ChangeVersion) or not hasattr(obj, '__tablename__'):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        keys.add(obj.__tablename__)
+        if isinstance(obj, Package) or hasattr(obj, 'package_id'):
+            keys.add(package_key(obj.package_id))
+            # строку перенесли к другому пакету — меняются обе страницы
+            for old in inspect(obj).attrs.package_id.history.deleted:
+                if old is not None:
+                    keys.add(package_key(old))
+    keys.discard(package_key(None))
+    return keys
+
+# дочерние строки, из которых складывается content_hash пакета
+HASHED = (ACL, PackageArchitecture, PackageGroup, PackageUpdate)
+
+def _hashed_changes(session):
+    """(пакеты с изменившимся содержимым, мейнтейнеры со сменённым никнеймом)."""
+    packages, renamed = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        state = inspect(obj)
+        if isinstance(obj, Package):
+            # сам sync пишет только content_hash — это не изменение содержимого
+            if obj in session.dirty and any(attr.history.has_changes() for attr in state.attrs
+                                            if attr.key != 'content_hash'):
+                packages.add(obj.package_id)
+        elif isinstance(obj, HASHED):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            packages.add(obj.package_id)
+            packages.update(old for old in state.attrs.package_id.history.deleted if old is not None)
+        elif isinstance(obj, Maintainer) and obj in session.dirty and state.attrs.nickname.history.deleted:
+            renamed.add(obj.maintainer_id)
+    return packages, renamed
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_flush(session, flush_context):
+    keys = _changed_keys(session)
+    if keys:
+        bump(session.connection(), keys)
+    packages, renamed = _hashed_changes(session)
+    if renamed:
+        # никнейм входит в хэш ACL и changelog'а (архивные обновления не
+        # учитываются: их updater_id лежит внутри сжатых пачек)
+        packages.update(session.connection().execute(
+            select(ACL.package_id).where(ACL.maintainer_id.in_(renamed))
+            .union(select(PackageUpdate.package_id).where(PackageUpdate.updater_id.in_(renamed))))
+            .scalars())
+    if packages:
+        forget_hashes(session.connection(), packages)
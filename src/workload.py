@@ -0,0 +1,185 @@
+# workload.py
+#
+# Нагрузка мейнтейнеров: сколько пакетов за ним (ACL с ролью owner), всего
+# ACL-записей, назначенных баг-репортов (и открытых — resolution = ''),
+# обновлений и дата последнего из них.
+#
+#   python workload.py                 # сверить maintainer_workload с живыми агрегатами
+#   python workload.py --rebuild       # пересчитать целиком
+#
+# Считать это по acl, reports и package_updates для тысяч мейнтейнеров на
+# каждый заход дорого, поэтому счётчики лежат в maintainer_workload (строка
+# на мейнтейнера), а поддерживают их SQLite-триггеры — как сводки stats.py,
+# для ORM и для Core-вставок. Удаление последнего обновления мейнтейнера
+# пересчитывает last_update по индексу (updater_id, update_date). Архивные
+# обновления (archive.py) в счётчики не входят. Не на SQLite таблица
+# не ведётся и те же колонки считаются подзапросом на лету.
+
+import argparse
+import sys
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import aliased
+from models import MaintainerWorkload, Report
+import stats
+
+COLUMNS = 'maintainer_id, packages, acl, open_reports, reports, updates, last_update'
+# колонки, по которым сортируется список /maintainers/workload
+SORTS = ('packages', 'acl', 'open_reports', 'reports', 'updates', 'last_update')
+
+# режим по engine: 'table' | 'live'
+_modes = {}
+
+
+def _live_sql():
+    return (
+        f'SELECT m.maintainer_id, COALESCE(a.packages, 0) AS packages, COALESCE(a.acl, 0) AS acl, '
+        f'COALESCE(r.open_reports, 0) AS open_reports, COALESCE(r.reports, 0) AS reports, '
+        f'COALESCE(u.updates, 0) AS updates, u.last_update '
+        f'FROM maintainers m '
+        f"LEFT JOIN (SELECT maintainer_id, SUM(CASE WHEN role = 'owner' THEN 1 ELSE 0 END) AS packages, "
+        f'COUNT(*) AS acl FROM acl GROUP BY maintainer_id) a ON a.maintainer_id = m.maintainer_id '
+        f"LEFT JOIN (SELECT assignee_id, SUM(CASE WHEN resolution = '' THEN 1 ELSE 0 END) AS open_reports, "
+        f'COUNT(*) AS reports FROM reports GROUP BY assignee_id) r ON r.assignee_id = m.maintainer_id '
+        f'LEFT JOIN (SELECT updater_id, COUNT(*) AS updates, MAX(update_date) AS last_update '
+        f'FROM package_updates GROUP BY updater_id) u ON u.updater_id = m.maintainer_id')
+
+def _change(mid, sets):
+    # строка есть у каждого мейнтейнера (триггер на maintainers); ссылки
+    # на несуществующего мейнтейнера счётчики не трогают, как и пересчёт
+    return f'UPDATE maintainer_workload SET {", ".join(sets)} WHERE maintainer_id = {mid};'
+
+def _acl(row, sign):
+    return _change(f'{row}.maintainer_id', [f'acl = acl {sign} 1',
+                                            f"packages = packages {sign} ({row}.role = 'owner')"])
+
+def _reports(row, sign):
+    return _change(f'{row}.assignee_id', [f'reports = reports {sign} 1',
+                                          f"open_reports = open_reports {sign} ({row}.resolution = '')"])
+
+def _update_added(row):
+    return _change(f'{row}.updater_id', [
+        'updates = updates + 1',
+        f'last_update = CASE WHEN last_update IS NULL OR {row}.update_date > last_update '
+        f'THEN {row}.update_date ELSE last_update END'])
+
+def _update_removed(row):
+    # AFTER DELETE: строки уже нет, MAX считается по оставшимся
+    return _change(f'{row}.updater_id', [
+        'updates = updates - 1',
+        f'last_update = CASE WHEN {row}.update_date >= last_update THEN '
+        f'(SELECT MAX(update_date) FROM package_updates WHERE updater_id = {row}.updater_id) '
+        f'ELSE last_update END'])
+
+# исходная таблица -> (колонки для UPDATE OF, SQL на вставку, SQL на удаление)
+TRIGGERS = {
+    'acl':             ('maintainer_id, role', lambda r: _acl(r, '+'), lambda r: _acl(r, '-')),
+    'reports':         ('assignee_id, resolution', lambda r: _reports(r, '+'), lambda r: _reports(r, '-')),
+    'package_updates': ('updater_id, update_date', _update_added, _update_removed),
+}
+
+def create_triggers(conn):
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS maintainers_workload_ai AFTER INSERT ON maintainers '
+        'BEGIN INSERT OR IGNORE INTO maintainer_workload(maintainer_id) VALUES (new.maintainer_id); END')
+    conn.exec_driver_sql(
+        'CREATE TRIGGER IF NOT EXISTS maintainers_workload_ad AFTER DELETE ON maintainers '
+        'BEGIN DELETE FROM maintainer_workload WHERE maintainer_id = old.maintainer_id; END')
+    for table, (cols, added, removed) in TRIGGERS.items():
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_workload_ai AFTER INSERT ON {table} '
+            f'BEGIN {added("new")} END')
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_workload_ad AFTER DELETE ON {table} '
+            f'BEGIN {removed("old")} END')
+        conn.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_workload_au AFTER UPDATE OF {cols} ON {table} '
+            f'BEGIN {removed("old")} {added("new")} END')
+
+def drop_triggers(conn):
+    """Снимает триггеры (перед массовой загрузкой)."""
+    for table in ('maintainers', *TRIGGERS):
+        for suffix in ('ai', 'ad', 'au'):
+            conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {table}_workload_{suffix}')
+
+def rebuild_workload(conn):
+    conn.exec_driver_sql('DELETE FROM maintainer_workload')
+    conn.exec_driver_sql(f'INSERT INTO maintainer_workload({COLUMNS}) {_live_sql()}')
+
+def init_workload(engine):
+    """Заполняет maintainer_workload и ставит триггеры (если их ещё нет); возвращает режим."""
+    if engine.dialect.name != 'sqlite':
+        _modes[engine] = 'live'
+        return 'live'
+
+    with engine.begin() as conn:
+        # копия для аналитики могла быть снята до появления таблицы
+        MaintainerWorkload.__table__.create(conn, checkfirst=True)
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='maintainers_workload_ai'").first()
+        if not exists:
+            rebuild_workload(conn)
+        create_triggers(conn)
+
+    _modes[engine] = 'table'
+    return 'table'
+
+def workload_mode(db):
+    return _modes.get(db.get_bind(), 'live')
+
+
+def check_workload(conn):
+    """Сравнивает maintainer_workload с пересчётом; возвращает (лишние, недостающие) строки."""
+    stored = set(map(tuple, conn.exec_driver_sql(f'SELECT {COLUMNS} FROM maintainer_workload')))
+    live = set(map(tuple, conn.exec_driver_sql(_live_sql())))
+    return sorted(stored - live, key=str), sorted(live - stored, key=str)
+
+
+# --- чтение ---
+
+def source(db):
+    """MaintainerWorkload — таблица или (не на SQLite) тот же набор колонок подзапросом."""
+    if workload_mode(db) == 'table':
+        return MaintainerWorkload
+    live = text(_live_sql()).columns(*MaintainerWorkload.__table__.columns).subquery('live')
+    return aliased(MaintainerWorkload, live)
+
+def get(db, maintainer_id):
+    src = source(db)
+    return db.execute(select(src).where(src.maintainer_id == maintainer_id)).scalar()
+
+def open_by_status(db, maintainer_id):
+    """[(статус, число открытых баг-репортов)] мейнтейнера — из сводки stats_reports."""
+    if stats.stats_mode(db) == 'summary':
+        rows = db.execute(text(
+            "SELECT status, SUM(n) FROM stats_reports WHERE assignee_id = :mid AND resolution = '' "
+            'GROUP BY status'), {'mid': maintainer_id})
+    else:
+        rows = db.execute(select(Report.status, func.count())
+                          .where(Report.assignee_id == maintainer_id, Report.resolution == '')
+                          .group_by(Report.status))
+    return [tuple(row) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузка мейнтейнеров sisyphus DB')
+    parser.add_argument('db', nargs='?', default='sisyphus_pg.db', help='путь к SQLite-файлу')
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать maintainer_workload целиком')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    init_workload(engine)
+    with engine.begin() as conn:
+        if args.rebuild:
+            rebuild_workload(conn)
+            print('maintainer_workload пересчитана')
+        extra, missing = check_workload(conn)
+    if extra or missing:
+        print(f'[FAIL] maintainer_workload: лишние {extra[:5]}, недостающие {missing[:5]}')
+        return 1
+    print('[ok] maintainer_workload совпадает с acl, reports и package_updates')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# tests/conftest.py
+#
+# Общие фикстуры: маленькая синтетическая БД от bench/generate.py (одна на
+# весь прогон) и приложение на её копии во временном каталоге теста.
+#
+#   python -m pytest -q tests
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+# объёмы sample_db: хватает на несколько страниц каждого списка
+SAMPLE = ['--packages', '300', '--maintainers', '40', '--updates', '4000', '--reports', '1200']
+# large_db — втрое больше: то, что не должно зависеть от числа строк
+LARGE = ['--packages', '900', '--maintainers', '120', '--updates', '12000', '--reports', '3600']
+
+
+@pytest.fixture(scope='session')
+def sample_db(tmp_path_factory):
+    import generate
+    path = str(tmp_path_factory.mktemp('sample') / 'sample.db')
+    generate.main([path, *SAMPLE])
+    return path
+
+@pytest.fixture(scope='session')
+def large_db(tmp_path_factory):
+    import generate
+    path = str(tmp_path_factory.mktemp('large') / 'large.db')
+    generate.main([path, *LARGE])
+    return path
+
+@pytest.fixture
+def db_path(tmp_path, sample_db):
+    """Своя копия sample_db для теста, который её меняет."""
+    path = str(tmp_path / 'pg.db')
+    shutil.copy(sample_db, path)
+    return path
+
+@pytest.fixture
+def make_app(tmp_path, db_path):
+    """make_app(**config) — app на копии sample_db; движки закрываются после теста."""
+    import app as application
+
+    def make(**config):
+        defaults = {
+            'TESTING':                True,
+            'DATABASE_URL':           f'sqlite:///{db_path}',
+            'ANALYTICS_DATABASE_URL': f'sqlite:///{tmp_path / "ch.db"}',
+            'CHECK_QUERY_BUDGET':     True,
+            'HTTP_CACHE':             False,
+            'STREAM_PAGES':           True,
+            'METRICS':                False,
+            'JOB_WORKERS':            0,
+            'JOB_DIR':                str(tmp_path / 'jobs'),
+            'REPLICA_FILES':          [],
+            'REPLICA_URLS':           [],
+            'REPLICA_REFRESH':        0,
+        }
+        application.close_backends()
+        return application.create_app({**defaults, **config})
+
+    yield make
+    application.close_backends()
+
+@pytest.fixture
+def client(make_app):
+    return make_app().test_client()
@@ -0,0 +1,123 @@
+# Аналитическая копия (ANALYTICS_DATABASE_URL, session db_type=clickhouse):
+# снимается при первом старте, дальше обновляется только явно — задачей
+# refresh_analytics или python db.py — и при этом мигрирует. Сводные
+# страницы (ANALYTICS_VIEWS) читают её и без переключателя.
+
+import sqlite3
+
+from sqlalchemy import event
+
+import app as application
+import db
+from migrate import schema_fingerprint, schema_version
+
+
+def test_refresh_job_brings_copy_up_to_date(make_app):
+    client = make_app().test_client()
+    client.get('/maintainers')                      # снимок копии при первом старте
+    assert 'актуальна' in client.get('/jobs').get_data(as_text=True)
+
+    client.post('/maintainers/add', data={'nickname': 'fresh', 'full_name': 'Fresh Maintainer'},
+                follow_redirects=True)
+    client.get('/switch_db/clickhouse')
+    assert '>fresh</a>' not in client.get('/maintainers?nickname=fresh').get_data(as_text=True)
+    assert 'Аналитическая копия отстаёт' in client.get('/jobs').get_data(as_text=True)
+
+    client.post('/jobs', data={'kind': 'refresh_analytics'}, follow_redirects=True)
+    job = application.backends().jobs.recent(limit=1)[0]
+    assert job['kind'] == 'refresh_analytics' and job['status'] == 'done', job
+    assert '>fresh</a>' in client.get('/maintainers?nickname=fresh').get_data(as_text=True)
+    assert 'актуальна' in client.get('/jobs').get_data(as_text=True)
+
+
+def test_cli_migrates_copy(sample_db, tmp_path):
+    # основная БД без schema_version и derived-таблиц — как у старого файла
+    src, dst = str(tmp_path / 'old.db'), str(tmp_path / 'ch.db')
+    conn = sqlite3.connect(sample_db)
+    conn.execute(f"VACUUM INTO '{src}'")
+    conn.close()
+    conn = sqlite3.connect(src)
+    conn.execute('DROP TABLE IF EXISTS schema_version')
+    conn.execute('DROP TABLE IF EXISTS package_latest')
+    for suffix in ('ai', 'ad', 'au'):
+        conn.execute(f'DROP TRIGGER IF EXISTS package_updates_latest_{suffix}')
+    conn.commit()
+    conn.close()
+
+    assert db.main(['--from', f'sqlite:///{src}', '--to', f'sqlite:///{dst}']) == 0
+
+    target = db.make_engine(f'sqlite:///{dst}', {})
+    try:
+        assert schema_version(target) == schema_fingerprint()
+        with target.connect() as conn:
+            assert conn.exec_driver_sql('SELECT COUNT(*) FROM package_latest').scalar() > 0
+    finally:
+        target.dispose()
+
+
+def test_old_copy_is_migrated_on_start(make_app, sample_db, tmp_path):
+    # копия, снятая версией без package_latest и package_updates.version_key:
+    # страницы аналитического бэкенда после старта не падают на новых колонках
+    path = str(tmp_path / 'ch.db')
+    conn = sqlite3.connect(sample_db)
+    conn.execute(f"VACUUM INTO '{path}'")
+    conn.close()
+    conn = sqlite3.connect(path)
+    for suffix in ('ai', 'ad', 'au'):
+        conn.execute(f'DROP TRIGGER IF EXISTS package_updates_latest_{suffix}')
+    conn.execute('DROP TABLE IF EXISTS package_latest')
+    conn.execute('DROP INDEX IF EXISTS ix_package_updates_version_key')
+    conn.execute('DROP INDEX IF EXISTS ix_package_updates_package_version')
+    conn.execute('ALTER TABLE package_updates DROP COLUMN version_key')
+    conn.execute("DELETE FROM schema_version WHERE name = 'schema'")
+    conn.commit()
+    conn.close()
+
+    client = make_app(ANALYTICS_DATABASE_URL=f'sqlite:///{path}').test_client()
+    client.get('/switch_db/clickhouse')
+    for url in ('/', '/packages', '/updates?sort_by=update_version&sort_dir=desc'):
+        assert client.get(url).status_code == 200, url
+    assert schema_version(application.backends().engine_ch) == schema_fingerprint()
+
+
+def _engines(client, url):
+    """Какие движки ('pg', 'ch') читал запрос url."""
+    backends = application.backends()
+    used = set()
+    listeners = [(engine, lambda *args, name=name: used.add(name))
+                 for name, engine in (('pg', backends.engine_pg), ('ch', backends.engine_ch))]
+    for engine, listener in listeners:
+        event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        resp = client.get(url)
+        resp.get_data()
+        resp.close()
+        assert resp.status_code == 200, url
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, 'before_cursor_execute', listener)
+    return used
+
+
+def test_aggregate_views_read_copy(make_app):
+    client = make_app().test_client()
+    for url in ('/', '/maintainers/workload'):
+        assert _engines(client, url) == {'ch'}, url
+    # списки и карточки — с основной
+    assert _engines(client, '/maintainers') == {'pg'}
+
+    # после своей записи — с основной, пока копию не обновят
+    client.post('/maintainers/add', data={'nickname': 'fresh', 'full_name': 'Fresh Maintainer'})
+    assert _engines(client, '/') == {'pg'}
+    client.post('/jobs', data={'kind': 'refresh_analytics'})
+    client.get('/jobs')
+    assert _engines(client, '/') == {'ch'}
+
+
+def test_aggregate_views_respect_choice(make_app):
+    client = make_app().test_client()
+    client.get('/switch_db/postgres')
+    assert _engines(client, '/') == {'pg'}
+
+    client = make_app(ANALYTICS_VIEWS=[]).test_client()
+    assert _engines(client, '/maintainers/workload') == {'pg'}
@@ -0,0 +1,109 @@
+# JSON API (/api/v1/<resource>): строки таблицы с подписями связей, NDJSON
+# или JSON-массивом, потоком; ?limit=N — страница и Link на следующую по
+# keyset-курсору, страницы вместе дают весь список без повторов.
+
+import json
+import re
+
+import pytest
+
+import app as application
+from models import PackageUpdate
+
+# строк на странице API: не делит нацело число строк sample_db
+PAGE = 97
+
+
+def _get(client, url, status=200):
+    """(ответ, тело строкой); тело потокового ответа дочитывается."""
+    resp = client.get(url)
+    body = resp.get_data(as_text=True)
+    resp.close()
+    assert resp.status_code == status, url
+    return resp, body
+
+def _rows(client, url):
+    resp, body = _get(client, url)
+    assert resp.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in body.splitlines()]
+
+def _next(resp):
+    link = resp.headers.get('Link')
+    if link is None:
+        return None
+    found = re.fullmatch(r'<([^>]+)>; rel="next"', link)
+    assert found, link
+    return found.group(1)
+
+def _walk(client, url):
+    """Все строки по ссылкам Link; (строки, число страниц)."""
+    rows, pages = [], 0
+    while url:
+        assert pages < 100, url
+        resp, body = _get(client, url)
+        rows += [json.loads(line) for line in body.splitlines()]
+        pages += 1
+        url = _next(resp)
+    return rows, pages
+
+
+def test_row_shape(client):
+    rows = _rows(client, '/api/v1/updates?limit=3')
+    assert len(rows) == 3
+    columns = {col.key for col in PackageUpdate.__table__.columns}
+    assert set(rows[0]) == columns | {'package_name', 'updater_nickname'}
+    assert re.fullmatch(r'\d{4}-\d\d-\d\d', rows[0]['update_date'])
+
+    resp, body = _get(client, '/api/v1/updates?limit=3&format=json')
+    assert resp.mimetype == 'application/json'
+    assert json.loads(body) == rows
+
+
+def test_filters_and_sort(client):
+    package_id = _rows(client, '/api/v1/updates?limit=1')[0]['package_id']
+    rows = _rows(client, f'/api/v1/updates?package_id={package_id}&sort_by=update_date&sort_dir=desc')
+    assert rows and {r['package_id'] for r in rows} == {package_id}
+    dates = [r['update_date'] for r in rows]
+    assert dates == sorted(dates, reverse=True)
+
+
+@pytest.mark.parametrize('resource, query', [
+    ('updates',     ''),
+    ('updates',     '&sort_by=update_version&sort_dir=desc'),
+    ('updates',     '&sort_by=update_date'),
+    ('reports',     '&sort_by=last_changed&sort_dir=desc'),     # NULL в колонке сортировки
+    ('maintainers', '&sort_by=nickname'),
+])
+def test_cursor_pages_cover_list(client, resource, query):
+    pk = {'updates': 'update_id', 'reports': 'id', 'maintainers': 'maintainer_id'}[resource]
+    whole = [r[pk] for r in _rows(client, f'/api/v1/{resource}?{query.lstrip("&")}')]
+    rows, pages = _walk(client, f'/api/v1/{resource}?limit={PAGE}{query}')
+    assert [r[pk] for r in rows] == whole
+    assert pages == -(-len(whole) // PAGE)
+
+
+def test_last_page_has_no_link(client):
+    total = len(_rows(client, '/api/v1/maintainers'))
+    resp, _ = _get(client, f'/api/v1/maintainers?limit={total}')
+    assert _next(resp) is None
+    resp, _ = _get(client, f'/api/v1/maintainers?limit={total - 1}')
+    assert _next(resp) is not None
+
+
+def test_errors(client):
+    _get(client, '/api/v1/nothing', status=404)
+    _get(client, '/api/v1/updates?cursor=not-a-cursor', status=400)
+
+
+def test_output_is_streamed(make_app):
+    client = make_app(API_CHUNK=10).test_client()
+    resp = client.get('/api/v1/updates?limit=100', buffered=False)
+    assert resp.is_streamed
+    # ссылка на следующую страницу уже в заголовках, до чтения тела
+    assert _next(resp) is not None
+    chunks = list(resp.response)
+    resp.close()
+    # строка — отдельный кусок ответа
+    assert len(chunks) == 100
+    # соединение запроса вернулось в пул, когда ответ закрыт
+    assert application.backends().engine_pg.pool.checkedout() == 0
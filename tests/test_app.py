@@ -0,0 +1,59 @@
+# create_app(config) можно вызывать повторно (после close_backends()): каждый
+# вызов подхватывает свой config, в том числе METRICS, включённый уже после
+# обработанных запросов.
+
+import shutil
+import sqlite3
+
+import pytest
+
+import app as application
+
+
+def _get(client, url):
+    """(ответ, тело); потоковый ответ дочитывается и закрывается сразу."""
+    resp = client.get(url)
+    body = resp.get_data(as_text=True)
+    resp.close()
+    return resp, body
+
+
+def test_create_app_twice_with_different_configs(make_app, db_path, tmp_path):
+    client = make_app(METRICS=False).test_client()
+    resp, _ = _get(client, '/maintainers')
+    assert resp.status_code == 200
+    assert 'Server-Timing' not in resp.headers
+    assert _get(client, '/metrics')[0].status_code == 404
+
+    # вторая БД: с переименованным мейнтейнером
+    other = str(tmp_path / 'other.db')
+    shutil.copy(db_path, other)
+    conn = sqlite3.connect(other)
+    conn.execute("UPDATE maintainers SET nickname = 'renamed-in-other' WHERE maintainer_id = "
+                 "(SELECT MIN(maintainer_id) FROM maintainers)")
+    conn.commit()
+    conn.close()
+
+    client = make_app(METRICS=True, DATABASE_URL=f'sqlite:///{other}').test_client()
+    resp, body = _get(client, '/maintainers?nickname=renamed-in-other')
+    assert resp.status_code == 200
+    assert '>renamed-in-other</a>' in body
+    assert 'db;dur=' in resp.headers['Server-Timing']
+    assert 'sisyphus_requests_total{endpoint="list_maintainers"} 1' in _get(client, '/metrics')[1]
+
+    # и обратно: метрики выключены, хуки остаются, но ничего не собирают
+    client = make_app(METRICS=False).test_client()
+    assert 'Server-Timing' not in _get(client, '/maintainers')[0].headers
+
+
+def test_config_change_after_first_request_needs_close(make_app):
+    _get(make_app().test_client(), '/maintainers')
+    with pytest.raises(RuntimeError):
+        application.create_app({'METRICS': True})
+
+
+def test_first_request_within_budget(make_app):
+    # Backends создаются в первом запросе; их подготовка (recover() задач и
+    # т.п.) не входит в его бюджет SQL (CHECK_QUERY_BUDGET)
+    client = make_app(STREAM_PAGES=False).test_client()
+    assert _get(client, '/groups')[0].status_code == 200
@@ -0,0 +1,99 @@
+# Архив обновлений (archive.py): перенесённые строки читаются обратно теми
+# же и в том же порядке (новые первыми), пороги keep и before соблюдаются,
+# а restore возвращает package_updates в исходное состояние.
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import archive
+import latest
+import stats
+import workload
+from models import PackageUpdate, UpdateArchive
+
+COLUMNS = ('update_id', 'package_id', 'updater_id', 'update_version', 'update_date', 'changelog')
+BEFORE = date(2015, 1, 1)
+
+
+@pytest.fixture
+def engine(db_path):
+    engine = create_engine(f'sqlite:///{db_path}')
+    yield engine
+    engine.dispose()
+
+def _live(conn):
+    """{package_id: [строки]} package_updates, от новых к старым, как на странице пакета."""
+    by_package = {}
+    rows = conn.execute(select(*(getattr(PackageUpdate, c) for c in COLUMNS))
+                        .order_by(PackageUpdate.update_date.desc(), PackageUpdate.update_id.desc()))
+    for row in rows:
+        by_package.setdefault(row.package_id, []).append(dict(row._mapping))
+    return by_package
+
+def _archived(conn, package_id):
+    """Весь архив пакета через package_rows, по курсорам пачек."""
+    rows, cursor = [], None
+    with Session(bind=conn) as db:
+        while True:
+            part, cursor = archive.package_rows(db, package_id, cursor)
+            rows += part
+            if cursor is None:
+                return rows
+
+def _split(live, keep=None, before=None):
+    """(остаются, в архив) для строк пакета по тем же правилам, что archive_updates."""
+    stay, gone = [], []
+    for rank, row in enumerate(live, 1):
+        old = (before is None or row['update_date'] < before) and (keep is None or rank > keep)
+        (gone if old else stay).append(row)
+    return stay, gone
+
+
+@pytest.mark.parametrize('keep, before', [(3, None), (None, BEFORE), (2, BEFORE)])
+def test_archive_reads_back(engine, keep, before):
+    with engine.connect() as conn:
+        original = _live(conn)
+    with engine.begin() as conn:
+        result = archive.archive_updates(conn, before=before, keep=keep, blob_rows=4)
+    assert result['rows'] > 0
+
+    with engine.connect() as conn:
+        live = _live(conn)
+        total = 0
+        for package_id, rows in original.items():
+            stay, gone = _split(rows, keep, before)
+            assert live.get(package_id, []) == stay, package_id
+            # архив дочитывается после живых строк: вместе — исходный порядок
+            assert _archived(conn, package_id) == gone, package_id
+            with Session(bind=conn) as db:
+                assert archive.summary(db, package_id) == \
+                    (len(gone), gone[0]['update_date'] if gone else None)
+            total += len(gone)
+        assert result['rows'] == total
+        assert stats.check_stats(conn) == {}
+        assert latest.check_latest(conn) == ([], [])
+        assert workload.check_workload(conn) == ([], [])
+
+
+def test_restore(engine):
+    with engine.connect() as conn:
+        original = _live(conn)
+        keys = dict(conn.execute(select(PackageUpdate.update_id, PackageUpdate.version_key)).all())
+    with engine.begin() as conn:
+        archive.archive_updates(conn, before=BEFORE, keep=1, blob_rows=4)
+    with engine.begin() as conn:
+        assert archive.restore_updates(conn) > 0
+    with engine.connect() as conn:
+        assert _live(conn) == original
+        assert dict(conn.execute(select(PackageUpdate.update_id, PackageUpdate.version_key)).all()) == keys
+        assert conn.execute(select(UpdateArchive.archive_id)).first() is None
+        assert stats.check_stats(conn) == {}
+        assert latest.check_latest(conn) == ([], [])
+
+
+def test_needs_threshold(engine):
+    with engine.begin() as conn, pytest.raises(ValueError):
+        archive.archive_updates(conn)
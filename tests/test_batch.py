@@ -0,0 +1,124 @@
+# Массовое добавление (batch.py, /<раздел>/batch и /api/v1/<раздел>/batch):
+# неизвестные пакеты и мейнтейнеры, дубли, пустые поля и пустая пачка
+# отклоняются целиком; комплексное добавление пакета (/packages/complex_add)
+# атомарно — при ошибке в любой части не остаётся ничего.
+
+import sqlite3
+
+import pytest
+
+import app as application
+import stats
+
+TABLES = ('packages', 'acl', 'package_groups', 'architectures', 'package_updates', 'change_versions')
+
+
+@pytest.fixture
+def names(db_path):
+    conn = sqlite3.connect(db_path)
+    package, arch = conn.execute('SELECT p.name, a.architecture FROM packages p '
+                                 'JOIN architectures a ON a.package_id = p.package_id LIMIT 1').fetchone()
+    maintainer_id, nickname = conn.execute('SELECT maintainer_id, nickname FROM maintainers LIMIT 1').fetchone()
+    conn.close()
+    return {'package': package, 'arch': arch, 'maintainer_id': maintainer_id, 'nickname': nickname}
+
+def _counts(db_path):
+    conn = sqlite3.connect(db_path)
+    counts = {t: conn.execute(f'SELECT COUNT(*), COALESCE(SUM(version), 0) FROM {t}'
+                              if t == 'change_versions' else f'SELECT COUNT(*) FROM {t}').fetchone()
+              for t in TABLES}
+    conn.close()
+    return counts
+
+def _api(client, kind, rows):
+    resp = client.post(f'/api/v1/{kind}/batch', json=rows)
+    return resp.status_code, resp.get_json()
+
+def _free_arch(db_path, package):
+    conn = sqlite3.connect(db_path)
+    used = {a for a, in conn.execute('SELECT architecture FROM architectures a JOIN packages p '
+                                     'ON p.package_id = a.package_id WHERE p.name = ?', (package,))}
+    conn.close()
+    return next(a for a in application.ARCHITECTURE_OPTIONS if a not in used)
+
+
+def test_api_rejects_bad_rows(client, db_path, names):
+    before = _counts(db_path)
+    pkg = names['package']
+    # верная строка в каждой пачке: не вставляется и она
+    ok = {'package': pkg, 'architecture': _free_arch(db_path, pkg)}
+    cases = [
+        ('architectures', [ok, {'package': 'no-such-package', 'architecture': 'noarch'}], 'Пакет'),
+        ('architectures', [ok, {'package_id': 10 ** 9, 'architecture': 'noarch'}], 'Пакет'),
+        ('acl',           [{'package': pkg, 'maintainer': 'no-such-nick', 'role': 'owner'}], 'Мейнтейнер'),
+        ('architectures', [ok, {'package': pkg, 'architecture': names['arch']}], 'уже указана'),
+        ('architectures', [ok, ok], 'уже указана'),
+        ('architectures', [ok, {'package': pkg, 'architecture': 'vax'}], 'допустимых'),
+        ('groups',        [{'package': pkg, 'group_name': ''}], 'обязательно'),
+        ('acl',           [{'package': pkg, 'maintainer': names['nickname'], 'role': ' '}], 'обязательно'),
+    ]
+    for kind, rows, error in cases:
+        status, body = _api(client, kind, rows)
+        assert status == 422, (kind, rows)
+        assert body['inserted'] == 0
+        assert any(error in e['error'] for e in body['errors']), body
+
+    assert _api(client, 'groups', [])[0] == 400
+    assert _api(client, 'groups', {'rows': 'bash Other'})[0] == 400
+    assert _counts(db_path) == before
+
+
+def test_api_inserts_valid_rows(client, db_path, names):
+    free = _free_arch(db_path, names['package'])
+    status, body = _api(client, 'acl', {'rows': [
+        {'package': names['package'], 'maintainer': names['nickname'], 'role': 'helper'},
+        {'package': names['package'], 'maintainer_id': names['maintainer_id'], 'role': 'tester'}]})
+    assert (status, body) == (201, {'inserted': 2})
+    assert _api(client, 'architectures', [{'package': names['package'], 'architecture': free}]) == \
+        (201, {'inserted': 1})
+    with application.backends().engine_pg.connect() as conn:
+        assert stats.check_stats(conn) == {}
+
+
+def test_form_rejects_whole_batch(client, db_path, names):
+    before = _counts(db_path)
+    text = f"{names['package']} Other\nno-such-package Other\n\n{names['package']}\n"
+    body = client.post('/groups/batch', data={'rows': text}).get_data(as_text=True)
+    assert 'Ничего не добавлено' in body
+    assert 'no-such-package' in body and 'group_name' in body
+    body = client.post('/groups/batch', data={'rows': '\n  \n'}).get_data(as_text=True)
+    assert 'Нет строк для добавления' in body
+    assert _counts(db_path) == before
+
+
+def _complex(client, names, **fields):
+    form = {'name': 'atomic-pkg', 'description': 'Atomic', 'maintainer_id': names['maintainer_id'],
+            'group_name': 'Other', 'architectures': ['x86_64', 'noarch'], 'version': '1.0-alt1',
+            'update_date': '2024-05-01', 'changelog': '- initial', **fields}
+    return client.post('/packages/complex_add', data=form)
+
+def test_complex_add(client, db_path, names):
+    before = _counts(db_path)
+    assert _complex(client, names).status_code == 302
+    after = _counts(db_path)
+    added = {t: after[t][0] - before[t][0] for t in TABLES if t != 'change_versions'}
+    assert added == {'packages': 1, 'acl': 1, 'package_groups': 1, 'architectures': 2, 'package_updates': 1}
+
+
+@pytest.mark.parametrize('fields', [
+    {'maintainer_id': '999999'},         # нет такого мейнтейнера
+    {'maintainer_id': 'abc'},
+    {'update_date': '2024-13-01'},
+    {'changelog': 'fail-on-insert'},     # падает последняя вставка (см. триггер ниже)
+])
+def test_complex_add_is_atomic(client, db_path, names, fields):
+    with application.backends().engine_pg.begin() as conn:
+        conn.exec_driver_sql("CREATE TRIGGER fail_update BEFORE INSERT ON package_updates "
+                             "WHEN new.changelog = 'fail-on-insert' BEGIN SELECT RAISE(ABORT, 'fail'); END")
+    before = _counts(db_path)
+    resp = _complex(client, names, **fields)
+    assert resp.status_code == 200
+    assert 'alert-danger' in resp.get_data(as_text=True)
+    assert _counts(db_path) == before
+    with application.backends().engine_pg.connect() as conn:
+        assert stats.check_stats(conn) == {}
@@ -0,0 +1,100 @@
+# Страницы списков и карточки укладываются в VIEW_STATEMENT_BUDGET
+# (queries.py) — без N+1 ленивых загрузок на любой странице и с фильтрами,
+# а число SQL-запросов не зависит от числа строк в БД.
+
+import re
+import shutil
+import sqlite3
+
+import pytest
+
+import app as application
+from queries import VIEW_STATEMENT_BUDGET, count_statements
+
+# строк на странице пакета до «Показать ещё»: у «горячего» пакета есть следующие
+DETAIL_ROWS = 5
+
+
+def _sample(db_path):
+    conn = sqlite3.connect(db_path)
+    one = lambda sql: conn.execute(sql).fetchone()[0]
+    ids = {
+        # пакет с наибольшим числом обновлений — страница пакета с «Показать ещё»
+        'package':    one('SELECT package_id FROM package_updates GROUP BY package_id ORDER BY COUNT(*) DESC LIMIT 1'),
+        'maintainer': one('SELECT assignee_id FROM reports GROUP BY assignee_id ORDER BY COUNT(*) DESC LIMIT 1'),
+        'reported':   one('SELECT package_id FROM reports GROUP BY package_id ORDER BY COUNT(*) DESC LIMIT 1'),
+    }
+    conn.close()
+    return ids
+
+def _get(client, url):
+    resp = client.get(url)
+    body = resp.get_data(as_text=True)
+    resp.close()
+    assert resp.status_code == 200, url
+    return body
+
+def _more(client, package_id, kind):
+    """URL кнопки «Показать ещё» на странице пакета — вторая страница по курсору."""
+    body = _get(client, f'/packages/{package_id}')
+    found = re.search(rf'href="(/packages/{package_id}/{kind}\?cursor=[^"]+)"', body)
+    assert found, f'у пакета {package_id} нет второй страницы {kind}'
+    return found.group(1).replace('&amp;', '&')
+
+def _pages(client, ids):
+    p, m = ids['package'], ids['maintainer']
+    return [
+        ('list_updates',       '/updates'),
+        ('list_updates',       f'/updates?package_id={p}&per_page=50'),
+        ('list_updates',       '/updates?sort_by=update_version&sort_dir=desc'),
+        ('list_acl',           '/acl'),
+        ('list_acl',           f'/acl?maintainer_id={m}'),
+        ('list_reports',       '/reports'),
+        ('list_reports',       f'/reports?package_id={p}&stale=30'),
+        ('list_reports',       f'/reports?assignee_id={m}'),
+        ('list_groups',        '/groups'),
+        ('list_architectures', '/architectures?architecture=noarch'),
+        ('package_detail',     f'/packages/{p}'),
+        ('package_updates',    _more(client, p, 'updates')),
+        ('package_reports',    _more(client, ids['reported'], 'reports')),
+        ('list_workload',      '/maintainers/workload?sort_by=last_update'),
+        ('maintainer_detail',  f'/maintainers/{m}'),
+    ]
+
+def _measure(make_app, path, stream=True):
+    """[(endpoint, url, SQL-запросов)] по всем страницам _pages на БД path."""
+    client = make_app(DATABASE_URL=f'sqlite:///{path}', ANALYTICS_DATABASE_URL=f'sqlite:///{path}.ch',
+                      STREAM_PAGES=stream, DETAIL_ROWS=DETAIL_ROWS).test_client()
+    pages = _pages(client, _sample(path))
+    # сводные страницы (ANALYTICS_VIEWS) читают аналитическую копию
+    backends = application.backends()
+    result = []
+    for endpoint, url in pages:
+        with count_statements(backends.engine_pg) as pg, count_statements(backends.engine_ch) as ch:
+            _get(client, url)
+        result.append((endpoint, url, pg['count'] + ch['count']))
+    return result
+
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_pages_within_budget(make_app, db_path, stream):
+    measured = _measure(make_app, db_path, stream)
+    assert {endpoint for endpoint, _, _ in measured} == set(VIEW_STATEMENT_BUDGET)
+    for endpoint, url, count in measured:
+        assert 0 < count <= VIEW_STATEMENT_BUDGET[endpoint], f'{url}: {count} SQL'
+
+def test_statement_count_does_not_grow_with_rows(make_app, db_path, large_db, tmp_path):
+    large = str(tmp_path / 'large.db')
+    shutil.copy(large_db, large)
+    small = _measure(make_app, db_path)
+    big = _measure(make_app, large)
+    assert [(endpoint, count) for endpoint, _, count in big] == \
+           [(endpoint, count) for endpoint, _, count in small], (small, big)
+
+def test_next_page_within_budget(client, db_path):
+    # вторая страница по курсору — тот же бюджет, что и первая
+    first = _get(client, '/updates?per_page=20')
+    cursor = first.split('cursor=', 1)[1].split('"', 1)[0].replace('&amp;', '&')
+    with count_statements(application.backends().engine_pg) as c:
+        _get(client, f'/updates?per_page=20&cursor={cursor}')
+    assert c['count'] <= VIEW_STATEMENT_BUDGET['list_updates']
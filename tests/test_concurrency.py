@@ -0,0 +1,31 @@
+# Одновременные чтение и запись на файловой SQLite (bench/run.py stress):
+# писатели не упираются в «database is locked», читатели не падают, а
+# память не растёт от раунда к раунду.
+
+import re
+import sqlite3
+
+import run as bench
+
+READ = r'^(index|search|list_(maintainers|packages|updates|reports|acl|workload)|maintainer_detail|package_detail)$'
+
+
+def test_readers_and_writers(make_app, db_path):
+    ids, _ = bench.sample_ids(db_path)
+    read, write = bench.scenarios(ids)
+    read = [s for s in read if re.search(READ, s[0])]
+    app = make_app()
+
+    result = bench.stress(app, read, threads=4, runs=30, write=write, writers=2, rounds=3)
+
+    assert result['writers'] == 2
+    assert result['error_count'] == 0, result['errors']
+    assert result['locked'] == 0
+    # первый раунд прогревает кэши и пулы; дальше RSS почти не меняется
+    if result['rss_mb'][0] is not None:
+        assert result['rss_mb'][-1] - result['rss_mb'][1] < 20, result['rss_mb']
+
+    conn = sqlite3.connect(db_path)
+    added = conn.execute("SELECT COUNT(*) FROM maintainers WHERE nickname LIKE 'bench%'").fetchone()[0]
+    conn.close()
+    assert added > 0
@@ -0,0 +1,97 @@
+# Выгрузки (export.py и /export/<таблица>): CSV, CSV.gz и Parquet читаются
+# обратно теми же строками, что в БД, --joined добавляет подписи связей,
+# неизвестная таблица или формат отклоняются.
+
+import csv
+import gzip
+import importlib.util
+import io
+import sqlite3
+
+import pytest
+
+import app as application
+import export
+
+CHUNK = 97
+
+
+def _db_rows(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.execute(sql)
+    keys = [d[0] for d in cursor.description]
+    rows = [['' if v is None else str(v) for v in row] for row in cursor]
+    conn.close()
+    return keys, rows
+
+def _csv(text):
+    rows = list(csv.reader(io.StringIO(text)))
+    return rows[0], rows[1:]
+
+def _run(db_path, tmp_path, *args):
+    out = str(tmp_path / 'out')
+    assert export.main([*args, '--db', db_path, '--chunk', str(CHUNK), '-o', out]) == 0
+    with open(out, 'rb') as f:
+        return f.read()
+
+UPDATES = ('SELECT update_id, package_id, updater_id, update_version, update_date, changelog, version_key '
+           'FROM package_updates ORDER BY update_id')
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'csv.gz'])
+def test_csv_round_trip(db_path, tmp_path, fmt):
+    data = _run(db_path, tmp_path, 'updates', '--format', fmt)
+    text = (gzip.decompress(data) if fmt == 'csv.gz' else data).decode()
+    # changelog'и многострочные — сверка через csv.reader, а не по строкам файла
+    assert _csv(text) == _db_rows(db_path, UPDATES)
+
+
+def test_joined(db_path, tmp_path):
+    keys, rows = _csv(_run(db_path, tmp_path, 'reports', '--joined').decode())
+    assert keys[-2:] == ['package_name', 'assignee_nickname']
+    _, expected = _db_rows(db_path, 'SELECT r.id, p.name, m.nickname FROM reports r '
+                                    'JOIN packages p ON p.package_id = r.package_id '
+                                    'JOIN maintainers m ON m.maintainer_id = r.assignee_id ORDER BY r.id')
+    assert [[row[0], *row[-2:]] for row in rows] == expected
+
+    keys, _ = _csv(_run(db_path, tmp_path, 'reports').decode())
+    assert 'package_name' not in keys
+
+
+def test_parquet_round_trip(db_path, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    data = _run(db_path, tmp_path, 'updates', '--format', 'parquet')
+    table = pq.read_table(io.BytesIO(data))
+    keys, rows = _db_rows(db_path, UPDATES)
+    assert table.column_names == keys
+    # row group на пачку
+    assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == -(-len(rows) // CHUNK)
+    assert [['' if v is None else str(v) for v in row.values()] for row in table.to_pylist()] == rows
+
+
+def test_unknown_table_rejected(db_path, tmp_path, client):
+    with pytest.raises(SystemExit):
+        export.main(['nothing', '--db', db_path, '-o', str(tmp_path / 'out')])
+    assert client.get('/export/nothing').status_code == 404
+    assert client.get('/export/updates?format=xlsx').status_code == 404
+
+
+def test_http_export_matches_cli(db_path, tmp_path, make_app):
+    client = make_app(EXPORT_CHUNK=CHUNK).test_client()
+    resp = client.get('/export/acl?format=csv.gz&joined=1', buffered=False)
+    assert resp.is_streamed
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=acl.csv.gz'
+    pool = application.backends().engine_pg.pool
+    chunks = iter(resp.response)
+    first = next(chunks)
+    # курсор читается по ходу ответа: соединение у запроса, а не в пуле
+    assert pool.checkedout() == 1
+    body = first + b''.join(chunks)
+    resp.close()
+    assert pool.checkedout() == 0
+    assert gzip.decompress(body) == gzip.decompress(_run(db_path, tmp_path, 'acl', '--joined',
+                                                         '--format', 'csv.gz'))
+
+    if importlib.util.find_spec('pyarrow') is None:
+        # Parquet без pyarrow — 501, а не 500
+        assert client.get('/export/acl?format=parquet').status_code == 501
@@ -0,0 +1,35 @@
+# ETag и render_cache (HTTP_CACHE): страница /reports, чей фильтр «без
+# движения» и метрики считаются от сегодняшней даты, не отдаётся из кэша
+# на следующий день.
+
+from datetime import date, timedelta
+
+import triage
+
+
+def test_reports_etag_changes_with_date(make_app, monkeypatch):
+    client = make_app(HTTP_CACHE=True).test_client()
+    day = date(2026, 3, 1)
+    monkeypatch.setattr(triage, 'today', lambda: day)
+
+    first = client.get('/reports?stale=30')
+    etag = first.headers['ETag']
+    assert client.get('/reports?stale=30', headers={'If-None-Match': etag}).status_code == 304
+    maintainers = client.get('/maintainers').headers['ETag']
+
+    day += timedelta(days=1)
+    second = client.get('/reports?stale=30', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    # страницы, не зависящие от даты, остаются в кэше
+    assert client.get('/maintainers', headers={'If-None-Match': maintainers}).status_code == 304
+
+
+def test_stale_filter_uses_new_date(make_app, monkeypatch, db_path):
+    client = make_app(HTTP_CACHE=True).test_client()
+    # сегодня «давно» — ни один баг-репорт ещё не залежался; через 100 лет — все открытые
+    monkeypatch.setattr(triage, 'today', lambda: date(2001, 1, 1))
+    before = client.get('/reports?stale=30&per_page=500').get_data(as_text=True)
+    monkeypatch.setattr(triage, 'today', lambda: date(2101, 1, 1))
+    after = client.get('/reports?stale=30&per_page=500').get_data(as_text=True)
+    assert before.count('/reports/edit/') < after.count('/reports/edit/')
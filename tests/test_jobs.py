@@ -0,0 +1,174 @@
+# Фоновые задачи (jobs.py) в самом запросе (JOB_WORKERS = 0) и восстановление
+# после перезапуска: падают только задачи процессов, которых уже нет.
+
+import io
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+import app as application
+import importer
+import jobs
+import latest
+import stats
+import workload
+from models import Job, Package, PackageUpdate
+
+
+def _latest_job():
+    return application.backends().jobs.recent(limit=1)[0]
+
+
+def test_delete_package(client, db_path):
+    conn = sqlite3.connect(db_path)
+    package_id = conn.execute('SELECT package_id FROM reports GROUP BY package_id '
+                              'ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0]
+    conn.close()
+
+    assert client.get(f'/packages/delete/{package_id}').status_code == 302
+    job = _latest_job()
+    assert (job['kind'], job['status']) == ('delete_package', 'done'), job
+    assert job['owner'] == f'{socket.gethostname()}:{os.getpid()}'
+    assert job['result']['deleted']['reports'] > 0
+    with application.backends().engine_pg.connect() as conn:
+        assert conn.execute(select(Package).where(Package.package_id == package_id)).first() is None
+
+
+def test_export_and_download(client):
+    client.post('/jobs', data={'kind': 'export', 'table': 'maintainers', 'fmt': 'csv'})
+    job = _latest_job()
+    assert job['status'] == 'done', job
+    assert job['result']['rows'] == 40
+    resp = client.get(f'/jobs/{job["job_id"]}/download')
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True).count('\n') == 41
+
+
+def test_rebuild(client):
+    client.post('/jobs', data={'kind': 'rebuild'})
+    job = _latest_job()
+    assert job['status'] == 'done', job
+    assert 'сводки' in job['result']['rebuilt']
+
+
+RECORD = {'name': 'imported-pkg', 'description': 'Imported', 'group': 'Other',
+          'architectures': ['noarch'],
+          'acl': [{'nickname': 'importer', 'full_name': 'Im Porter', 'role': 'owner'}],
+          'updates': [{'nickname': 'importer', 'full_name': 'Im Porter', 'version': '1.0-alt1',
+                       'date': '2024-05-01', 'changelog': '- initial build'}]}
+
+def test_import_keeps_triggers_for_concurrent_writes(client, db_path, monkeypatch):
+    engine = application.backends().engine_pg
+    seen = {}
+    read_records = importer.read_records
+
+    def records(path):
+        for record in read_records(path):
+            # посреди импорта приложение пишет в тот же файл
+            with engine.connect() as conn:
+                seen['triggers'] = set(conn.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars())
+            db = application.backends().sessions['postgres']()
+            update = db.get(PackageUpdate, 1)
+            db.add(PackageUpdate(package_id=update.package_id, updater_id=update.updater_id,
+                                 update_version='99.0-alt1', update_date=update.update_date,
+                                 changelog='- during import'))
+            db.commit()
+            db.close()
+            yield record
+
+    monkeypatch.setattr(importer, 'read_records', records)
+    dump = io.BytesIO(json.dumps(RECORD).encode())
+    client.post('/jobs', data={'kind': 'import', 'file': (dump, 'dump.jsonl')})
+    job = _latest_job()
+    assert job['status'] == 'done', job
+    assert job['result']['packages'] == 1
+
+    assert {'package_updates_stats_ai', 'package_updates_latest_ai'} <= seen['triggers']
+    with engine.connect() as conn:
+        assert stats.check_stats(conn) == {}
+        assert latest.check_latest(conn) == ([], [])
+        assert workload.check_workload(conn) == ([], [])
+
+
+def test_wait_restarts_pool(make_app):
+    make_app(JOB_WORKERS=2)
+    runner = application.backends().jobs
+    job_id = runner.submit('rebuild')
+    runner.wait()
+    assert runner.status(job_id)['status'] == 'done'
+    job_id = runner.submit('rebuild')
+    runner.wait()
+    assert runner.status(job_id)['status'] == 'done'
+    assert runner.workers == 2
+
+
+@pytest.fixture
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+@pytest.fixture
+def live_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    yield proc.pid
+    proc.kill()
+    proc.wait()
+
+
+def test_recover_fails_only_orphaned_jobs(make_app, dead_pid, live_pid):
+    make_app()
+    runner = application.backends().jobs
+    host = socket.gethostname()
+    owners = {
+        'legacy':     None,
+        'dead':       f'{host}:{dead_pid}',
+        'this':       f'{host}:{os.getpid()}',     # этот процесс её не выполняет
+        'sibling':    f'{host}:{live_pid}',
+        'other_host': f'{host}-other:{dead_pid}',
+        'malformed':  f'{host}:not-a-pid',
+    }
+    ids = {}
+    with runner.engine.begin() as conn:
+        for name, owner in owners.items():
+            ids[name] = conn.execute(insert(Job).values(
+                kind='rebuild', params='{}', status='running', owner=owner,
+                created_at=datetime(2026, 1, 1), started_at=datetime(2026, 1, 1))).inserted_primary_key[0]
+        queued = conn.execute(insert(Job).values(
+            kind='rebuild', params='{}', status='queued',
+            created_at=datetime(2026, 1, 1))).inserted_primary_key[0]
+
+    assert runner.recover() == 1
+
+    status = {name: runner.status(job_id)['status'] for name, job_id in ids.items()}
+    assert status == {'legacy': 'failed', 'dead': 'failed', 'this': 'failed', 'malformed': 'failed',
+                      'sibling': 'running', 'other_host': 'running'}
+    assert runner.status(queued)['status'] == 'done'
+
+
+def test_recover_keeps_job_running_in_this_process(make_app, monkeypatch):
+    make_app()
+    runner = application.backends().jobs
+    seen = {}
+
+    def task(engine, progress):
+        # другой воркер стартует, пока задача выполняется
+        seen['recovered'] = runner.recover()
+        seen['status'] = runner.status(job_id)['status']
+        return {}
+
+    monkeypatch.setitem(jobs.TASKS, 'probe', task)
+    with runner.engine.begin() as conn:
+        job_id = conn.execute(insert(Job).values(kind='probe', params='{}', status='queued',
+                                                 created_at=datetime(2026, 1, 1))).inserted_primary_key[0]
+    runner.run(job_id)
+    assert seen == {'recovered': 0, 'status': 'running'}
+    assert runner.status(job_id)['status'] == 'done'
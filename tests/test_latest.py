@@ -0,0 +1,64 @@
+# Текущая версия пакета (latest.py): package_latest, которую ведут триггеры,
+# после вставки, изменения и удаления обновлений совпадает с пересчётом.
+
+from datetime import date
+
+from sqlalchemy import delete, insert
+
+import app as application
+import latest
+from models import PackageLatest, PackageUpdate
+
+
+def _current(db, package_id):
+    db.expire_all()
+    return db.get(PackageLatest, package_id)
+
+
+def test_triggers_match_full_recount(client):
+    engine = application.backends().engine_pg
+    db = application.backends().sessions['postgres']()
+    with engine.connect() as conn:
+        assert latest.check_latest(conn) == ([], [])
+
+    current = db.query(PackageLatest).first()
+    package_id, updater_id = current.package_id, db.get(PackageUpdate, current.update_id).updater_id
+
+    # вставка: старшая по версии становится текущей, а более поздняя по дате, но младшая — нет
+    newer = PackageUpdate(package_id=package_id, updater_id=updater_id, update_version='9999.0-alt1',
+                          update_date=date(2001, 1, 1), changelog='- newer')
+    db.add(newer)
+    db.commit()
+    assert _current(db, package_id).update_id == newer.update_id
+    older = PackageUpdate(package_id=package_id, updater_id=updater_id, update_version='0.1-alt1',
+                          update_date=date(2030, 1, 1), changelog='- older')
+    db.add(older)
+    db.commit()
+    assert _current(db, package_id).update_id == newer.update_id
+
+    # изменение: текущая версия опускается ниже остальных — текущей становится другая
+    newer.update_version = '0.0~pre1-alt0'
+    db.commit()
+    assert _current(db, package_id).update_id != newer.update_id
+    older.update_version = '10000.0-alt1'
+    db.commit()
+    assert _current(db, package_id).update_id == older.update_id
+
+    # удаление текущей строки
+    db.delete(older)
+    db.commit()
+    assert _current(db, package_id).update_id not in (older.update_id, newer.update_id)
+
+    # массовые Core-вставки и удаление всех обновлений пакета
+    with engine.begin() as conn:
+        conn.execute(insert(PackageUpdate), [
+            {'package_id': package_id, 'updater_id': updater_id, 'update_version': f'{n}.0-alt1',
+             'update_date': date(2020, 1, n), 'changelog': '- bulk'} for n in range(1, 11)])
+    assert _current(db, package_id).update_version == '10.0-alt1'
+    with engine.begin() as conn:
+        conn.execute(delete(PackageUpdate).where(PackageUpdate.package_id == package_id))
+    assert _current(db, package_id) is None
+    db.close()
+
+    with engine.connect() as conn:
+        assert latest.check_latest(conn) == ([], [])
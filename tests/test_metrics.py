@@ -0,0 +1,95 @@
+# Метрики запросов (metrics.py, METRICS): Server-Timing с числом SQL, агрегаты
+# в формате Prometheus и журнал медленных запросов; сбор включается и
+# выключается по app.config['METRICS'] и после первых запросов.
+
+import re
+
+import app as application
+from queries import count_statements
+
+TIMING = re.compile(r'app;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) SQL", tpl;dur=([\d.]+)')
+
+
+def _get(client, url):
+    resp = client.get(url)
+    resp.get_data()
+    resp.close()
+    assert resp.status_code == 200, url
+    return resp
+
+def _timing(resp):
+    found = TIMING.fullmatch(resp.headers['Server-Timing'])
+    assert found, resp.headers['Server-Timing']
+    app, db, sql, tpl = found.groups()
+    return float(app), float(db), int(sql), float(tpl)
+
+def _samples(text):
+    """{'имя{метки}': значение} из вывода /metrics."""
+    return {name: float(value) for name, value in
+            (line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))}
+
+
+def test_server_timing_counts_statements(make_app):
+    # без потоковой отдачи: рендер и SQL укладываются в сам запрос
+    client = make_app(METRICS=True, STREAM_PAGES=False).test_client()
+    _get(client, '/maintainers')
+    for url in ('/maintainers', '/updates?per_page=20', '/reports?stale=30'):
+        with count_statements(application.backends().engine_pg) as c:
+            resp = _get(client, url)
+        app, db, sql, tpl = _timing(resp)
+        assert sql == c['count'] > 0, url
+        assert 0 < db <= app and 0 < tpl <= app, resp.headers['Server-Timing']
+
+
+def test_prometheus_output(make_app):
+    client = make_app(METRICS=True).test_client()
+    for _ in range(3):
+        _get(client, '/maintainers')
+    _get(client, '/groups')
+
+    resp = client.get('/metrics')
+    assert resp.content_type.startswith('text/plain; version=0.0.4')
+    text = resp.get_data(as_text=True)
+    for name in ('requests_total', 'db_statements_total', 'request_duration_seconds', 'slow_queries_total'):
+        assert f'# TYPE sisyphus_{name} ' in text, name
+    samples = _samples(text)
+    assert samples['sisyphus_requests_total{endpoint="list_maintainers"}'] == 3
+    assert samples['sisyphus_requests_total{endpoint="list_groups"}'] == 1
+    assert samples['sisyphus_db_statements_total{endpoint="list_maintainers"}'] >= 3
+
+    # гистограмма накопительная, +Inf — все запросы маршрута
+    buckets = [value for name, value in samples.items()
+               if name.startswith('sisyphus_request_duration_seconds_bucket{endpoint="list_maintainers"')]
+    assert buckets == sorted(buckets) and buckets[-1] == 3
+    assert samples['sisyphus_request_duration_seconds_count{endpoint="list_maintainers"}'] == 3
+
+
+def test_slow_queries_logged(make_app, monkeypatch):
+    logged = []
+    monkeypatch.setattr(application.metrics, 'log', logged.append)
+    client = make_app(METRICS=True, SLOW_QUERY_MS=0).test_client()
+    _get(client, '/groups')
+    assert logged and all('list_groups' in line for line in logged)
+    assert _samples(client.get('/metrics').get_data(as_text=True))['sisyphus_slow_queries_total'] == len(logged)
+    assert 'list_groups' in _get(client, '/debug/metrics').get_data(as_text=True)
+
+
+def test_metrics_switched_at_runtime(make_app):
+    client = make_app(METRICS=False).test_client()
+    resp = _get(client, '/maintainers')
+    assert 'Server-Timing' not in resp.headers
+    assert client.get('/metrics').status_code == 404
+    assert client.get('/debug/metrics').status_code == 404
+
+    # включили после первого запроса — хуки уже стоят, сбор начинается сразу
+    application.app.config['METRICS'] = True
+    _, _, sql, _ = _timing(_get(client, '/maintainers'))
+    assert sql > 0
+    samples = _samples(client.get('/metrics').get_data(as_text=True))
+    assert samples['sisyphus_requests_total{endpoint="list_maintainers"}'] == 1
+
+    application.app.config['METRICS'] = False
+    assert 'Server-Timing' not in _get(client, '/maintainers').headers
+    application.app.config['METRICS'] = True
+    samples = _samples(client.get('/metrics').get_data(as_text=True))
+    assert samples['sisyphus_requests_total{endpoint="list_maintainers"}'] == 1
@@ -0,0 +1,83 @@
+# migrate.py: индексы из моделей создаются на существующей БД, и основные
+# запросы списков и страницы пакета идут по ним (PLAN_CHECKS).
+
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import migrate
+
+
+@pytest.fixture
+def engine(db_path):
+    engine = create_engine(f'sqlite:///{db_path}')
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize('title, stmt', migrate.PLAN_CHECKS, ids=[t for t, _ in migrate.PLAN_CHECKS])
+def test_plan_uses_index(engine, title, stmt):
+    with engine.connect() as conn:
+        plan = migrate.query_plan(conn, stmt)
+    assert not [line for line in plan if migrate._BAD_PLAN.search(line)], plan
+
+def test_missing_indexes_are_created(engine, db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('DROP INDEX ix_package_updates_package_date')
+    conn.execute('DROP INDEX ix_reports_assignee_id')
+    conn.execute('DELETE FROM schema_version')
+    conn.commit()
+    conn.close()
+    assert migrate.explain(engine, log=lambda line: None) > 0
+
+    lines = []
+    migrate.migrate(engine, log=lines.append)
+    assert 'package_updates: создан индекс ix_package_updates_package_date' in lines
+    assert 'reports: создан индекс ix_reports_assignee_id' in lines
+    assert migrate.explain(engine, log=lambda line: None) == 0
+
+def test_up_to_date_schema_is_not_rechecked(engine):
+    lines = []
+    migrate.migrate(engine, log=lines.append)
+    assert not any('создан индекс' in line or 'schema_version' in line for line in lines)
+    assert migrate.schema_version(engine) == migrate.schema_fingerprint()
+
+
+@pytest.fixture
+def duplicated(db_path):
+    """Повторная архитектура пакета в БД, где ещё нет уникального индекса; (arch_id, package_id, arch)."""
+    conn = sqlite3.connect(db_path)
+    conn.execute('DROP INDEX ux_architectures_package_arch')
+    conn.execute('DELETE FROM schema_version')
+    package_id, arch = conn.execute('SELECT package_id, architecture FROM architectures LIMIT 1').fetchone()
+    arch_id = conn.execute('INSERT INTO architectures(package_id, architecture) VALUES (?, ?)',
+                           (package_id, arch)).lastrowid
+    conn.commit()
+    conn.close()
+    return arch_id, package_id, arch
+
+def _count(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    n = conn.execute(sql).fetchone()[0]
+    conn.close()
+    return n
+
+def test_duplicates_are_not_dropped_silently(engine, db_path, duplicated, capsys):
+    arch_id, package_id, arch = duplicated
+    with pytest.raises(migrate.DuplicateRows, match='--dedupe'):
+        migrate.migrate(engine, log=lambda line: None)
+    engine.dispose()
+    assert _count(db_path, f'SELECT COUNT(*) FROM architectures WHERE arch_id = {arch_id}') == 1
+
+    assert migrate.main([db_path]) == 1
+    assert f'arch_id {arch_id}' in capsys.readouterr().err
+    assert _count(db_path, f'SELECT COUNT(*) FROM architectures WHERE arch_id = {arch_id}') == 1
+
+def test_dedupe_logs_removed_rows(db_path, duplicated, capsys):
+    arch_id, package_id, arch = duplicated
+    assert migrate.main([db_path, '--dedupe']) == 0
+    out = capsys.readouterr().out
+    assert f'architectures: удалён дубль arch_id={arch_id} (package_id={package_id}, {arch})' in out
+    assert 'architectures: создан индекс ux_architectures_package_arch' in out
+    assert _count(db_path, f'SELECT COUNT(*) FROM architectures WHERE arch_id = {arch_id}') == 0
@@ -0,0 +1,120 @@
+# Чтение с реплик (replicas.py, REPLICA_FILES): GET-страницы идут на
+# свежие SQLite-копии, а после запроса, который что-то записал — POST или
+# GET-удаление, — клиент читает с основной, пока копии её не догонят.
+
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import event
+
+import app as application
+
+
+def _replicated(make_app, tmp_path, **config):
+    """(client, hits): hits[имя engine'а] — число SQL-запросов к нему."""
+    app = make_app(**{'REPLICA_FILES': [str(tmp_path / 'r1.db'), str(tmp_path / 'r2.db')],
+                      'REPLICA_MAX_LAG': 3600, 'REPLICA_COPY_INTERVAL': 0, **config})
+    backends = application.backends()
+    backends.replicas.refresh()
+    hits = {}
+    engines = {'primary': backends.engine_pg,
+               **{f'r{n}': r.engine for n, r in enumerate(backends.replicas.replicas, 1)}}
+    for name, engine in engines.items():
+        def count(*args, name=name):
+            hits[name] = hits.get(name, 0) + 1
+        event.listen(engine, 'before_cursor_execute', count)
+    return app.test_client(), hits
+
+@pytest.fixture
+def replicated(make_app, tmp_path):
+    return _replicated(make_app, tmp_path)
+
+def _get(client, hits, url):
+    hits.clear()
+    resp = client.get(url)
+    body = resp.get_data(as_text=True)
+    resp.close()
+    assert resp.status_code == 200, url
+    return body, set(hits)
+
+def _maintainer_id(db_path, nickname):
+    conn = sqlite3.connect(db_path)
+    row = conn.execute('SELECT maintainer_id FROM maintainers WHERE nickname = ?', (nickname,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def test_reads_go_to_replicas_in_turn(replicated):
+    client, hits = replicated
+    used = set()
+    for _ in range(2):
+        _, engines = _get(client, hits, '/maintainers')
+        assert 'primary' not in engines
+        used |= engines
+    assert used == {'r1', 'r2'}
+
+
+def test_read_after_post(replicated):
+    client, hits = replicated
+    client.post('/maintainers/add', data={'nickname': 'newbie', 'full_name': 'New Bie'})
+    body, engines = _get(client, hits, '/maintainers?nickname=newbie')
+    assert '>newbie</a>' in body
+    assert engines == {'primary'}
+
+    application.backends().replicas.refresh()
+    body, engines = _get(client, hits, '/maintainers?nickname=newbie')
+    assert '>newbie</a>' in body
+    assert 'primary' not in engines
+
+
+def test_read_after_get_delete(replicated, db_path):
+    client, hits = replicated
+    client.post('/maintainers/add', data={'nickname': 'shortlived', 'full_name': 'Short Lived'})
+    application.backends().replicas.refresh()
+    maintainer_id = _maintainer_id(db_path, 'shortlived')
+
+    resp = client.get(f'/maintainers/delete/{maintainer_id}')
+    assert resp.status_code == 302
+    # копии ещё хранят удалённого мейнтейнера — читать можно только с основной
+    body, engines = _get(client, hits, '/maintainers?nickname=shortlived')
+    assert '>shortlived</a>' not in body
+    assert engines == {'primary'}
+
+
+def test_read_only_requests_keep_replicas(replicated):
+    client, hits = replicated
+    _get(client, hits, '/reports')
+    _, engines = _get(client, hits, '/maintainers')
+    assert 'primary' not in engines
+
+
+def test_lagging_replicas_are_skipped(replicated):
+    client, hits = replicated
+    for replica in application.backends().replicas.replicas:
+        replica.synced = time.monotonic() - 7200
+    _, engines = _get(client, hits, '/maintainers')
+    assert engines == {'primary'}
+
+
+def test_copies_are_not_retaken_on_every_tick(make_app, tmp_path):
+    client, hits = _replicated(make_app, tmp_path, REPLICA_COPY_INTERVAL=3600)
+    pool = application.backends().replicas
+    first = {r.name: r.revision for r in pool.replicas}
+
+    # записи идут постоянно, а фоновый поток тикает после каждой
+    for n in range(3):
+        client.post('/maintainers/add', data={'nickname': f'steady{n}', 'full_name': f'Steady {n}'})
+        assert [copied for _, copied in pool.refresh()] == [False, False]
+    assert {r.name: r.revision for r in pool.replicas} == first
+
+    # свои записи клиент всё равно видит — читает с основной
+    body, engines = _get(client, hits, '/maintainers?nickname=steady2')
+    assert '>steady2</a>' in body and engines == {'primary'}
+
+    # интервал прошёл — копии снимаются заново
+    for replica in pool.replicas:
+        replica.copied -= 3600
+    assert [copied for _, copied in pool.refresh()] == [True, True]
+    _, engines = _get(client, hits, '/maintainers?nickname=steady2')
+    assert 'primary' not in engines
@@ -0,0 +1,52 @@
+# Порядок версий RPM (rpmver.py): version_key() сортирует строки так же,
+# как evr_compare(), — по числам, эпохе, релизам altN и '~'.
+
+from itertools import combinations
+
+import pytest
+
+from rpmver import evr_compare, parse_evr, version_key
+
+# пары (младшая, старшая)
+OLDER_NEWER = [
+    ('9.1-alt1',        '10.0-alt1'),       # числа, а не строки
+    ('1.9-alt1',        '1.10-alt1'),
+    ('2.0-alt1',        '1:1.0-alt1'),      # эпоха старше любой версии
+    ('1:9.9-alt1',      '2:0.1-alt1'),
+    ('1.0-alt1',        '1.0-alt2'),
+    ('1.0-alt9',        '1.0-alt10'),
+    ('1.0-alt1',        '1.0-alt1.1'),
+    ('1.0-alt0.rc1',    '1.0-alt1'),
+    ('1.0~rc1-alt1',    '1.0-alt1'),        # '~' младше конца строки
+    ('1.0~rc1-alt1',    '1.0~rc2-alt1'),
+    ('1.0-alt1',        '1.0^git1-alt1'),   # '^' старше конца, младше сегмента
+    ('1.0^git1-alt1',   '1.0.1-alt1'),
+    ('1.0-alt1',        '1.0a-alt1'),
+    ('1.0a-alt1',       '1.0.1-alt1'),      # буквенный сегмент младше числового
+]
+
+
+def test_parse_evr():
+    assert parse_evr('2:1.0-alt1') == (2, '1.0', 'alt1')
+    assert parse_evr('1.0-alt1') == (0, '1.0', 'alt1')
+    assert parse_evr('1.0') == (0, '1.0', '')
+
+
+@pytest.mark.parametrize('older, newer', OLDER_NEWER)
+def test_order(older, newer):
+    assert evr_compare(older, newer) == -1
+    assert evr_compare(newer, older) == 1
+    assert version_key(older) < version_key(newer)
+
+
+def test_equal_versions_have_equal_keys():
+    assert evr_compare('0:1.0-alt1', '1.0-alt1') == 0
+    assert version_key('0:1.0-alt1') == version_key('1.0-alt1')
+    assert version_key('1.01-alt1') == version_key('1.1-alt1')
+
+
+def test_key_matches_compare_on_all_pairs():
+    versions = sorted({v for pair in OLDER_NEWER for v in pair})
+    for a, b in combinations(versions, 2):
+        by_key = (version_key(a) > version_key(b)) - (version_key(a) < version_key(b))
+        assert by_key == evr_compare(a, b), (a, b)
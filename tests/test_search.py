@@ -0,0 +1,126 @@
+# Полнотекстовый поиск (search.py): FTS5 trigram находит подстроки так же,
+# как LIKE, без FTS5 поиск откатывается на LIKE, а триггеры держат индекс в
+# согласии с таблицами при вставке, изменении и удалении.
+
+import sqlite3
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import app as application
+import search
+from db import make_engine
+from models import Maintainer, Package, PackageUpdate, Report
+
+
+def _ids(results, kind):
+    return {r['id'] for r in results if r['kind'] == kind}
+
+def _like(db, q, kind):
+    _, pk, title, body = search.MODELS[kind]
+    return {ref_id for ref_id, in db.query(pk).filter(title.contains(q) | body.contains(q))}
+
+@pytest.fixture
+def db(client):
+    session = application.backends().sessions['postgres']()
+    yield session
+    session.close()
+
+
+def test_trigram_matches_substrings(db):
+    assert search.search_mode(db) == 'trigram'
+    name = db.query(Package.name).filter(Package.name.like('%-%')).first()[0]
+    # середина имени, а не начало слова
+    q = name[1:-1]
+    found = search.search(db, q, ['package'], limit=1000)
+    assert found and all(r['rank'] is not None for r in found)
+    assert _ids(found, 'package') == _like(db, q, 'package')
+    assert any('<mark>' in r['snippet'] for r in search.search(db, 'build', ['update']))
+
+
+def test_short_query_uses_like(db):
+    found = search.search(db, 'li', ['package'], limit=1000)
+    assert _ids(found, 'package') == _like(db, 'li', 'package')
+    assert all(r['rank'] is None for r in found)
+
+
+def test_like_fallback_without_fts5(sample_db, tmp_path):
+    # SQLite без модуля fts5: CREATE VIRTUAL TABLE падает
+    path = str(tmp_path / 'nofts.db')
+    conn = sqlite3.connect(sample_db)
+    conn.execute(f"VACUUM INTO '{path}'")
+    conn.close()
+    conn = sqlite3.connect(path)
+    for _, table, *_ in search.SOURCES.values():
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(f'DROP TRIGGER IF EXISTS search_{table}_{suffix}')
+    conn.execute('DROP TABLE search_index')
+    conn.commit()
+    conn.close()
+
+    engine = make_engine(f'sqlite:///{path}', {})
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def no_fts5(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('CREATE VIRTUAL TABLE'):
+            raise OperationalError(statement, parameters, sqlite3.OperationalError('no such module: fts5'))
+
+    try:
+        assert search.init_search(engine) == 'like'
+        with Session(engine) as db:
+            assert search.search_mode(db) == 'like'
+            found = search.search(db, 'lib', ['package', 'report'], limit=1000)
+            assert found
+            assert _ids(found, 'package') <= _like(db, 'lib', 'package')
+            column = search.MODELS['package'][2]
+            assert 'LIKE' in str(search.contains(db, 'package', column, 'lib'))
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'search_%'").scalar() == 0
+    finally:
+        search._modes.pop(engine, None)
+        engine.dispose()
+
+
+def test_index_follows_writes(db):
+    def found(q, kind):
+        return _ids(search.search(db, q, [kind], limit=1000), kind)
+
+    package = Package(name='zqxpackage', description='Tool for zqxalpha files')
+    db.add(package)
+    db.flush()
+    maintainer = db.query(Maintainer).first()
+    update = PackageUpdate(package=package, updater=maintainer, update_version='1.0-alt1',
+                           update_date=date(2024, 1, 1), changelog='- zqxchange initial')
+    report = Report(package=package, status='NEW', resolution='', assignee=maintainer,
+                    reporter='zqxreporter', summary='zqxcrash on start')
+    db.add_all([update, report])
+    db.commit()
+    assert found('zqxalpha', 'package') == {package.package_id}
+    assert found('xpackag', 'package') == {package.package_id}
+    assert found('zqxchange', 'update') == {update.update_id}
+    assert found('zqxcrash', 'report') == {report.id}
+
+    # изменение колонок индекса
+    package.description = 'Tool for zqxbeta files'
+    update.changelog = '- zqxother'
+    report.reporter = 'zqxsomeone'
+    db.commit()
+    assert found('zqxalpha', 'package') == set()
+    assert found('zqxbeta', 'package') == {package.package_id}
+    assert found('zqxchange', 'update') == set()
+    assert found('zqxother', 'update') == {update.update_id}
+    assert found('zqxreporter', 'report') == set()
+    assert found('zqxsomeone', 'report') == {report.id}
+
+    # удаление (вместе с обновлениями и баг-репортами пакета)
+    db.delete(package)
+    db.commit()
+    for q, kind in (('zqxbeta', 'package'), ('zqxother', 'update'), ('zqxcrash', 'report')):
+        assert found(q, kind) == set(), q
+    with application.backends().engine_pg.connect() as conn:
+        assert conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM search_index WHERE search_index MATCH '\"zqx\"'").scalar() == 0
@@ -0,0 +1,44 @@
+# Сводки дашборда (stats.py), которые ведут триггеры, после записей через
+# страницы, ORM и фоновые задачи совпадают с полным пересчётом.
+
+from datetime import date
+
+import app as application
+import run as bench
+import stats
+from models import PackageArchitecture, PackageGroup, PackageUpdate, Report
+
+
+def _totals(conn):
+    return {name: conn.exec_driver_sql(f'SELECT COALESCE(SUM(n), 0) FROM {name}').scalar()
+            for name in stats.SUMMARIES}
+
+
+def test_triggers_match_full_recount(make_app, db_path):
+    ids, _ = bench.sample_ids(db_path)
+    _, write = bench.scenarios(ids)
+    client = make_app().test_client()
+    engine = application.backends().engine_pg
+    with engine.connect() as conn:
+        assert stats.check_stats(conn) == {}
+        before = _totals(conn)
+
+    # все сценарии записи бенчмарка: формы, удаления, пачки, удаление пакета задачей
+    for i, (name, method, target, *_) in enumerate(write):
+        _, status, _, _ = bench.fetch(client, method, target, i)
+        assert status < 500, name
+
+    # изменения ключевых колонок сводок мимо форм
+    db = application.backends().sessions['postgres']()
+    update = db.get(PackageUpdate, ids['update'])
+    update.update_date, update.updater_id = date(2003, 2, 1), ids['busy_maintainer']
+    report = db.get(Report, ids['report'])
+    report.status, report.resolution, report.assignee_id = 'CLOSED', 'FIXED', ids['maintainer']
+    db.query(PackageArchitecture).filter_by(package_id=ids['package']).first().architecture = 'e2k'
+    db.query(PackageGroup).filter_by(package_id=ids['package']).first().group_name = 'Other/Tests'
+    db.commit()
+    db.close()
+
+    with engine.connect() as conn:
+        assert _totals(conn) != before
+        assert stats.check_stats(conn) == {}
@@ -0,0 +1,72 @@
+# Потоковые списки (app.stream_page, paginate(stream=True)): строки уходят
+# клиенту, пока курсор ещё читается, а ошибка посреди потока обрывает ответ
+# с пометкой, закрывает сессии и не оставляет неполную страницу в кэше.
+
+import pytest
+
+import app as application
+import pagination
+
+PER_PAGE = 200
+
+
+def _counted(monkeypatch, fail_after=None):
+    """state['read'] — строк, прочитанных из курсора страницы к этому моменту."""
+    state = {'read': 0}
+    streamed = pagination._streamed
+
+    def counted(*args, **kwargs):
+        for row in streamed(*args, **kwargs):
+            if state['read'] == fail_after:
+                raise RuntimeError('курсор оборвался')
+            state['read'] += 1
+            yield row
+
+    monkeypatch.setattr(pagination, '_streamed', counted)
+    return state
+
+
+def test_rows_are_sent_before_cursor_is_read(make_app, monkeypatch):
+    client = make_app(STREAM_CHUNK=10).test_client()
+    state = _counted(monkeypatch)
+
+    resp = client.get(f'/updates?per_page={PER_PAGE}', buffered=False)
+    assert resp.is_streamed
+    read_at_first_row = None
+    for chunk in resp.response:
+        if read_at_first_row is None and b'/updates/delete/' in chunk:
+            read_at_first_row = state['read']
+    resp.close()
+
+    assert state['read'] == PER_PAGE
+    assert read_at_first_row is not None and read_at_first_row < PER_PAGE // 2
+
+
+def test_error_mid_stream(make_app, monkeypatch):
+    client = make_app(STREAM_CHUNK=10, HTTP_CACHE=True).test_client()
+    engine = application.backends().engine_pg
+    _counted(monkeypatch, fail_after=30)
+
+    resp = client.get(f'/updates?per_page={PER_PAGE}', buffered=False)
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in resp.response:
+            chunks.append(chunk.decode())
+    resp.close()
+    body = ''.join(chunks)
+    # ушли строки до ошибки, кроме ещё не сброшенного буфера шаблона
+    assert 0 < body.count('/updates/delete/') <= 30
+    assert body.endswith(application.STREAM_ERROR)
+
+    # сессии запроса закрыты; неполная страница не закэширована — следующий
+    # запрос рендерит её заново целиком
+    assert engine.pool.checkedout() == 0
+    monkeypatch.undo()
+    resp = client.get(f'/updates?per_page={PER_PAGE}')
+    body = resp.get_data(as_text=True)
+    resp.close()
+    assert resp.headers['ETag'] == etag
+    assert body.count('/updates/delete/') == PER_PAGE
+    assert application.STREAM_ERROR not in body
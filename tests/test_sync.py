@@ -0,0 +1,105 @@
+# sync.py: пакет, изменённый мимо sync (формы, batch.py), не считается
+# неизменным — flush сбрасывает его content_hash, и sync возвращает
+# содержимое из снимка.
+
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import batch
+from importer import run_import
+from models import ACL, Maintainer, Package, PackageArchitecture, PackageUpdate
+from sync import run_sync
+
+RECORDS = [
+    {'name': 'foo', 'description': 'Foo library', 'group': 'System/Libraries',
+     'architectures': ['x86_64', 'aarch64'],
+     'acl': [{'nickname': 'alice', 'full_name': 'Alice', 'role': 'owner'}],
+     'updates': [{'nickname': 'alice', 'full_name': 'Alice', 'version': '1.0-alt1',
+                  'date': '2024-01-10', 'changelog': '- initial build'}]},
+    {'name': 'bar', 'description': 'Bar tool', 'group': 'Other',
+     'architectures': ['noarch'],
+     'acl': [{'nickname': 'bob', 'full_name': 'Bob', 'role': 'owner'}],
+     'updates': [{'nickname': 'bob', 'full_name': 'Bob', 'version': '2.1-alt1',
+                  'date': '2024-02-01', 'changelog': '- 2.1'}]},
+]
+
+
+@pytest.fixture
+def synced(tmp_path):
+    """(engine, Session, путь к снимку) — БД, загруженная из снимка и сверенная с ним."""
+    dump = tmp_path / 'snapshot.jsonl'
+    dump.write_text('\n'.join(json.dumps(rec) for rec in RECORDS))
+    engine = create_engine(f'sqlite:///{tmp_path / "sync.db"}')
+    run_import(engine, [str(dump)], log=lambda line: None)
+    assert run_sync(engine, [str(dump)], log=lambda line: None)['unchanged'] == 2
+    yield engine, sessionmaker(bind=engine), str(dump)
+    engine.dispose()
+
+def _hashes(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(Package.name, Package.content_hash)).all())
+
+def _resync(engine, dump):
+    stats = run_sync(engine, [dump], log=lambda line: None)
+    return stats['updated'], stats['unchanged']
+
+
+def test_edited_description_is_restored(synced):
+    engine, Session, dump = synced
+    with Session() as db:
+        db.execute(select(Package).where(Package.name == 'foo')).scalar_one().description = 'changed'
+        db.commit()
+    assert _hashes(engine) == {'foo': None, 'bar': _hashes(engine)['bar']}
+    assert _resync(engine, dump) == (1, 1)
+    with engine.connect() as conn:
+        assert conn.execute(select(Package.description).where(Package.name == 'foo')).scalar() == 'Foo library'
+
+@pytest.mark.parametrize('change', ['add_update', 'delete_acl', 'move_arch'])
+def test_child_changes_reset_hash(synced, change):
+    engine, Session, dump = synced
+    with Session() as db:
+        foo = db.execute(select(Package).where(Package.name == 'foo')).scalar_one()
+        bar = db.execute(select(Package).where(Package.name == 'bar')).scalar_one()
+        if change == 'add_update':
+            db.add(PackageUpdate(package_id=foo.package_id, updater_id=1, update_version='1.1-alt1',
+                                 update_date=date(2024, 3, 1), changelog='- 1.1'))
+        elif change == 'delete_acl':
+            db.delete(db.execute(select(ACL).where(ACL.package_id == foo.package_id)).scalar_one())
+        else:
+            arch = db.execute(select(PackageArchitecture)
+                              .where(PackageArchitecture.package_id == foo.package_id)).scalars().first()
+            arch.package_id = bar.package_id
+        db.commit()
+    hashes = _hashes(engine)
+    assert hashes['foo'] is None
+    assert (hashes['bar'] is None) == (change == 'move_arch')
+    assert _resync(engine, dump)[0] == (2 if change == 'move_arch' else 1)
+    assert _resync(engine, dump) == (0, 2)
+
+def test_batch_insert_resets_hash(synced):
+    engine, Session, dump = synced
+    with Session() as db:
+        foo_id = db.execute(select(Package.package_id).where(Package.name == 'foo')).scalar()
+        batch.insert_rows(db, 'architectures', [{'package_id': foo_id, 'architecture': 'i586'}])
+        db.commit()
+    assert _hashes(engine)['foo'] is None
+    assert _resync(engine, dump) == (1, 1)
+
+def test_renamed_maintainer_resets_hashes(synced):
+    engine, Session, dump = synced
+    with Session() as db:
+        db.execute(select(Maintainer).where(Maintainer.nickname == 'bob')).scalar_one().nickname = 'robert'
+        db.commit()
+    assert _hashes(engine)['bar'] is None and _hashes(engine)['foo'] is not None
+
+def test_unrelated_changes_keep_hash(synced):
+    engine, Session, dump = synced
+    before = _hashes(engine)
+    with Session() as db:
+        db.execute(select(Maintainer).where(Maintainer.nickname == 'bob')).scalar_one().full_name = 'Robert'
+        db.commit()
+    assert _hashes(engine) == before
@@ -0,0 +1,92 @@
+# Нагрузка мейнтейнеров (workload.py): счётчики maintainer_workload, которые
+# ведут триггеры, после изменений ACL, баг-репортов и обновлений — через
+# формы, ORM и Core — совпадают с полным пересчётом.
+
+from datetime import date
+
+from sqlalchemy import insert, select, update
+
+import app as application
+import workload
+from models import ACL, Maintainer, MaintainerWorkload, PackageUpdate, Report
+
+
+def _counters(db, maintainer_id):
+    db.expire_all()
+    row = db.get(MaintainerWorkload, maintainer_id)
+    return {col: getattr(row, col) for col in workload.SORTS}
+
+def _recount(engine):
+    with engine.connect() as conn:
+        return workload.check_workload(conn)
+
+
+def test_triggers_match_full_recount(client):
+    engine = application.backends().engine_pg
+    db = application.backends().sessions['postgres']()
+    assert _recount(engine) == ([], [])
+
+    # два «чистых» мейнтейнера: на них видно каждое изменение счётчиков
+    for nick in ('wl-one', 'wl-two'):
+        client.post('/maintainers/add', data={'nickname': nick, 'full_name': nick})
+    one, two = (db.execute(select(Maintainer.maintainer_id).where(Maintainer.nickname == nick)).scalar()
+                for nick in ('wl-one', 'wl-two'))
+    zero = {'packages': 0, 'acl': 0, 'open_reports': 0, 'reports': 0, 'updates': 0, 'last_update': None}
+    assert _counters(db, one) == _counters(db, two) == zero
+    package_id = db.execute(select(PackageUpdate.package_id)).scalar()
+
+    # ACL: добавление формой, смена роли и владельца, удаление
+    client.post('/acl/add', data={'package_id': package_id, 'maintainer_id': one, 'role': 'owner'})
+    acl_id = db.execute(select(ACL.acl_id).where(ACL.maintainer_id == one)).scalar()
+    assert _counters(db, one) == {**zero, 'packages': 1, 'acl': 1}
+    client.post(f'/acl/edit/{acl_id}', data={'package_id': package_id, 'maintainer_id': one, 'role': 'helper'})
+    assert _counters(db, one) == {**zero, 'acl': 1}
+    client.post(f'/acl/edit/{acl_id}', data={'package_id': package_id, 'maintainer_id': two, 'role': 'owner'})
+    assert _counters(db, one) == zero
+    assert _counters(db, two) == {**zero, 'packages': 1, 'acl': 1}
+    client.get(f'/acl/delete/{acl_id}')
+    assert _counters(db, two) == zero
+
+    # баг-репорты: открыт, закрыт формой, передан другому, удалён
+    report = Report(package_id=package_id, status='NEW', resolution='', assignee_id=one,
+                    reporter='someone', summary='workload test')
+    db.add(report)
+    db.commit()
+    assert _counters(db, one) == {**zero, 'reports': 1, 'open_reports': 1}
+    form = {'package_id': package_id, 'status': 'RESOLVED', 'resolution': 'FIXED',
+            'assignee_id': one, 'reporter': 'someone', 'summary': 'workload test'}
+    client.post(f'/reports/edit/{report.id}', data=form)
+    assert _counters(db, one) == {**zero, 'reports': 1}
+    client.post(f'/reports/edit/{report.id}', data={**form, 'resolution': '', 'assignee_id': two})
+    assert _counters(db, one) == zero
+    assert _counters(db, two) == {**zero, 'reports': 1, 'open_reports': 1}
+    client.get(f'/reports/delete/{report.id}')
+    assert _counters(db, two) == zero
+
+    # обновления: ORM и Core, смена даты и автора, удаление последнего
+    updates = [PackageUpdate(package_id=package_id, updater_id=one, update_version=f'{n}.0-alt1',
+                             update_date=date(2020, n, 1), changelog='- workload') for n in (1, 2)]
+    db.add_all(updates)
+    db.commit()
+    with engine.begin() as conn:
+        conn.execute(insert(PackageUpdate), [{'package_id': package_id, 'updater_id': one,
+                                              'update_version': '3.0-alt1', 'update_date': date(2020, 3, 1),
+                                              'changelog': '- bulk'}])
+    assert _counters(db, one) == {**zero, 'updates': 3, 'last_update': date(2020, 3, 1)}
+    with engine.begin() as conn:
+        conn.execute(update(PackageUpdate).where(PackageUpdate.update_version == '3.0-alt1',
+                                                 PackageUpdate.updater_id == one)
+                     .values(updater_id=two))
+    assert _counters(db, one) == {**zero, 'updates': 2, 'last_update': date(2020, 2, 1)}
+    assert _counters(db, two) == {**zero, 'updates': 1, 'last_update': date(2020, 3, 1)}
+    updates[0].update_date = date(2021, 1, 1)
+    db.commit()
+    assert _counters(db, one)['last_update'] == date(2021, 1, 1)
+    client.get(f'/updates/delete/{updates[0].update_id}')
+    assert _counters(db, one) == {**zero, 'updates': 1, 'last_update': date(2020, 2, 1)}
+
+    # удаление мейнтейнера убирает его строку; пересчёт сходится
+    client.get(f'/maintainers/delete/{one}')
+    assert db.get(MaintainerWorkload, one) is None
+    db.close()
+    assert _recount(engine) == ([], [])